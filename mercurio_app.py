@@ -18,7 +18,16 @@ import json
 import time
 from datetime import datetime
 from routes import all_blueprints
-from utils.db import execute_query
+from utils.db import execute_query, get_db_connection, get_pool_stats
+from utils.readings_cache import get_readings_cache_stats
+from utils.minio_client import get_minio_stats
+from utils.file_derivatives import get_derivatives_stats
+from utils.minio_listing import get_listing_stats
+from utils.traffic_control_utils import get_traffic_ledger_stats
+from utils.token_rate_limit import check_token_rate_limit, rate_limit_headers, get_token_rate_limit_stats
+from utils.api_token_cache import get_api_token_cache_stats
+from utils.dashboard_summary import get_dashboard_summary, get_dashboard_stats
+from utils.export_jobs import get_export_runner
 from dotenv import load_dotenv
 
 
@@ -74,6 +83,9 @@ app.logger.info("Applicazione Flask inizializzata")
 # Crea cartella uploads se non esistente
 os.makedirs('uploads/json_configs', exist_ok=True)  
 
+# Worker degli export asincroni: riprendono subito i job rimasti in coda
+get_export_runner().start()
+
 # Registra blueprints
 #app.register_blueprint(auth_bp)
 #app.register_blueprint(admin_bp)
@@ -99,7 +111,16 @@ def health():
     return {
         "status": "ok",
         "time": datetime.utcnow().isoformat(),
-        "uptime_sec": int(time.time() - START_TIME)
+        "uptime_sec": int(time.time() - START_TIME),
+        "db_pool": get_pool_stats(),
+        "readings_cache": get_readings_cache_stats(),
+        "minio_pool": get_minio_stats(),
+        "file_derivatives": get_derivatives_stats(),
+        "minio_listing": get_listing_stats(),
+        "traffic_ledger": get_traffic_ledger_stats(),
+        "token_rate_limit": get_token_rate_limit_stats(),
+        "api_token_cache": get_api_token_cache_stats(),
+        "dashboard": get_dashboard_stats()
     }
 
 
@@ -117,7 +138,7 @@ def require_login():
     ]
 
     # ✅ Se la richiesta è per un endpoint API (/api/...), non forziamo il login con sessione
-    # (verrà gestito da @token_required nelle API route)
+    # (sessione o token verificati da api_authentication, vedi token_required)
     if request.path.startswith('/api/'):
         return
 
@@ -130,6 +151,43 @@ def require_login():
         return redirect(url_for('auth.login'))
 
 
+@app.before_request
+def api_authentication():
+    """Autentica le richieste /api/ (sessione o token) e applica il rate limit dei token"""
+    from flask import request, g
+    from routes.core.auth_routes import get_api_token, authenticate_api_request
+
+    if not request.path.startswith('/api/') or request.path.startswith('/api/token'):
+        return
+
+    token = get_api_token()
+    if not token:
+        # Nessun token valido: resta solo la sessione web
+        return authenticate_api_request()
+
+    allowed, info = check_token_rate_limit(
+        token['token_id'], token['rate_limit_per_hour'], request.remote_addr
+    )
+    g.rate_limit = info
+    if not allowed:
+        return jsonify({
+            'error': 'rate_limit_exceeded',
+            'message': f"Limite di {info['limit']} richieste/ora superato per questo token",
+            'retry_after': info['retry_after']
+        }), 429, rate_limit_headers(info)
+
+
+@app.after_request
+def add_rate_limit_headers(response):
+    """Header X-RateLimit-* sulle risposte alle richieste con token limitato"""
+    from flask import g
+
+    info = g.get('rate_limit')
+    if info and 'X-RateLimit-Limit' not in response.headers:
+        response.headers.update(rate_limit_headers(info))
+    return response
+
+
 # Context processor per permessi utente nei template
 @app.context_processor
 def inject_user_permissions():
@@ -147,78 +205,8 @@ def inject_user_permissions():
 @app.route('/')
 def index():
     """Dashboard principale con statistiche aggiornate"""
-    # Statistiche database
-    stats = {}
-    stats['scenarios'] = execute_query("SELECT COUNT(*) as count FROM scenarios", fetch=True)
-    stats['areas'] = execute_query("SELECT COUNT(*) as count FROM areas", fetch=True)
-    stats['systems'] = execute_query("SELECT COUNT(*) as count FROM systems", fetch=True)
-    stats['measurements'] = execute_query("SELECT COUNT(*) as count FROM measurements", fetch=True)  # ← NUOVO
-    stats['items'] = execute_query("SELECT COUNT(*) as count FROM items", fetch=True)
-    stats['channels'] = execute_query("SELECT COUNT(*) as count FROM channels", fetch=True)
-    stats['parameters'] = execute_query("SELECT COUNT(*) as count FROM parameters", fetch=True)
-    
-    # Attività recente aggiornata
-    recent_items = execute_query("""
-        SELECT i.name, i.code, i.created_at, 'item' as type
-        FROM items i
-        ORDER BY i.created_at DESC
-        LIMIT 3
-    """, fetch=True)
-    
-    recent_areas = execute_query("""
-        SELECT a.name, a.code, a.created_at, 'area' as type
-        FROM areas a
-        ORDER BY a.created_at DESC
-        LIMIT 3
-    """, fetch=True)
-    
-    recent_measurements = execute_query("""
-        SELECT m.name, m.code, m.created_at, 'measurement' as type,
-               s.name as system_name
-        FROM measurements m
-        LEFT JOIN systems s ON m.system_id = s.system_id
-        ORDER BY m.created_at DESC
-        LIMIT 3
-    """, fetch=True)  # ← NUOVO
-    
-    recent_scenarios = execute_query("""
-        SELECT s.name, s.code, s.created_at, 'scenario' as type
-        FROM scenarios s
-        ORDER BY s.created_at DESC
-        LIMIT 3
-    """, fetch=True)
-
-    recent_channels = execute_query("""
-        SELECT c.name, c.code, c.created_at, 'channel' as type
-        FROM channels c
-        ORDER BY c.created_at DESC
-        LIMIT 3
-    """, fetch=True)
-
-    recent_parameters = execute_query("""
-        SELECT p.name, p.code, p.created_at, 'parameter' as type
-        FROM parameters p
-        ORDER BY p.created_at DESC
-        LIMIT 3
-    """, fetch=True)
-    
-    # Combina e ordina attività recenti
-    recent_activity = []
-    if recent_items:
-        recent_activity.extend(recent_items)
-    if recent_areas:
-        recent_activity.extend(recent_areas)
-    if recent_measurements:
-        recent_activity.extend(recent_measurements)
-    if recent_scenarios:
-        recent_activity.extend(recent_scenarios)
-    if recent_channels:
-        recent_activity.extend(recent_channels)
-    if recent_parameters:
-        recent_activity.extend(recent_parameters)
-    
-    recent_activity.sort(key=lambda x: x['created_at'] if x['created_at'] else datetime.min, reverse=True)
-    recent_activity = recent_activity[:10]  # Top 10
+    # Conteggi e attività recente (top 10) in una query, in cache per pochi secondi
+    stats, recent_activity = get_dashboard_summary()
     
     return render_template('index.html', stats=stats, recent_activity=recent_activity)
 
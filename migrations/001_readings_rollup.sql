@@ -0,0 +1,112 @@
+-- ================================================
+-- READINGS ROLLUP 1m / 1h / 1d
+-- ================================================
+-- Aggregati per parametro (min/max/avg/count/first/last) a più risoluzioni,
+-- mantenuti in modo incrementale da un trigger AFTER INSERT su readings.
+-- Backfill dei dati storici: python -m utils.readings_rollup --backfill
+--
+-- Richiede PostgreSQL >= 10 (transition tables).
+-- UPDATE/DELETE su readings non aggiornano i rollup: rilanciare il backfill
+-- sul periodo interessato.
+
+-- Parsing numerico "sicuro" di readings.value (testo): NULL se non numerico
+CREATE OR REPLACE FUNCTION readings_value_as_float(val text)
+RETURNS double precision
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT CASE
+        WHEN val ~ '^\s*-?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][-+]?[0-9]+)?\s*$'
+        THEN val::double precision
+    END
+$$;
+
+-- Tabelle di rollup: i timestamp usano lo stesso tipo di readings.timestamp_utc
+DO $$
+DECLARE
+    res text;
+    ts_type text;
+BEGIN
+    SELECT format_type(a.atttypid, a.atttypmod) INTO ts_type
+    FROM pg_attribute a
+    WHERE a.attrelid = 'readings'::regclass AND a.attname = 'timestamp_utc';
+
+    FOREACH res IN ARRAY ARRAY['1m', '1h', '1d'] LOOP
+        EXECUTE format($f$
+            CREATE TABLE IF NOT EXISTS readings_rollup_%1$s (
+                parameter_id  integer          NOT NULL,
+                bucket_start  %2$s             NOT NULL,
+                sample_count  bigint           NOT NULL,
+                sum_value     double precision NOT NULL,
+                min_value     double precision NOT NULL,
+                min_ts        %2$s             NOT NULL,
+                max_value     double precision NOT NULL,
+                max_ts        %2$s             NOT NULL,
+                first_ts      %2$s             NOT NULL,
+                first_value   double precision NOT NULL,
+                last_ts       %2$s             NOT NULL,
+                last_value    double precision NOT NULL,
+                PRIMARY KEY (parameter_id, bucket_start)
+            )$f$, res, ts_type);
+    END LOOP;
+END
+$$;
+
+-- Statement di upsert degli aggregati di "src" (tabella o subquery con
+-- parameter_id, timestamp_utc, value) nella tabella di rollup "target",
+-- con bucket date_trunc(unit). Restituisce solo il testo SQL: va eseguito
+-- dal chiamante (il trigger deve farlo nel proprio contesto per vedere
+-- la transition table).
+CREATE OR REPLACE FUNCTION readings_rollup_merge_sql(target text, unit text, src text)
+RETURNS text
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT format($f$
+        INSERT INTO %1$I AS t (
+            parameter_id, bucket_start, sample_count, sum_value,
+            min_value, min_ts, max_value, max_ts,
+            first_ts, first_value, last_ts, last_value
+        )
+        SELECT
+            parameter_id,
+            date_trunc(%2$L, timestamp_utc) AS bucket_start,
+            COUNT(*),
+            SUM(v),
+            MIN(v), (array_agg(timestamp_utc ORDER BY v ASC, timestamp_utc ASC))[1],
+            MAX(v), (array_agg(timestamp_utc ORDER BY v DESC, timestamp_utc ASC))[1],
+            MIN(timestamp_utc), (array_agg(v ORDER BY timestamp_utc ASC))[1],
+            MAX(timestamp_utc), (array_agg(v ORDER BY timestamp_utc DESC))[1]
+        FROM (
+            SELECT parameter_id, timestamp_utc, readings_value_as_float(value) AS v
+            FROM %3$s
+        ) s
+        WHERE v IS NOT NULL AND timestamp_utc IS NOT NULL
+        GROUP BY parameter_id, date_trunc(%2$L, timestamp_utc)
+        ON CONFLICT (parameter_id, bucket_start) DO UPDATE SET
+            sample_count = t.sample_count + EXCLUDED.sample_count,
+            sum_value    = t.sum_value + EXCLUDED.sum_value,
+            min_ts       = CASE WHEN EXCLUDED.min_value < t.min_value THEN EXCLUDED.min_ts ELSE t.min_ts END,
+            min_value    = LEAST(t.min_value, EXCLUDED.min_value),
+            max_ts       = CASE WHEN EXCLUDED.max_value > t.max_value THEN EXCLUDED.max_ts ELSE t.max_ts END,
+            max_value    = GREATEST(t.max_value, EXCLUDED.max_value),
+            first_value  = CASE WHEN EXCLUDED.first_ts < t.first_ts THEN EXCLUDED.first_value ELSE t.first_value END,
+            first_ts     = LEAST(t.first_ts, EXCLUDED.first_ts),
+            last_value   = CASE WHEN EXCLUDED.last_ts >= t.last_ts THEN EXCLUDED.last_value ELSE t.last_value END,
+            last_ts      = GREATEST(t.last_ts, EXCLUDED.last_ts)
+    $f$, target, unit, src)
+$$;
+
+CREATE OR REPLACE FUNCTION readings_rollup_on_insert()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    EXECUTE readings_rollup_merge_sql('readings_rollup_1m', 'minute', 'new_readings');
+    EXECUTE readings_rollup_merge_sql('readings_rollup_1h', 'hour', 'new_readings');
+    EXECUTE readings_rollup_merge_sql('readings_rollup_1d', 'day', 'new_readings');
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS trg_readings_rollup ON readings;
+CREATE TRIGGER trg_readings_rollup
+    AFTER INSERT ON readings
+    REFERENCING NEW TABLE AS new_readings
+    FOR EACH STATEMENT
+    EXECUTE PROCEDURE readings_rollup_on_insert();
@@ -0,0 +1,44 @@
+-- ================================================
+-- READINGS VALUE_NUM (valore numerico tipizzato)
+-- ================================================
+-- readings.value è testo: value_num ne conserva il valore double precision
+-- (NULL se non numerico), calcolato all'ingest da un trigger BEFORE.
+-- Le query numeriche dell'API (statistiche, downsampling, ultimi valori)
+-- leggono solo value_num tramite l'indice di copertura parziale, senza
+-- regex né CAST sul testo.
+--
+-- Richiede 001_readings_rollup.sql (readings_value_as_float) e
+-- PostgreSQL >= 11 (INCLUDE negli indici).
+-- CREATE INDEX CONCURRENTLY non può girare in una transazione:
+-- eseguire il file con psql senza --single-transaction.
+
+ALTER TABLE readings ADD COLUMN IF NOT EXISTS value_num double precision;
+
+CREATE OR REPLACE FUNCTION readings_set_value_num()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.value_num := readings_value_as_float(NEW.value);
+    RETURN NEW;
+END
+$$;
+
+DROP TRIGGER IF EXISTS trg_readings_value_num ON readings;
+CREATE TRIGGER trg_readings_value_num
+    BEFORE INSERT OR UPDATE OF value ON readings
+    FOR EACH ROW
+    EXECUTE PROCEDURE readings_set_value_num();
+
+-- Backfill dello storico (le nuove righe sono già coperte dal trigger)
+UPDATE readings
+SET value_num = readings_value_as_float(value)
+WHERE value_num IS NULL
+  AND readings_value_as_float(value) IS NOT NULL;
+
+-- Indice di copertura per scansioni index-only sui soli valori numerici
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_readings_param_ts_value_num
+    ON readings (parameter_id, timestamp_utc)
+    INCLUDE (value_num)
+    WHERE value_num IS NOT NULL;
+
+ANALYZE readings;
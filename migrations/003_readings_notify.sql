@@ -0,0 +1,55 @@
+-- ================================================
+-- READINGS NOTIFY (invalidazione cache API)
+-- ================================================
+-- Per ogni statement che modifica readings invia su "readings_changed"
+-- una notifica per parametro con il range temporale toccato (epoch):
+--   {"parameter_id": 12, "min_ts": 1700000000.0, "max_ts": 1700003600.0}
+-- Il listener di utils/readings_cache.py elimina le risposte in cache
+-- dei parametri interessati il cui range si sovrappone.
+--
+-- Richiede PostgreSQL >= 10 (transition tables).
+
+CREATE OR REPLACE FUNCTION readings_notify_changes()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('readings_changed', json_build_object(
+                    'parameter_id', parameter_id,
+                    'min_ts', extract(epoch from MIN(timestamp_utc)),
+                    'max_ts', extract(epoch from MAX(timestamp_utc)))::text)
+        FROM old_readings
+        GROUP BY parameter_id;
+    ELSE
+        PERFORM pg_notify('readings_changed', json_build_object(
+                    'parameter_id', parameter_id,
+                    'min_ts', extract(epoch from MIN(timestamp_utc)),
+                    'max_ts', extract(epoch from MAX(timestamp_utc)))::text)
+        FROM new_readings
+        GROUP BY parameter_id;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+-- Le transition tables richiedono un trigger per evento
+DROP TRIGGER IF EXISTS trg_readings_notify_insert ON readings;
+CREATE TRIGGER trg_readings_notify_insert
+    AFTER INSERT ON readings
+    REFERENCING NEW TABLE AS new_readings
+    FOR EACH STATEMENT
+    EXECUTE PROCEDURE readings_notify_changes();
+
+DROP TRIGGER IF EXISTS trg_readings_notify_update ON readings;
+CREATE TRIGGER trg_readings_notify_update
+    AFTER UPDATE ON readings
+    REFERENCING NEW TABLE AS new_readings
+    FOR EACH STATEMENT
+    EXECUTE PROCEDURE readings_notify_changes();
+
+DROP TRIGGER IF EXISTS trg_readings_notify_delete ON readings;
+CREATE TRIGGER trg_readings_notify_delete
+    AFTER DELETE ON readings
+    REFERENCING OLD TABLE AS old_readings
+    FOR EACH STATEMENT
+    EXECUTE PROCEDURE readings_notify_changes();
@@ -0,0 +1,15 @@
+-- ================================================
+-- READINGS KEYSET INDEX (paginazione a cursore)
+-- ================================================
+-- Le liste paginate (tabella, cartelle, file) ordinano per
+-- (timestamp_utc DESC, reading_id DESC) e ripartono dalla chiave
+-- dell'ultima riga vista: con questo indice ogni pagina è una
+-- index scan di per_page + 1 righe, a qualunque profondità.
+--
+-- CREATE INDEX CONCURRENTLY non può girare in una transazione:
+-- eseguire il file con psql senza --single-transaction.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_readings_param_ts_id
+    ON readings (parameter_id, timestamp_utc DESC, reading_id DESC);
+
+ANALYZE readings;
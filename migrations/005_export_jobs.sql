@@ -0,0 +1,43 @@
+-- ================================================
+-- EXPORT JOBS (export asincroni parametro/canale)
+-- ================================================
+-- Coda persistente degli export: qualunque processo dell'app può
+-- accettare un job e qualunque worker (utils/export_jobs.py) può
+-- eseguirlo; lo stato resta consultabile da tutti i processi.
+-- Gli artifact (CSV) stanno su MinIO o su disco fino a expires_at.
+
+CREATE TABLE IF NOT EXISTS export_jobs (
+    job_id            uuid         PRIMARY KEY,
+    user_id           integer,
+    kind              text         NOT NULL CHECK (kind IN ('parameter', 'channel')),
+    item_id           integer      NOT NULL,
+    start_date        timestamptz  NOT NULL,
+    end_date          timestamptz  NOT NULL,
+    status            text         NOT NULL DEFAULT 'queued'
+                      CHECK (status IN ('queued', 'running', 'done', 'failed', 'cancelled', 'expired')),
+    cancel_requested  boolean      NOT NULL DEFAULT false,
+    progress_rows     bigint       NOT NULL DEFAULT 0,
+    estimated_rows    bigint,
+    storage           text,
+    artifact_path     text,
+    artifact_size     bigint,
+    filename          text,
+    error             text,
+    created_at        timestamptz  NOT NULL DEFAULT now(),
+    started_at        timestamptz,
+    finished_at       timestamptz,
+    expires_at        timestamptz
+);
+
+-- Claim dei job in coda (FIFO) e conteggi per utente
+CREATE INDEX IF NOT EXISTS idx_export_jobs_queue
+    ON export_jobs (created_at)
+    WHERE status = 'queued';
+
+CREATE INDEX IF NOT EXISTS idx_export_jobs_user_status
+    ON export_jobs (user_id, status);
+
+-- Pulizia artifact scaduti
+CREATE INDEX IF NOT EXISTS idx_export_jobs_expires
+    ON export_jobs (expires_at)
+    WHERE status = 'done';
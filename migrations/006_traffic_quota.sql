@@ -0,0 +1,26 @@
+-- ================================================
+-- TRAFFIC QUOTA (backend postgres dei limiti traffico)
+-- ================================================
+-- Usate solo con TRAFFIC_QUOTA_BACKEND=postgres (utils/traffic_quota.py).
+-- traffic_quota_usage: byte e download di oggi per utente, aggiornati
+-- con check-and-reserve atomico da tutti i worker/host; la riga del
+-- giorno è inizializzata da user_traffic_log alla prima richiesta.
+-- traffic_dedup: download in corso per la deduplica (stato volatile,
+-- quindi UNLOGGED).
+
+CREATE TABLE IF NOT EXISTS traffic_quota_usage (
+    user_id         integer      NOT NULL,
+    usage_date      date         NOT NULL,
+    bytes_used      bigint       NOT NULL DEFAULT 0,
+    download_count  integer      NOT NULL DEFAULT 0,
+    updated_at      timestamptz  NOT NULL DEFAULT now(),
+    PRIMARY KEY (user_id, usage_date)
+);
+
+CREATE UNLOGGED TABLE IF NOT EXISTS traffic_dedup (
+    request_hash  text         PRIMARY KEY,
+    expires_at    timestamptz  NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_traffic_dedup_expires
+    ON traffic_dedup (expires_at);
@@ -0,0 +1,15 @@
+-- ================================================
+-- USER TOKENS HASH INDEX (autenticazione token API)
+-- ================================================
+-- token_required cerca il token per token_hash (SHA-256, vedi
+-- hash_token in routes/core/admin_routes.py): con l'indice univoco
+-- la ricerca è una index scan e due token non possono avere lo
+-- stesso hash. Se l'indice fallisce per hash duplicati, trovarli con:
+--   SELECT token_hash, COUNT(*) FROM user_tokens
+--   GROUP BY token_hash HAVING COUNT(*) > 1;
+--
+-- CREATE INDEX CONCURRENTLY non può girare in una transazione:
+-- eseguire il file con psql senza --single-transaction.
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_user_tokens_token_hash
+    ON user_tokens (token_hash);
@@ -0,0 +1,16 @@
+-- ================================================
+-- EXPORT JOBS HEARTBEAT (job di worker interrotti)
+-- ================================================
+-- Un worker aggiorna heartbeat_at del job in esecuzione ogni
+-- EXPORT_JOBS_HEARTBEAT_INTERVAL secondi. Un job 'running' con
+-- heartbeat più vecchio di EXPORT_JOBS_STALE_AFTER appartiene a un
+-- processo morto: utils/export_jobs.py lo rimette in coda (o lo marca
+-- failed dopo EXPORT_JOBS_MAX_ATTEMPTS tentativi), così non blocca
+-- più gli export successivi dello stesso utente.
+
+ALTER TABLE export_jobs ADD COLUMN IF NOT EXISTS heartbeat_at timestamptz;
+ALTER TABLE export_jobs ADD COLUMN IF NOT EXISTS attempts integer NOT NULL DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS idx_export_jobs_running
+    ON export_jobs (heartbeat_at)
+    WHERE status = 'running';
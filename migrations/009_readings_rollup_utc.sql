@@ -0,0 +1,13 @@
+-- ================================================
+-- READINGS ROLLUP IN UTC
+-- ================================================
+-- date_trunc su un timestamptz usa il TimeZone della sessione: con una
+-- sessione non UTC i bucket giornalieri/orari del trigger sarebbero
+-- allineati al fuso locale, diversi da quelli del backfill e dei confini
+-- calcolati da utils/readings_rollup.py. Il trigger gira sempre in UTC.
+-- Con timestamp_utc senza fuso date_trunc non dipende dalla sessione.
+--
+-- Se i rollup esistenti sono stati scritti da sessioni non UTC, rilanciare
+-- il backfill: python -m utils.readings_rollup --backfill
+
+ALTER FUNCTION readings_rollup_on_insert() SET TimeZone = 'UTC';
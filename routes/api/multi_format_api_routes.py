@@ -5,26 +5,56 @@ Estende le API esistenti con supporto per file da bucket Minio
 AGGIUNTO: Endpoint unificato per download streaming
 """
 
-from flask import Blueprint, jsonify, request, send_file, Response
+from flask import Blueprint, jsonify, request, send_file, Response, g
 from flask import stream_with_context
 from datetime import datetime, timedelta
 import logging
 import os
 import tempfile
-import mimetypes
-from utils.db import execute_query, get_db_connection
+from utils.db import execute_query, execute_query_rows, get_db_connection
 from utils.minio_client import get_minio_client  # Assumendo che esista
-from utils.minio_client import get_file_from_minio
-import io
-import pandas as pd
+from utils.readings_rollup import RAW_RESOLUTION
+from utils.readings_cache import cached_readings_response, resolve_readings_range, resolve_readings_limit
+from utils.keyset_pagination import paginate_readings
+from utils.channel_export import build_channel_pivot_query, stream_channel_pivot_csv
+from utils.zip_stream import stream_zip
+from utils.minio_prefetch import MinioPrefetcher
+from utils.minio_range import minio_range_response
+from utils.file_derivatives import derivative_response
+from utils.csv_stream import (
+    read_csv_window, downsample_csv,
+    CSV_DEFAULT_LIMIT, CSV_MAX_LIMIT, CSV_MAX_DOWNSAMPLE_POINTS
+)
+from utils.minio_listing import list_folder_page, get_folder_aggregates
+from utils.json_stream import read_json_node, json_summary, JSON_DEFAULT_LIMIT, JSON_MAX_LIMIT
+from utils.readings_columnar import negotiate_readings_format, readings_to_columns, readings_response
+from utils.downsampling import (
+    DOWNSAMPLE_MODES,
+    DEFAULT_DOWNSAMPLE_MODE,
+    numeric_value_sql,
+    downsample_readings,
+    downsample_readings_batch
+)
+import numpy as np
 
 
 from utils.traffic_control_utils import (
     traffic_control, 
     estimate_postgres_csv_size, 
     estimate_minio_file_size,
+    estimate_minio_range_size,
     get_user_traffic_status,
-    get_current_user_id
+    get_current_user_id,
+    is_admin_user
+)
+from utils.export_jobs import (
+    ExportJobLimitError,
+    submit_export_job,
+    get_export_job,
+    list_export_jobs,
+    cancel_export_job,
+    serialize_export_job,
+    iter_export_artifact
 )
 
 
@@ -80,21 +110,29 @@ def analyze_readings_content_type(readings):
     """
     Analizza il tipo di contenuto dei readings
     """
-    if not readings:
+    # Righe {timestamp_utc, value} oppure colonne {timestamp_ms, value}
+    values = readings['value'] if isinstance(readings, dict) else [r.get('value', '') for r in readings]
+    
+    if not len(values):
         return 'numeric', {}
     
     content_analysis = {
-        'total_readings': len(readings),
+        'total_readings': len(values),
         'file_readings': 0,
         'numeric_readings': 0,
         'file_types': {},
         'mixed_content': False
     }
     
-    for reading in readings:
-        if is_file_path(reading.get('value', '')):
+    if isinstance(values, np.ndarray):
+        # Colonna float64: solo valori numerici
+        content_analysis['numeric_readings'] = len(values)
+        values = []
+    
+    for value in values:
+        if is_file_path(value):
             content_analysis['file_readings'] += 1
-            file_type = get_file_type(reading['value'])
+            file_type = get_file_type(value)
             content_analysis['file_types'][file_type] = content_analysis['file_types'].get(file_type, 0) + 1
         else:
             content_analysis['numeric_readings'] += 1
@@ -179,10 +217,10 @@ def estimate_unified_download_size(item_type, item_id):
                 return 1 * 1024 * 1024  # 1MB fallback
                 
         elif content_type == 'single_file':
-            # Singolo file
+            # Singolo file: si addebitano solo i byte del Range richiesto
             file_path = request.args.get('file_path')
             if file_path:
-                return estimate_minio_file_size(file_path)
+                return estimate_minio_range_size(file_path)
             else:
                 return 5 * 1024 * 1024  # 5MB default
                 
@@ -226,9 +264,9 @@ def estimate_postgres_stream_size(query, params, filename_prefix, custom_header=
 
 def estimate_minio_stream_size(file_path):
     """
-    Stima dimensione stream Minio file
+    Stima dimensione stream Minio file (solo il Range richiesto)
     """
-    return estimate_minio_file_size(file_path)
+    return estimate_minio_range_size(file_path)
 
 def estimate_zip_stream_size(file_paths, zip_name):
     """
@@ -248,6 +286,7 @@ def estimate_zip_stream_size(file_paths, zip_name):
         return len(file_paths) * 1024 * 1024  # 1MB per file fallback
 
 @multi_format_api.route('/readings/parameter/<int:parameter_id>')
+@cached_readings_response('parameter', 'parameter_id', default_limit=1000)
 def get_parameter_readings_multiformat_fixed(parameter_id):
     """
     API CORRETTA: downsampling intelligente + statistiche DB separate
@@ -256,18 +295,18 @@ def get_parameter_readings_multiformat_fixed(parameter_id):
         # Parsing parametri
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date') 
-        limit = request.args.get('limit', 1000, type=int)
+        limit = resolve_readings_limit(1000)
+        downsample_mode = request.args.get('downsample', DEFAULT_DOWNSAMPLE_MODE).lower()
         
-        # Default dates
-        if not end_date:
-            end_date = datetime.now()
-        else:
-            end_date = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-            
-        if not start_date:
-            start_date = end_date - timedelta(days=7)
-        else:
-            start_date = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
+        if downsample_mode not in DOWNSAMPLE_MODES:
+            return jsonify({
+                'error': 'Modalità downsampling non valida',
+                'downsample': downsample_mode,
+                'supported': list(DOWNSAMPLE_MODES)
+            }), 400
+        
+        # Default dates (range normalizzato come la chiave della cache)
+        start_date, end_date = resolve_readings_range(start_date, end_date)
         
         # Query info parametro
         parameter_info_query = """
@@ -296,113 +335,109 @@ def get_parameter_readings_multiformat_fixed(parameter_id):
         parameter_info = parameter_info_result[0]
         data_type = parameter_info.get('data_type', 'numeric')
 
-        # STEP 1: Conta TUTTI i record nel periodo (per decidere downsampling)
-        count_query = """
-            SELECT COUNT(*) as total_count
-            FROM readings r
-            WHERE r.parameter_id = %s
-              AND r.timestamp_utc >= %s
-              AND r.timestamp_utc <= %s
-              AND r.value IS NOT NULL
-        """
+        # STEP 1: Conta TUTTI i record nel periodo (per decidere downsampling).
+        # Per i numerici count e statistiche arrivano insieme da value_num (index-only)
+        if data_type == 'numeric':
+            value_expr, value_filter = numeric_value_sql()
+            count_query = f"""
+                SELECT
+                    COUNT(*) as total_count,
+                    MIN({value_expr}) as min_val,
+                    MAX({value_expr}) as max_val,
+                    AVG({value_expr}) as avg_val
+                FROM readings r
+                WHERE r.parameter_id = %s
+                  AND r.timestamp_utc >= %s
+                  AND r.timestamp_utc <= %s
+                  AND {value_filter}
+            """
+        else:
+            count_query = """
+                SELECT COUNT(*) as total_count
+                FROM readings r
+                WHERE r.parameter_id = %s
+                  AND r.timestamp_utc >= %s
+                  AND r.timestamp_utc <= %s
+                  AND r.value IS NOT NULL
+            """
         
         count_result = execute_query(count_query, (parameter_id, start_date, end_date), fetch=True)
         total_records = count_result[0]['total_count'] if count_result else 0
         
         # STEP 2: Decidi se usare downsampling
         use_downsampling = (data_type == 'numeric' and total_records > limit)
+        resolution = RAW_RESOLUTION
+        # Nei formati binari le righe arrivano come tuple o già in colonne
+        readings_format = negotiate_readings_format()
+        columnar = readings_format != 'json'
         
         if use_downsampling:
-            # DOWNSAMPLING: Usa bucket logic solo se necessario
-            duration_seconds = (end_date - start_date).total_seconds()
-            num_buckets = max(1, limit // 2)
-            interval_seconds = max(1, duration_seconds / num_buckets)
-
-            readings_query = """
-                WITH buckets AS (
-                    SELECT 
-                        r.timestamp_utc, r.value,
-                        floor(extract(epoch from r.timestamp_utc) / %s) as bucket_id
-                    FROM readings r
-                    WHERE r.parameter_id = %s
-                      AND r.timestamp_utc >= %s
-                      AND r.timestamp_utc <= %s
-                      AND r.value IS NOT NULL
-                ),
-                min_max_points AS (
-                    (SELECT DISTINCT ON (bucket_id) timestamp_utc, value FROM buckets ORDER BY bucket_id, value ASC)
-                    UNION ALL
-                    (SELECT DISTINCT ON (bucket_id) timestamp_utc, value FROM buckets ORDER BY bucket_id, value DESC)
-                )
-                SELECT timestamp_utc, value FROM min_max_points ORDER BY timestamp_utc ASC
-            """
-            params = (interval_seconds, parameter_id, start_date, end_date)
+            # DOWNSAMPLING: modalità scelta dal client, al massimo `limit` punti
+            db_results, resolution = downsample_readings(
+                parameter_id, start_date, end_date, limit, downsample_mode, columnar
+            )
         else:
             # NO DOWNSAMPLING: Query normale se sotto il limite
-            readings_query = """
-                SELECT r.timestamp_utc, r.value
+            if data_type == 'numeric':
+                value_expr, value_filter = numeric_value_sql()
+                value_select, value_filter = f"{value_expr} as value", f"AND {value_filter}"
+            else:
+                value_select, value_filter = "r.value", ""
+            readings_query = f"""
+                SELECT r.timestamp_utc, {value_select}
                 FROM readings r
                 WHERE r.parameter_id = %s
                   AND r.timestamp_utc >= %s
                   AND r.timestamp_utc <= %s
+                  {value_filter}
                 ORDER BY r.timestamp_utc DESC
                 LIMIT %s
             """
             params = (parameter_id, start_date, end_date, limit)
+            if columnar:
+                db_results = execute_query_rows(readings_query, params) or []
+            else:
+                db_results = execute_query(readings_query, params, fetch=True)
 
-        db_results = execute_query(readings_query, params, fetch=True)
-
-        # STEP 3: Formatta readings
-        readings_list = []
-        for row in db_results:
-            ts = row['timestamp_utc']
-            val = row['value']
-            
-            if ts is None:
-                continue
+        # STEP 3: Formatta readings (colonne timestamp_ms/value nei formati binari)
+        if columnar:
+            readings_list = readings_to_columns(db_results, data_type == 'numeric')
+            sample_count = len(readings_list['timestamp_ms'])
+        else:
+            readings_list = []
+            for row in db_results:
+                ts = row['timestamp_utc']
+                val = row['value']
                 
-            ts_iso = ts.isoformat() if hasattr(ts, 'isoformat') else str(ts).replace(' ', 'T')
-            
-            try:
-                val_formatted = float(val) if isinstance(val, (int, float)) or (isinstance(val, str) and val.replace('.','',1).isdigit()) else val
-            except:
-                val_formatted = val
+                if ts is None:
+                    continue
+                    
+                ts_iso = ts.isoformat() if hasattr(ts, 'isoformat') else str(ts).replace(' ', 'T')
+                
+                try:
+                    val_formatted = float(val) if isinstance(val, (int, float)) or (isinstance(val, str) and val.replace('.','',1).isdigit()) else val
+                except:
+                    val_formatted = val
 
-            readings_list.append({
-                'timestamp_utc': ts_iso,
-                'value': val_formatted
-            })
+                readings_list.append({
+                    'timestamp_utc': ts_iso,
+                    'value': val_formatted
+                })
+            sample_count = len(readings_list)
         
-        # STEP 4: STATISTICHE DB SEPARATE (sempre su tutti i record)
+        # STEP 4: STATISTICHE DB (sempre su tutti i record, calcolate allo STEP 1)
         if data_type == 'numeric':
-            stats_query = """
-                SELECT 
-                    COUNT(*) as count,
-                    COUNT(CASE WHEN r.value ~ '^[0-9]*\.?[0-9]+$' THEN 1 END) as numeric_count,
-                    MIN(CAST(r.value AS FLOAT)) as min_val,
-                    MAX(CAST(r.value AS FLOAT)) as max_val,
-                    AVG(CAST(r.value AS FLOAT)) as avg_val
-                FROM readings r
-                WHERE r.parameter_id = %s
-                  AND r.timestamp_utc >= %s
-                  AND r.timestamp_utc <= %s
-                  AND r.value IS NOT NULL
-                  AND r.value ~ '^[0-9]*\.?[0-9]+$'
-            """
-            
-            stats_result = execute_query(stats_query, (parameter_id, start_date, end_date), fetch=True)
-            
-            if stats_result and stats_result[0]['numeric_count'] > 0:
-                stats_row = stats_result[0]
+            if total_records > 0:
+                stats_row = count_result[0]
                 stats = {
-                    'count': int(stats_row['count']),
-                    'numeric_count': int(stats_row['numeric_count']),
+                    'count': int(total_records),
+                    'numeric_count': int(total_records),
                     'min': round(float(stats_row['min_val']), 3),
                     'max': round(float(stats_row['max_val']), 3),
                     'avg': round(float(stats_row['avg_val']), 3),
                     'total_records_in_period': total_records,
                     'downsampled': use_downsampling,
-                    'chart_samples': len(readings_list)
+                    'chart_samples': sample_count
                 }
             else:
                 stats = {
@@ -413,7 +448,7 @@ def get_parameter_readings_multiformat_fixed(parameter_id):
                     'avg': None,
                     'total_records_in_period': total_records,
                     'downsampled': use_downsampling,
-                    'chart_samples': len(readings_list)
+                    'chart_samples': sample_count
                 }
         else:
             # Per file/cartelle
@@ -425,7 +460,7 @@ def get_parameter_readings_multiformat_fixed(parameter_id):
                 'file_types': content_analysis.get('file_types', {}),
                 'mixed_content': content_analysis.get('mixed_content', False),
                 'downsampled': False,
-                'chart_samples': len(readings_list)
+                'chart_samples': sample_count
             }
         
         # Determina tipo contenuto
@@ -460,11 +495,13 @@ def get_parameter_readings_multiformat_fixed(parameter_id):
                 'end_date': end_date.isoformat(),
                 'limit': limit,
                 'total_records_found': total_records,
-                'downsampling_applied': use_downsampling
+                'downsampling_applied': use_downsampling,
+                'downsample_mode': downsample_mode if use_downsampling else None,
+                'resolution': resolution
             }
         }
         
-        return jsonify(response_data)
+        return readings_response(response_data, readings_format)
         
     except Exception as e:
         logging.error(f"Errore API parameter readings multiformat {parameter_id}: {e}")
@@ -473,7 +510,104 @@ def get_parameter_readings_multiformat_fixed(parameter_id):
             'message': str(e)
         }), 500
 
+# =================================================================
+# QUERY BATCH PER I READINGS DI CANALE
+# =================================================================
+
+def fetch_channel_numeric_stats(parameter_ids, start_date, end_date):
+    """
+    Count e statistiche (min/max/avg) dei valori numerici di più parametri
+    con una sola scansione index-only su value_num raggruppata per parameter_id.
+    Restituisce {parameter_id: {'total_records', 'count', 'min', 'max', 'avg'}}
+    """
+    if not parameter_ids:
+        return {}
+    
+    value_expr, value_filter = numeric_value_sql()
+    stats_query = f"""
+        SELECT 
+            r.parameter_id,
+            COUNT(*) as total_records,
+            COUNT(*) as count,
+            MIN({value_expr}) as min,
+            MAX({value_expr}) as max,
+            AVG({value_expr}) as avg
+        FROM readings r
+        WHERE r.parameter_id = ANY(%s)
+          AND r.timestamp_utc BETWEEN %s AND %s 
+          AND {value_filter}
+        GROUP BY r.parameter_id
+    """
+    stats_result = execute_query(stats_query, (list(parameter_ids), start_date, end_date), fetch=True) or []
+    return {row['parameter_id']: row for row in stats_result}
+
+def fetch_latest_readings_batch(parameter_ids, start_date, end_date, limit, numeric=False, columnar=False):
+    """
+    Ultimi `limit` readings del periodo per ciascun parametro (più recenti prima)
+    con una sola query LATERAL. Con numeric=True legge solo value_num (index-only).
+    Restituisce {parameter_id: rows}; con columnar=True rows sono tuple
+    (timestamp_utc, value) per readings_to_columns, altrimenti dict.
+    """
+    if not parameter_ids:
+        return {}
+    
+    if numeric:
+        value_expr, value_filter = numeric_value_sql()
+        value_select, value_filter = f"{value_expr} as value", f"AND {value_filter}"
+    else:
+        value_select, value_filter = "r.value", ""
+    
+    query = f"""
+        SELECT p.parameter_id, l.timestamp_utc, l.value
+        FROM unnest(%s::int[]) AS p(parameter_id)
+        CROSS JOIN LATERAL (
+            SELECT r.timestamp_utc, {value_select}
+            FROM readings r
+            WHERE r.parameter_id = p.parameter_id
+              AND r.timestamp_utc BETWEEN %s AND %s
+              {value_filter}
+            ORDER BY r.timestamp_utc DESC
+            LIMIT %s
+        ) l
+        ORDER BY p.parameter_id, l.timestamp_utc DESC
+    """
+    
+    params = (list(parameter_ids), start_date, end_date, limit)
+    readings = {}
+    if columnar:
+        for row in execute_query_rows(query, params) or []:
+            readings.setdefault(row[0], []).append(row[1:])
+        return readings
+    for row in execute_query(query, params, fetch=True) or []:
+        readings.setdefault(row.pop('parameter_id'), []).append(row)
+    return readings
+
+def log_channel_readings_diagnostic(parameters, parameter_ids, start_date, end_date):
+    """Diagnostica valori numerici (opt-in con ?diagnostic=1): una query raggruppata per parametro"""
+    if not parameter_ids:
+        return
+    
+    value_expr, _ = numeric_value_sql()
+    debug_query = f"""
+        SELECT 
+            r.parameter_id,
+            COUNT(*) as total_count,
+            COUNT({value_expr}) as numeric_count,
+            COUNT(r.value) as non_null_count,
+            MIN(r.value) as min_text,
+            MAX(r.value) as max_text,
+            string_agg(DISTINCT r.value, ', ') as sample_values
+        FROM readings r
+        WHERE r.parameter_id = ANY(%s)
+          AND r.timestamp_utc BETWEEN %s AND %s 
+        GROUP BY r.parameter_id
+    """
+    names = {p['parameter_id']: p['name'] for p in parameters}
+    for row in execute_query(debug_query, (list(parameter_ids), start_date, end_date), fetch=True) or []:
+        logging.info(f"DEBUG parametro {names.get(row['parameter_id'])} (ID {row['parameter_id']}): {row}")
+
 @multi_format_api.route('/readings/channel/<int:channel_id>')
+@cached_readings_response('channel', 'channel_id', default_limit=500)
 def get_channel_readings_multiformat_fixed(channel_id):
     """
     API CORRETTA per ottenere readings di un canale con downsampling intelligente
@@ -482,18 +616,18 @@ def get_channel_readings_multiformat_fixed(channel_id):
         # Parsing parametri query
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
-        limit = request.args.get('limit', 500, type=int)
+        limit = resolve_readings_limit(500)
+        downsample_mode = request.args.get('downsample', DEFAULT_DOWNSAMPLE_MODE).lower()
         
-        # Default dates
-        if not end_date:
-            end_date = datetime.now()
-        else:
-            end_date = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-            
-        if not start_date:
-            start_date = end_date - timedelta(days=7)
-        else:
-            start_date = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
+        if downsample_mode not in DOWNSAMPLE_MODES:
+            return jsonify({
+                'error': 'Modalità downsampling non valida',
+                'downsample': downsample_mode,
+                'supported': list(DOWNSAMPLE_MODES)
+            }), 400
+        
+        # Default dates (range normalizzato come la chiave della cache)
+        start_date, end_date = resolve_readings_range(start_date, end_date)
         
         # Query info canale
         channel_info_query = """
@@ -533,136 +667,73 @@ def get_channel_readings_multiformat_fixed(channel_id):
         
         readings_by_parameter = {}
         parameter_stats = []
+        readings_format = negotiate_readings_format()
+        # parameter_id del canale per l'invalidazione della cache
+        g.readings_parameter_ids = [p['parameter_id'] for p in parameters_in_channel]
+        
+        numeric_ids = [p['parameter_id'] for p in parameters_in_channel if p['data_type'] == 'numeric']
+        
+        # STEP 1: Count + statistiche di tutti i parametri numerici in una sola query
+        numeric_stats = fetch_channel_numeric_stats(numeric_ids, start_date, end_date)
+        
+        if request.args.get('diagnostic', '0') in ('1', 'true'):
+            log_channel_readings_diagnostic(parameters_in_channel, numeric_ids, start_date, end_date)
+        
+        # STEP 2: Downsampling (batch) solo per i parametri oltre il limite
+        downsample_ids = [
+            p_id for p_id in numeric_ids
+            if numeric_stats.get(p_id, {}).get('total_records', 0) > limit
+        ]
+        columnar = readings_format != 'json'
+        downsampled_series, downsample_resolution = downsample_readings_batch(
+            downsample_ids, start_date, end_date, limit, downsample_mode, columnar
+        )
+        
+        # STEP 3: Ultimi `limit` readings degli altri parametri (una query numerici, una file)
+        latest_readings = fetch_latest_readings_batch(
+            [p_id for p_id in numeric_ids if p_id not in downsampled_series],
+            start_date, end_date, limit, numeric=True, columnar=columnar
+        )
+        latest_readings.update(fetch_latest_readings_batch(
+            [p['parameter_id'] for p in parameters_in_channel if p['data_type'] != 'numeric'],
+            start_date, end_date, limit, columnar=columnar
+        ))
         
         for p in parameters_in_channel:
             p_id = p['parameter_id']
             p_name = p['name']
             p_type = p['data_type']
             
-            # NUOVO: Downsampling intelligente
-            if p_type == 'numeric':
-                # STEP 1: Count totale record per questo parametro
-                count_query = """
-                    SELECT COUNT(*) as total_records
-                    FROM readings 
-                    WHERE parameter_id = %s 
-                      AND timestamp_utc BETWEEN %s AND %s 
-                      AND value IS NOT NULL
-                """
-                count_result = execute_query(count_query, (p_id, start_date, end_date), fetch=True)
-                total_records = count_result[0]['total_records'] if count_result else 0
-                
-                # STEP 2: Decide if downsampling is needed
-                use_downsampling = total_records > limit
-                
-                if use_downsampling:
-                    # Downsampling bucket logic
-                    duration_sec = (end_date - start_date).total_seconds()
-                    num_buckets = max(1, limit // 2)
-                    interval_sec = max(1, duration_sec / num_buckets)
-                    
-                    query = """
-                        WITH buckets AS (
-                            SELECT r.timestamp_utc, r.value,
-                                   floor(extract(epoch from r.timestamp_utc) / %s) as bucket_id
-                            FROM readings r
-                            WHERE r.parameter_id = %s AND r.timestamp_utc BETWEEN %s AND %s AND r.value IS NOT NULL
-                        ),
-                        min_max AS (
-                            (SELECT DISTINCT ON (bucket_id) timestamp_utc, value FROM buckets ORDER BY bucket_id, value ASC)
-                            UNION ALL
-                            (SELECT DISTINCT ON (bucket_id) timestamp_utc, value FROM buckets ORDER BY bucket_id, value DESC)
-                        )
-                        SELECT timestamp_utc, value FROM min_max ORDER BY timestamp_utc ASC
-                    """
-                    params = (interval_sec, p_id, start_date, end_date)
-                else:
-                    # Normal query without downsampling
-                    query = """
-                        SELECT timestamp_utc, value 
-                        FROM readings 
-                        WHERE parameter_id = %s AND timestamp_utc BETWEEN %s AND %s AND value IS NOT NULL
-                        ORDER BY timestamp_utc DESC LIMIT %s
-                    """
-                    params = (p_id, start_date, end_date, limit)
-                
-                # STEP 3: Statistiche SEMPRE su tutti i record + DEBUG
-                # Query di debug per capire il problema MIN
-                debug_query = """
-                    SELECT 
-                        COUNT(*) as total_count,
-                        COUNT(CASE WHEN value ~ '^-?[0-9]+\.?[0-9]*$|^-?[0-9]*\.[0-9]+$' THEN 1 END) as numeric_count,
-                        COUNT(CASE WHEN value IS NOT NULL THEN 1 END) as non_null_count,
-                        MIN(value) as min_text,
-                        MAX(value) as max_text,
-                        string_agg(DISTINCT value, ', ') as sample_values
-                    FROM readings 
-                    WHERE parameter_id = %s 
-                      AND timestamp_utc BETWEEN %s AND %s 
-                    LIMIT 1
-                """
-                debug_result = execute_query(debug_query, (p_id, start_date, end_date), fetch=True)
-                if debug_result:
-                    logging.info(f"DEBUG parametro {p_name} (ID {p_id}): {debug_result[0]}")
-                
-                # Query statistiche migliorata con CASE WHEN
-                stats_query = """
-                    WITH numeric_values AS (
-                        SELECT 
-                            CASE 
-                                WHEN value ~ '^-?[0-9]+\.?[0-9]*$' THEN CAST(value AS FLOAT)
-                                WHEN value ~ '^-?[0-9]*\.[0-9]+$' THEN CAST(value AS FLOAT)
-                                ELSE NULL
-                            END as numeric_value
-                        FROM readings 
-                        WHERE parameter_id = %s 
-                          AND timestamp_utc BETWEEN %s AND %s 
-                          AND value IS NOT NULL
-                    )
-                    SELECT 
-                        COUNT(*) as count,
-                        MIN(numeric_value) as min,
-                        MAX(numeric_value) as max,
-                        AVG(numeric_value) as avg
-                    FROM numeric_values 
-                    WHERE numeric_value IS NOT NULL
-                """
-                stats_result = execute_query(stats_query, (p_id, start_date, end_date), fetch=True)
-                
+            use_downsampling = p_id in downsampled_series
+            if use_downsampling:
+                db_data = downsampled_series[p_id]
+                resolution = downsample_resolution
             else:
-                # Query standard per file/cartelle
-                total_records = 0
-                use_downsampling = False
-                query = """
-                    SELECT timestamp_utc, value FROM readings 
-                    WHERE parameter_id = %s AND timestamp_utc BETWEEN %s AND %s
-                    ORDER BY timestamp_utc DESC LIMIT %s
-                """
-                params = (p_id, start_date, end_date, limit)
-                stats_result = None
-
-            # Esegui query dati
-            db_data = execute_query(query, params, fetch=True)
+                db_data = latest_readings.get(p_id, [])
+                resolution = RAW_RESOLUTION
             
-            # Formattazione sicura
-            param_readings = []
-            for row in db_data:
-                ts = row['timestamp_utc']
-                ts_iso = ts.isoformat() if hasattr(ts, 'isoformat') else str(ts).replace(' ', 'T')
-                
-                param_readings.append({
-                    'timestamp_utc': ts_iso,
-                    'value': float(row['value']) if p_type == 'numeric' and row['value'] is not None else row['value']
-                })
+            # Formattazione sicura (colonne timestamp_ms/value nei formati binari)
+            if columnar:
+                param_readings = readings_to_columns(db_data, p_type == 'numeric')
+                sample_count = len(param_readings['timestamp_ms'])
+            else:
+                param_readings = []
+                for row in db_data:
+                    ts = row['timestamp_utc']
+                    ts_iso = ts.isoformat() if hasattr(ts, 'isoformat') else str(ts).replace(' ', 'T')
+                    
+                    param_readings.append({
+                        'timestamp_utc': ts_iso,
+                        'value': float(row['value']) if p_type == 'numeric' and row['value'] is not None else row['value']
+                    })
+                sample_count = len(param_readings)
             
             readings_by_parameter[p_name] = param_readings
             
             # Crea statistiche per parametro
-            if p_type == 'numeric' and stats_result and len(stats_result) > 0:
-                stat_data = stats_result[0]
-                
-                # Debug logging per problemi statistiche
-                logging.info(f"Stats per parametro {p_name}: {stat_data}")
+            if p_type == 'numeric':
+                stat_data = numeric_stats.get(p_id, {})
+                total_records = stat_data.get('total_records', 0)
                 
                 # Parsing sicuro dei valori
                 try:
@@ -679,8 +750,9 @@ def get_channel_readings_multiformat_fixed(channel_id):
                     'parameter_name': p_name,
                     'content_type': 'numeric',
                     'total_records_in_period': total_records,
-                    'chart_samples': len(param_readings),
+                    'chart_samples': sample_count,
                     'downsampled': use_downsampling,
+                    'resolution': resolution,
                     'count': count_val,
                     'min': min_val,
                     'max': max_val,
@@ -691,11 +763,12 @@ def get_channel_readings_multiformat_fixed(channel_id):
                 stat = {
                     'parameter_id': p_id,
                     'parameter_name': p_name,
-                    'content_type': 'file' if p_type != 'numeric' else 'numeric',
-                    'total_records_in_period': total_records,
-                    'chart_samples': len(param_readings),
-                    'downsampled': use_downsampling,
-                    'count': len(param_readings)
+                    'content_type': 'file',
+                    'total_records_in_period': 0,
+                    'chart_samples': sample_count,
+                    'downsampled': False,
+                    'resolution': resolution,
+                    'count': sample_count
                 }
             
             parameter_stats.append(stat)
@@ -737,11 +810,12 @@ def get_channel_readings_multiformat_fixed(channel_id):
                 'channel_id': channel_id,
                 'start_date': start_date.isoformat(),
                 'end_date': end_date.isoformat(),
-                'limit_per_parameter': limit
+                'limit_per_parameter': limit,
+                'downsample_mode': downsample_mode
             }
         }
         
-        return jsonify(response_data)
+        return readings_response(response_data, readings_format)
         
     except Exception as e:
         logging.error(f"Errore API channel readings multiformat {channel_id}: {e}")
@@ -755,29 +829,12 @@ def get_channel_readings_multiformat_fixed(channel_id):
 # API per gestione file
 @multi_format_api.route('/files/view/<path:file_path>')
 def view_file(file_path):
-    """API per visualizzare un file (per PDF, immagini, video)"""
+    """API per visualizzare un file (per PDF, immagini, video) con supporto Range"""
     try:
         import urllib.parse
         file_path = urllib.parse.unquote(file_path)
         
-        # Determina il tipo MIME
-        mime_type, _ = mimetypes.guess_type(file_path)
-        if not mime_type:
-            mime_type = 'application/octet-stream'
-        
-        try:
-            # Scarica da Minio
-            file_content = get_file_from_minio(file_path)
-            
-            return Response(
-                file_content,
-                mimetype=mime_type,
-                headers={'Content-Disposition': 'inline'}
-            )
-            
-        except Exception as minio_error:
-            logging.error(f"Errore view file {file_path}: {minio_error}")
-            return jsonify({'error': 'File non trovato'}), 404
+        return minio_range_response(file_path, disposition='inline')
         
     except Exception as e:
         logging.error(f"Errore view file {file_path}: {e}")
@@ -786,30 +843,12 @@ def view_file(file_path):
 
 @multi_format_api.route('/files/download/<path:file_path>')
 def download_file(file_path):
-    """API per scaricare un file"""
+    """API per scaricare un file (download ripresi via Range)"""
     try:
         import urllib.parse
         file_path = urllib.parse.unquote(file_path)
         
-        filename = os.path.basename(file_path)
-        
-        mime_type, _ = mimetypes.guess_type(file_path)
-        if not mime_type:
-            mime_type = 'application/octet-stream'
-        
-        try:
-            # Scarica da Minio
-            file_content = get_file_from_minio(file_path)
-            
-            return Response(
-                file_content,
-                mimetype=mime_type,
-                headers={'Content-Disposition': f'attachment; filename="{filename}"'}
-            )
-            
-        except Exception as minio_error:
-            logging.error(f"Errore download file {file_path}: {minio_error}")
-            return jsonify({'error': 'File non trovato'}), 404
+        return minio_range_response(file_path, disposition='attachment')
         
     except Exception as e:
         logging.error(f"Errore download file {file_path}: {e}")
@@ -818,14 +857,18 @@ def download_file(file_path):
 @multi_format_api.route('/files/preview/<path:file_path>')
 def preview_file(file_path):
     """
-    API per preview ottimizzata (thumbnail per immagini, etc.)
+    API per preview ottimizzata: thumbnail per immagini (?w=larghezza),
+    prima pagina per PDF, prime righe per CSV; originale per gli altri tipi
     """
     try:
         import urllib.parse
         file_path = urllib.parse.unquote(file_path)
         
-        # Per ora usa la stessa logica di view, ma potresti implementare
-        # thumbnail generation per immagini, preview per PDF, etc.
+        response = derivative_response(file_path, request.args.get('w', type=int))
+        if response is not None:
+            return response
+        
+        # Video e tipi senza derivato: originale (con supporto Range)
         return view_file(file_path)
         
     except Exception as e:
@@ -835,30 +878,35 @@ def preview_file(file_path):
 @multi_format_api.route('/files/csv-data/<path:file_path>')
 def get_csv_data(file_path):
     """
-    API per ottenere dati CSV parsati per grafici
+    API per ottenere dati CSV parsati per grafici e tabelle, a finestre:
+    ?offset=&limit= righe, ?columns=a,b proiezione colonne,
+    ?downsample=N punti min/max per grafico (?y=colonna)
     """
     try:
         import urllib.parse
         
         file_path = urllib.parse.unquote(file_path)
         
+        columns = [c for c in request.args.get('columns', '').split(',') if c] or None
+        offset = max(0, request.args.get('offset', 0, type=int))
+        limit = min(max(1, request.args.get('limit', CSV_DEFAULT_LIMIT, type=int)), CSV_MAX_LIMIT)
+        downsample_points = request.args.get('downsample', 0, type=int)
+        
         try:
-            # Scarica file da Minio (usa bucket di default)
-            csv_content = get_file_from_minio(file_path)
-            csv_data = csv_content.decode('utf-8')
-            
-            # Carica CSV usando pandas
-            df = pd.read_csv(io.StringIO(csv_data))
-            
-            data = {
-                'columns': df.columns.tolist(),
-                'rows': df.to_dict('records'),
-                'shape': df.shape,
-                'dtypes': {col: str(dtype) for col, dtype in df.dtypes.items()}
-            }
+            if downsample_points > 0:
+                data = downsample_csv(
+                    file_path,
+                    min(downsample_points, CSV_MAX_DOWNSAMPLE_POINTS),
+                    columns=columns,
+                    y_column=request.args.get('y')
+                )
+            else:
+                data = read_csv_window(file_path, offset=offset, limit=limit, columns=columns)
             
             return jsonify(data)
             
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         except Exception as minio_error:
             logging.error(f"Errore Minio CSV {file_path}: {minio_error}")
             return jsonify({'error': f'File CSV non trovato: {str(minio_error)}'}), 404
@@ -871,28 +919,31 @@ def get_csv_data(file_path):
 @multi_format_api.route('/files/json-data/<path:file_path>')
 def get_json_data(file_path):
     """
-    API per ottenere dati JSON per tabella
+    API per navigare un JSON senza caricarlo intero:
+    ?pointer=/a/0 nodo (JSON pointer), ?offset=&limit= pagina dei figli,
+    ?summary=1 solo forma del nodo (tipo, byte, numero e tipo dei figli)
     """
     try:
         import urllib.parse
-        import json
         
         file_path = urllib.parse.unquote(file_path)
         
+        pointer = request.args.get('pointer', '')
+        offset = max(0, request.args.get('offset', 0, type=int))
+        limit = min(max(1, request.args.get('limit', JSON_DEFAULT_LIMIT, type=int)), JSON_MAX_LIMIT)
+        
         try:
-            # Scarica file da Minio (usa bucket di default)
-            json_content = get_file_from_minio(file_path)
-            json_data_str = json_content.decode('utf-8')
-            
-            # Parse JSON
-            json_data = json.loads(json_data_str)
+            if request.args.get('summary', '').lower() in ('1', 'true'):
+                data = json_summary(file_path, pointer, limit=limit)
+            else:
+                data = read_json_node(file_path, pointer, offset=offset, limit=limit)
             
-            return jsonify({
-                'data': json_data,
-                'type': type(json_data).__name__,
-                'size': len(json_data_str)
-            })
+            return jsonify(data)
             
+        except KeyError as e:
+            return jsonify({'error': e.args[0]}), 404
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         except Exception as minio_error:
             logging.error(f"Errore Minio JSON {file_path}: {minio_error}")
             return jsonify({'error': f'File JSON non trovato: {str(minio_error)}'}), 404
@@ -905,11 +956,13 @@ def get_json_data(file_path):
 @multi_format_api.route('/files/list-folder/<path:folder_path>')
 def list_folder_contents(folder_path):
     """
-    API per listare i contenuti di una cartella Minio
+    API per listare i contenuti di una cartella Minio (un solo livello, a pagine):
+    ?token= pagina successiva (next_token), ?limit= elementi per pagina,
+    ?refresh=1 ignora la cache, ?aggregates=1 aggiunge gli aggregati
+    (se abilitati con MINIO_LISTING_AGGREGATES)
     """
     try:
         import urllib.parse
-        from utils.minio_client import get_minio_client, get_minio_bucket_name
         
         folder_path = urllib.parse.unquote(folder_path)
         
@@ -917,40 +970,38 @@ def list_folder_contents(folder_path):
         if not folder_path.endswith('/'):
             folder_path += '/'
         
-        minio_client = get_minio_client()
-        bucket_name = get_minio_bucket_name()  # Usa la tua funzione
-        
-        # Lista oggetti nella cartella
-        objects = minio_client.list_objects(bucket_name, prefix=folder_path, recursive=True)
-        
-        folders = set()
-        files = []
-        
-        for obj in objects:
-            # Rimuovi il prefisso della cartella principale
-            relative_path = obj.object_name[len(folder_path):]
-            
-            if '/' in relative_path:
-                # È in una sottocartella
-                subfolder = relative_path.split('/')[0]
-                folders.add(subfolder)
-            else:
-                # È un file nella cartella corrente
-                if relative_path:  # Ignora la cartella stessa
-                    files.append({
-                        'name': relative_path,
-                        'path': obj.object_name,
-                        'size': obj.size,
-                        'last_modified': obj.last_modified.isoformat() if obj.last_modified else None,
-                        'type': get_file_type(relative_path)
-                    })
+        try:
+            page = list_folder_page(
+                folder_path,
+                token=request.args.get('token'),
+                limit=request.args.get('limit', type=int),
+                classify=get_file_type,
+                refresh=request.args.get('refresh', '').lower() in ('1', 'true')
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Aggregati solo su richiesta: quelli già calcolati (cartella e sottocartelle)
+        # sono restituiti subito, gli altri partono in background (listing ricorsivo)
+        aggregates, folder_aggregates = None, {}
+        if request.args.get('aggregates', '').lower() in ('1', 'true'):
+            aggregates = get_folder_aggregates(folder_path, classify=get_file_type)
+            folder_aggregates = {
+                name: get_folder_aggregates(f"{folder_path}{name}/", classify=get_file_type)
+                for name in page['folders']
+            }
         
         return jsonify({
             'folder_path': folder_path,
-            'folders': sorted(list(folders)),
-            'files': files,
-            'total_folders': len(folders),
-            'total_files': len(files)
+            'folders': page['folders'],
+            'files': page['files'],
+            'total_folders': len(page['folders']),
+            'total_files': len(page['files']),
+            'has_more': page['has_more'],
+            'next_token': page['next_token'],
+            'cached': page['cached'],
+            'aggregates': aggregates,
+            'folder_aggregates': folder_aggregates
         })
         
     except Exception as e:
@@ -961,12 +1012,9 @@ def list_folder_contents(folder_path):
 @multi_format_api.route('/files/download-zip', methods=['POST'])
 def download_files_as_zip():
     """
-    API per scaricare file multipli come ZIP
+    API per scaricare file multipli come ZIP (generato in streaming)
     """
     try:
-        import zipfile
-        import tempfile
-        import os
         from utils.minio_client import get_minio_client, get_minio_bucket_name
         
         data = request.json
@@ -983,41 +1031,8 @@ def download_files_as_zip():
         
         logging.info(f"Usando bucket: {bucket_name}")
         
-        # Crea ZIP in memoria invece di file temporaneo
-        import io
-        zip_buffer = io.BytesIO()
-        
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            
-            for i, file_path in enumerate(file_paths):
-                try:
-                    logging.info(f"Processando file {i+1}/{len(file_paths)}: {file_path}")
-                    
-                    # Scarica da Minio
-                    file_obj = minio_client.get_object(bucket_name, file_path)
-                    file_data = file_obj.read()
-                    
-                    # Nome del file nello ZIP (solo il nome, non tutto il path)
-                    file_name = os.path.basename(file_path)
-                    
-                    # Aggiungi al ZIP
-                    zipf.writestr(file_name, file_data)
-                    logging.info(f"Aggiunto al ZIP: {file_name} ({len(file_data)} bytes)")
-                    
-                except Exception as e:
-                    logging.error(f"Errore aggiunta file {file_path} al ZIP: {e}")
-                    # Continua con gli altri file
-                    continue
-        
-        # Ottieni dati ZIP dalla memoria
-        zip_buffer.seek(0)
-        zip_data = zip_buffer.getvalue()
-        zip_buffer.close()
-        
-        logging.info(f"ZIP creato in memoria: {len(zip_data)} bytes")
-        
         return Response(
-            zip_data,
+            stream_with_context(generate_minio_zip(minio_client, bucket_name, file_paths)),
             mimetype='application/zip',
             headers={'Content-Disposition': f'attachment; filename="{zip_name}"'}
         )
@@ -1032,47 +1047,25 @@ def get_parameter_table_data(parameter_id):
     end_date = request.args.get('end_date', '').replace('T', ' ')[:19]
     page = int(request.args.get('page', 1))
     per_page = int(request.args.get('per_page', 50))
-    offset = (page - 1) * per_page
+    cursor = request.args.get('cursor')
+    exact_count = request.args.get('exact_count', '0') in ('1', 'true')
 
     try:
-        # Query Dati con fetch=True
-        query = """
-            SELECT timestamp_utc, value 
-            FROM readings 
-            WHERE parameter_id = %s 
-            AND timestamp_utc BETWEEN %s AND %s
-            ORDER BY timestamp_utc DESC
-            LIMIT %s OFFSET %s
-        """
-        rows = execute_query(query, (int(parameter_id), str(start_date), str(end_date), int(per_page), int(offset)), fetch=True)
-        
-        if not isinstance(rows, list):
-            rows = []
-
-        # Query Conteggio con fetch=True
-        count_query = """
-            SELECT COUNT(*) as total 
-            FROM readings 
-            WHERE parameter_id = %s 
-            AND timestamp_utc BETWEEN %s AND %s
-        """
-        count_result = execute_query(count_query, (int(parameter_id), str(start_date), str(end_date)), fetch=True)
-        
-        total_records = 0
-        if isinstance(count_result, list) and len(count_result) > 0:
-            res = count_result[0]
-            total_records = res.get('total', 0) if isinstance(res, dict) else res[0]
+        # Pagina a cursore (o page per compatibilità) + totale stimato
+        rows, pagination = paginate_readings(
+            "r.value",
+            "r.parameter_id = %s AND r.timestamp_utc BETWEEN %s AND %s",
+            (int(parameter_id), str(start_date), str(end_date)),
+            per_page, cursor=cursor, page=page, exact_count=exact_count
+        )
 
         return jsonify({
             'status': 'success',
             'data': rows,
-            'pagination': {
-                'total': total_records,
-                'page': page,
-                'per_page': per_page,
-                'pages': (total_records + per_page - 1) // per_page if total_records > 0 else 1
-            }
+            'pagination': pagination
         })
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
     except Exception as e:
         logging.error(f"Errore critico: {e}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
@@ -1195,6 +1188,8 @@ def get_parameter_folders_paginated(parameter_id):
         end_date = request.args.get('end_date')
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 50, type=int)
+        cursor = request.args.get('cursor')
+        exact_count = request.args.get('exact_count', '0') in ('1', 'true')
         
         # Default dates
         if not end_date:
@@ -1230,35 +1225,13 @@ def get_parameter_folders_paginated(parameter_id):
         if info.get('data_type') == 'numeric':
             return jsonify({'error': 'Parametro numerico non supporta paginazione cartelle'}), 400
         
-        # Count totale cartelle
-        count_query = """
-            SELECT COUNT(*) as total
-            FROM readings r
-            WHERE r.parameter_id = %s
-              AND r.timestamp_utc >= %s
-              AND r.timestamp_utc <= %s
-              AND r.value IS NOT NULL
-        """
-        
-        count_result = execute_query(count_query, (parameter_id, start_date, end_date), fetch=True)
-        total_folders = count_result[0]['total'] if count_result else 0
-        
-        # Query cartelle paginate
-        offset = (page - 1) * per_page
-        
-        folders_query = """
-            SELECT r.timestamp_utc, r.value
-            FROM readings r
-            WHERE r.parameter_id = %s
-              AND r.timestamp_utc >= %s
-              AND r.timestamp_utc <= %s
-              AND r.value IS NOT NULL
-            ORDER BY r.timestamp_utc DESC
-            LIMIT %s OFFSET %s
-        """
-        
-        folders_result = execute_query(folders_query, 
-            (parameter_id, start_date, end_date, per_page, offset), fetch=True)
+        # Pagina a cursore (o page per compatibilità) + totale stimato
+        folders_result, pagination = paginate_readings(
+            "r.value",
+            "r.parameter_id = %s AND r.timestamp_utc >= %s AND r.timestamp_utc <= %s AND r.value IS NOT NULL",
+            (parameter_id, start_date, end_date),
+            per_page, cursor=cursor, page=page, exact_count=exact_count
+        )
         
         # Formatta cartelle
         folders = []
@@ -1272,26 +1245,19 @@ def get_parameter_folders_paginated(parameter_id):
                 'name': row['value'].split('/')[-1] if '/' in str(row['value']) else row['value']
             })
         
-        # Calcola paginazione
-        total_pages = (total_folders + per_page - 1) // per_page if total_folders > 0 else 1
-        
         return jsonify({
             'folders': folders,
             'parameter_info': info,
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': total_folders,
-                'pages': total_pages,
-                'has_prev': page > 1,
-                'has_next': page < total_pages
-            },
+            'pagination': pagination,
             'period_info': {
                 'start_date': start_date.isoformat(),
                 'end_date': end_date.isoformat()
             }
         })
         
+    except ValueError as e:
+        # Date o cursore non validi
+        return jsonify({'error': 'Parametri non validi', 'message': str(e)}), 400
     except Exception as e:
         logging.error(f"Errore API folders paginated {parameter_id}: {e}")
         return jsonify({
@@ -1310,6 +1276,8 @@ def get_parameter_files_paginated(parameter_id):
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)  # Meno file per pagina per gallery
         file_type = request.args.get('file_type', 'all')  # all, image, pdf, csv, json, video
+        cursor = request.args.get('cursor')
+        exact_count = request.args.get('exact_count', '0') in ('1', 'true')
         
         # Default dates
         if not end_date:
@@ -1322,15 +1290,9 @@ def get_parameter_files_paginated(parameter_id):
         else:
             start_date = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
         
-        # Query base files
-        files_query = """
-            SELECT r.timestamp_utc, r.value
-            FROM readings r
-            WHERE r.parameter_id = %s
-              AND r.timestamp_utc >= %s
-              AND r.timestamp_utc <= %s
-              AND r.value IS NOT NULL
-        """
+        # Filtro base files
+        files_where = "r.parameter_id = %s AND r.timestamp_utc >= %s AND r.timestamp_utc <= %s AND r.value IS NOT NULL"
+        files_params = [parameter_id, start_date, end_date]
         
         # Filtro per tipo file se specificato
         if file_type != 'all':
@@ -1343,24 +1305,14 @@ def get_parameter_files_paginated(parameter_id):
             }
             
             if file_type in type_extensions:
-                extensions = type_extensions[file_type]
-                ext_conditions = ' OR '.join([f"r.value ILIKE '%.{ext}'" for ext in extensions])
-                files_query += f" AND ({ext_conditions})"
-        
-        files_query += " ORDER BY r.timestamp_utc DESC"
+                files_where += " AND r.value ILIKE ANY(%s)"
+                files_params.append([f"%.{ext}" for ext in type_extensions[file_type]])
         
-        # Count totale
-        count_query = files_query.replace('SELECT r.timestamp_utc, r.value', 'SELECT COUNT(*) as total')
-        count_query = count_query.replace('ORDER BY r.timestamp_utc DESC', '')
-        
-        count_result = execute_query(count_query, (parameter_id, start_date, end_date), fetch=True)
-        total_files = count_result[0]['total'] if count_result else 0
-        
-        # Query paginata
-        offset = (page - 1) * per_page
-        paginated_query = files_query + f" LIMIT {per_page} OFFSET {offset}"
-        
-        files_result = execute_query(paginated_query, (parameter_id, start_date, end_date), fetch=True)
+        # Pagina a cursore (o page per compatibilità) + totale stimato
+        files_result, pagination = paginate_readings(
+            "r.value", files_where, files_params,
+            per_page, cursor=cursor, page=page, exact_count=exact_count
+        )
         
         # Formatta files
         files = []
@@ -1376,19 +1328,9 @@ def get_parameter_files_paginated(parameter_id):
                 'type': get_file_type(file_path)
             })
         
-        # Calcola paginazione
-        total_pages = (total_files + per_page - 1) // per_page if total_files > 0 else 1
-        
         return jsonify({
             'files': files,
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': total_files,
-                'pages': total_pages,
-                'has_prev': page > 1,
-                'has_next': page < total_pages
-            },
+            'pagination': pagination,
             'filter_info': {
                 'file_type': file_type,
                 'start_date': start_date.isoformat(),
@@ -1396,6 +1338,9 @@ def get_parameter_files_paginated(parameter_id):
             }
         })
         
+    except ValueError as e:
+        # Date o cursore non validi
+        return jsonify({'error': 'Parametri non validi', 'message': str(e)}), 400
     except Exception as e:
         logging.error(f"Errore API files paginated {parameter_id}: {e}")
         return jsonify({
@@ -1406,7 +1351,8 @@ def get_parameter_files_paginated(parameter_id):
 @multi_format_api.route('/readings/channel/<int:channel_id>/export')
 def export_channel_data_full(channel_id):
     """
-    NUOVO: Export completo dati canale (tutti i record, non sottocampionati)
+    Export completo dati canale (tutti i record, non sottocampionati)
+    CSV wide in streaming: una riga per timestamp, una colonna per parametro
     """
     try:
         start_date = request.args.get('start_date')
@@ -1423,117 +1369,180 @@ def export_channel_data_full(channel_id):
         else:
             start_date = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
         
-        # Query info canale
-        channel_info_query = """
-            SELECT c.name as channel_name, c.code as channel_code,
-                   i.name as item_name, a.name as area_name, s.name as scenario_name
-            FROM channels c
-            JOIN items i ON c.item_id = i.item_id
-            JOIN areas a ON i.area_id = a.area_id
-            JOIN scenarios s ON a.scenario_id = s.scenario_id
-            WHERE c.channel_id = %s
-        """
-        
-        channel_info = execute_query(channel_info_query, (channel_id,), fetch=True)
-        if not channel_info:
+        channel_exists = execute_query("SELECT 1 FROM channels WHERE channel_id = %s", (channel_id,), fetch=True)
+        if not channel_exists:
             return jsonify({'error': 'Canale non trovato'}), 404
-            
-        info = channel_info[0]
         
-        # Query tutti i parametri numerici
-        params_query = """
-            SELECT parameter_id, name 
-            FROM parameters 
-            WHERE channel_id = %s AND data_type = 'numeric'
-            ORDER BY name
-        """
-        parameters = execute_query(params_query, (channel_id,), fetch=True)
-        
-        if not parameters:
+        query, params, parameters = build_channel_pivot_query(channel_id, start_date, end_date)
+        if not query:
             return jsonify({'error': 'Nessun parametro numerico trovato'}), 404
         
-        # Query TUTTI i dati (no limit, no downsampling)
-        all_data_query = """
-            SELECT r.timestamp_utc, r.value, p.name as parameter_name
-            FROM readings r
-            JOIN parameters p ON r.parameter_id = p.parameter_id
-            WHERE p.channel_id = %s
-              AND r.timestamp_utc BETWEEN %s AND %s
-              AND p.data_type = 'numeric'
-              AND r.value IS NOT NULL
-            ORDER BY r.timestamp_utc DESC, p.name
-        """
-        
-        all_readings = execute_query(all_data_query, (channel_id, start_date, end_date), fetch=True)
-        
-        if not all_readings:
+        # Controllo economico (LIMIT 1) invece di caricare il periodo
+        has_data = execute_query(
+            """
+            SELECT 1 FROM readings
+            WHERE parameter_id = ANY(%s) AND timestamp_utc BETWEEN %s AND %s AND value IS NOT NULL
+            LIMIT 1
+            """,
+            params, fetch=True
+        )
+        if not has_data:
             return jsonify({'error': 'Nessun dato trovato nel periodo'}), 404
         
-        # NUOVO: Organizza dati in formato colonne per CSV
-        # Crea dizionario timestamp -> {param1: value1, param2: value2, ...}
-        data_by_timestamp = {}
-        param_names = [p['name'] for p in parameters]
+        header = generate_channel_header(channel_id, start_date, end_date)
         
-        for reading in all_readings:
-            ts = reading['timestamp_utc']
-            ts_str = ts.isoformat() if hasattr(ts, 'isoformat') else str(ts)
-            param_name = reading['parameter_name']
-            value = reading['value']
-            
-            if ts_str not in data_by_timestamp:
-                data_by_timestamp[ts_str] = {}
-            
-            data_by_timestamp[ts_str][param_name] = value
-        
-        # Ordina per timestamp
-        sorted_timestamps = sorted(data_by_timestamp.keys(), reverse=True)
-        
-        # Genera CSV
-        csv_content = []
-        
-        # Header informativo
-        csv_content.append(f"# Export Canale: {info['channel_name']} ({info['channel_code']})")
-        csv_content.append(f"# Scenario: {info['scenario_name']}")
-        csv_content.append(f"# Area: {info['area_name']}")
-        csv_content.append(f"# Item: {info['item_name']}")
-        csv_content.append(f"# Periodo: {start_date.strftime('%Y-%m-%d %H:%M:%S')} - {end_date.strftime('%Y-%m-%d %H:%M:%S')}")
-        csv_content.append(f"# Totale Record: {len(sorted_timestamps)}")
-        csv_content.append(f"# Export Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        csv_content.append("")
-        
-        # Header CSV con colonne per parametro
-        header_row = ["Timestamp"] + param_names
-        csv_content.append(",".join(header_row))
-        
-        # Righe dati
-        for timestamp in sorted_timestamps:
-            row = [timestamp]
-            timestamp_data = data_by_timestamp[timestamp]
-            
-            for param_name in param_names:
-                value = timestamp_data.get(param_name, "")
-                row.append(str(value) if value is not None else "")
-            
-            csv_content.append(",".join(row))
-        
-        # Crea risposta CSV
-        csv_string = "\n".join(csv_content)
+        def generate():
+            csv_stream = stream_channel_pivot_csv(query, params, parameters, header)
+            try:
+                for chunk in csv_stream:
+                    yield chunk
+            except Exception as e:
+                logging.error(f"Errore stream export canale {channel_id}: {e}")
+                yield f"Error: {str(e)}".encode('utf-8')
+            finally:
+                csv_stream.close()
         
-        # Response con BOM per Excel
-        response = Response(
-            '\ufeff' + csv_string,  # BOM UTF-8
+        return Response(
+            stream_with_context(generate()),
             mimetype='text/csv',
             headers={
                 'Content-Disposition': f'attachment; filename="channel_{channel_id}_export_{start_date.strftime("%Y%m%d")}_{end_date.strftime("%Y%m%d")}.csv"'
             }
         )
         
-        return response
-        
     except Exception as e:
         logging.error(f"Errore export canale {channel_id}: {e}")
         return jsonify({'error': str(e)}), 500
 
+# =============================================================================
+# EXPORT ASINCRONI (JOB IN BACKGROUND)
+# =============================================================================
+
+def parse_export_period():
+    """Periodo di export da start_date/end_date (default ultimi 7 giorni)"""
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+
+    if not end_date:
+        end_date = datetime.now()
+    else:
+        end_date = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
+
+    if not start_date:
+        start_date = end_date - timedelta(days=7)
+    else:
+        start_date = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
+
+    return start_date, end_date
+
+def submit_export_job_response(kind, item_id):
+    """Accoda l'export e risponde 202 con gli URL di stato e download"""
+    try:
+        start_date, end_date = parse_export_period()
+    except ValueError as e:
+        return jsonify({'error': f'Data non valida: {e}'}), 400
+
+    exists_query = {
+        'parameter': "SELECT 1 FROM parameters WHERE parameter_id = %s",
+        'channel': "SELECT 1 FROM channels WHERE channel_id = %s",
+    }[kind]
+    if not execute_query(exists_query, (item_id,), fetch=True):
+        return jsonify({'error': 'Parametro non trovato' if kind == 'parameter' else 'Canale non trovato'}), 404
+
+    try:
+        job = submit_export_job(get_current_user_id(), kind, item_id, start_date, end_date)
+    except ExportJobLimitError as e:
+        return jsonify({'error': 'too_many_export_jobs', 'message': str(e)}), 429
+    except Exception as e:
+        logging.error(f"Errore creazione export job {kind} {item_id}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+    job_id = str(job['job_id'])
+    return jsonify({
+        'job_id': job_id,
+        'status': job['status'],
+        'status_url': f"/api/export/jobs/{job_id}",
+        'download_url': f"/api/export/jobs/{job_id}/download"
+    }), 202
+
+def get_owned_export_job(job_id):
+    """Job se esiste ed è dell'utente corrente (o l'utente è admin)"""
+    job = get_export_job(job_id)
+    if not job:
+        return None
+    user_id = get_current_user_id()
+    if job['user_id'] != user_id and not is_admin_user(user_id):
+        return None
+    return job
+
+@multi_format_api.route('/readings/parameter/<int:parameter_id>/export/jobs', methods=['POST'])
+def create_parameter_export_job(parameter_id):
+    """Export completo del parametro in background (CSV)"""
+    return submit_export_job_response('parameter', parameter_id)
+
+@multi_format_api.route('/readings/channel/<int:channel_id>/export/jobs', methods=['POST'])
+def create_channel_export_job(channel_id):
+    """Export completo del canale in background (CSV, parametri in colonne)"""
+    return submit_export_job_response('channel', channel_id)
+
+@multi_format_api.route('/export/jobs')
+def list_user_export_jobs():
+    jobs = list_export_jobs(get_current_user_id())
+    return jsonify({'jobs': [serialize_export_job(job) for job in jobs]})
+
+@multi_format_api.route('/export/jobs/<job_id>')
+def get_export_job_status(job_id):
+    job = get_owned_export_job(job_id)
+    if not job:
+        return jsonify({'error': 'Export non trovato'}), 404
+    return jsonify(serialize_export_job(job))
+
+@multi_format_api.route('/export/jobs/<job_id>', methods=['DELETE'])
+def cancel_user_export_job(job_id):
+    """Annulla un export in coda/in esecuzione o elimina l'artifact pronto"""
+    if not get_owned_export_job(job_id):
+        return jsonify({'error': 'Export non trovato'}), 404
+    job = cancel_export_job(job_id)
+    if not job:
+        return jsonify({'error': 'Errore annullamento export'}), 500
+    return jsonify(serialize_export_job(job))
+
+def export_job_artifact_size(job_id):
+    """Byte reali dell'artifact (0 se non scaricabile: nessun addebito)"""
+    job = get_owned_export_job(job_id)
+    if not job or job['status'] != 'done':
+        return 0
+    return job['artifact_size'] or 0
+
+@multi_format_api.route('/export/jobs/<job_id>/download')
+@traffic_control(calculate_size_func=export_job_artifact_size)
+def download_export_job(job_id):
+    """Download dell'artifact completato, in streaming da disco o MinIO"""
+    job = get_owned_export_job(job_id)
+    if not job:
+        return jsonify({'error': 'Export non trovato'}), 404
+    if job['status'] != 'done':
+        return jsonify({
+            'error': 'export_not_ready',
+            'status': job['status']
+        }), 410 if job['status'] in ('expired', 'cancelled', 'failed') else 409
+
+    def generate():
+        try:
+            for chunk in iter_export_artifact(job):
+                yield chunk
+        except Exception as e:
+            logging.error(f"Errore download export {job_id}: {e}")
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/csv',
+        headers={
+            'Content-Disposition': f'attachment; filename="{job["filename"]}"',
+            'Content-Length': str(job['artifact_size'])
+        }
+    )
+
 
 # =============================================================================
 # NUOVO ENDPOINT UNIFICATO PER DOWNLOAD STREAMING
@@ -1598,57 +1607,30 @@ def stream_postgres_csv(query, params, filename_prefix, custom_header=None):
     """
     PostgreSQL COPY TO STDOUT streaming con HEADER PERSONALIZZATO
     Supporta header informativi per parametri e canali
+    I chunk vanno al client mentre il COPY è in corso (nessun file temporaneo)
     """
     try:
-        from utils.db import get_db_connection
-        import psycopg2
-        import tempfile
+        from utils.db import stream_copy_csv
         
         def generate():
-            conn = None
-            cur = None
-            temp_file = None
+            copy_stream = None
             try:
                 # NUOVO: Se c'è custom_header, yield prima
                 if custom_header:
                     yield custom_header.encode('utf-8-sig')  # BOM per Excel
                 
-                # Connessione dedicata per streaming
-                conn = get_db_connection()
-                cur = conn.cursor()
-                
-                # Prepara query con parametri bindati
-                cur.execute(query, params)
-                copy_query = cur.mogrify(query, params).decode('utf-8')
-                copy_command = f"COPY ({copy_query}) TO STDOUT WITH CSV HEADER"
-                
-                # NUOVO: Usa file temporaneo per COPY diretto
-                temp_file = tempfile.NamedTemporaryFile(mode='w+b', delete=False)
-                cur.copy_expert(copy_command, temp_file)
-                temp_file.close()
-                
-                # Stream file in chunk senza caricarlo in memoria
-                with open(temp_file.name, 'rb') as f:
-                    while True:
-                        chunk = f.read(8192)  # 8KB chunk costante
-                        if not chunk:
-                            break
-                        yield chunk
+                # COPY in thread dedicato con coda limitata (backpressure)
+                copy_stream = stream_copy_csv(query, params)
+                for chunk in copy_stream:
+                    yield chunk
                         
             except Exception as e:
                 logging.error(f"Errore stream postgres CSV: {e}")
                 yield f"Error: {str(e)}".encode('utf-8')
             finally:
-                # Cleanup
-                if cur:
-                    cur.close()
-                if conn:
-                    conn.close()
-                if temp_file and os.path.exists(temp_file.name):
-                    try:
-                        os.unlink(temp_file.name)
-                    except:
-                        pass
+                # Client disconnesso o fine stream: annulla COPY e rilascia connessione
+                if copy_stream is not None:
+                    copy_stream.close()
         
         # Filename con timestamp
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -1806,191 +1788,58 @@ def generate_channel_header(channel_id, start_date, end_date):
         return ""
 
 
-def build_channel_pivot_query(channel_id, start_date, end_date):
+@traffic_control(calculate_size_func=estimate_minio_stream_size)
+def stream_minio_file(file_path):
     """
-    Costruisce query PIVOT per organizzare parametri canale in colonne
+    Minio file streaming a chunk costanti con supporto Range/If-Range
+    (206 parziale: si addebitano solo i byte serviti)
     """
     try:
-        # Ottieni lista parametri numerici
-        params_query = """
-            SELECT parameter_id, name
-            FROM parameters 
-            WHERE channel_id = %s AND data_type = 'numeric'
-            ORDER BY name
-        """
-        params_result = execute_query(params_query, (channel_id,), fetch=True)
-        
-        if not params_result:
-            return None, None
-        
-        # Costruisci query PIVOT dinamica
-        param_cases = []
-        param_names = []
-        
-        for param in params_result:
-            param_id = param['parameter_id']
-            param_name = param['name']
-            param_names.append(param_name)
-            
-            # CASE WHEN per ogni parametro
-            param_cases.append(f"""MAX(CASE WHEN p.parameter_id = {param_id} THEN r.value END) as "{param_name}\"""")
-        
-        # Query finale con PIVOT
-        pivot_query = f"""
-            SELECT 
-                r.timestamp_utc,
-                {','.join(param_cases)}
-            FROM readings r
-            JOIN parameters p ON r.parameter_id = p.parameter_id
-            WHERE p.channel_id = %s
-              AND r.timestamp_utc BETWEEN %s AND %s
-              AND p.data_type = 'numeric'
-              AND r.value IS NOT NULL
-            GROUP BY r.timestamp_utc
-            ORDER BY r.timestamp_utc DESC
-        """
-        
-        return pivot_query, (channel_id, start_date, end_date)
+        return minio_range_response(file_path, disposition='attachment')
         
     except Exception as e:
-        logging.error(f"Errore build pivot query: {e}")
-        return None, None
+        logging.error(f"Errore stream minio file {file_path}: {e}")
+        return jsonify({'error': str(e)}), 500
 
-@traffic_control(calculate_size_func=estimate_minio_stream_size)
-def stream_minio_file(file_path):
+def generate_minio_zip(minio_client, bucket_name, file_paths):
     """
-    Minio file streaming OTTIMIZZATO
-    Mantiene RAM costante con chunk di 8KB e error handling migliorato
+    Generatore ZIP da oggetti MinIO: ogni file passa a chunk dal bucket al
+    compressore al client, senza file temporanei né buffer per file.
+    I prossimi file vengono scaricati in parallelo mentre si scrive il
+    corrente (ordine dell'archivio invariato). I file non trovati vengono saltati.
     """
+    prefetcher = MinioPrefetcher(minio_client, bucket_name, file_paths)
+    entries = (
+        (os.path.basename(file_path), chunks)
+        for file_path, chunks in prefetcher
+    )
+    zip_stream = stream_zip(entries, compresslevel=1)
     try:
-        from utils.minio_client import get_minio_client, get_minio_bucket_name
-        
-        minio_client = get_minio_client()
-        bucket_name = get_minio_bucket_name()
-        
-        # Verifica esistenza file PRIMA dello streaming
-        try:
-            file_info = minio_client.stat_object(bucket_name, file_path)
-        except Exception as e:
-            logging.error(f"File non trovato: {file_path} - {e}")
-            return jsonify({'error': f'File non trovato: {file_path}'}), 404
-        
-        filename = os.path.basename(file_path)
-        
-        # Determina mime type
-        mime_type, _ = mimetypes.guess_type(file_path)
-        if not mime_type:
-            mime_type = 'application/octet-stream'
-        
-        def generate():
-            response = None
-            try:
-                response = minio_client.get_object(bucket_name, file_path)
-                # STREAMING VERO: chunk costanti di 8KB
-                for chunk in response.stream(8192):
-                    yield chunk
-            except Exception as e:
-                logging.error(f"Errore streaming file {file_path}: {e}")
-                yield f"Error streaming file: {str(e)}".encode('utf-8')
-            finally:
-                if response:
-                    response.close()
-                    response.release_conn()
-        
-        return Response(
-            stream_with_context(generate()),
-            mimetype=mime_type,
-            headers={
-                'Content-Disposition': f'attachment; filename="{filename}"',
-                'Content-Length': str(file_info.size)
-                # RIMOZIONE: Transfer-Encoding chunked incompatibile con Content-Length
-            }
-        )
-        
+        for chunk in zip_stream:
+            yield chunk
     except Exception as e:
-        logging.error(f"Errore stream minio file {file_path}: {e}")
-        return jsonify({'error': str(e)}), 500
+        logging.error(f"Errore ZIP streaming: {e}")
+    finally:
+        zip_stream.close()
+        prefetcher.close()
 
 @traffic_control(calculate_size_func=estimate_zip_stream_size)
 def stream_zip_files(file_paths, zip_name):
     """
-    ZIP streaming OTTIMIZZATO - RAM costante anche per ZIP grandi
-    CORRETTO: Stream ZIP senza caricare file completi in memoria
+    ZIP streaming - RAM costante e primo byte immediato
+    indipendentemente da numero e dimensione dei file
     """
     try:
         from utils.minio_client import get_minio_client, get_minio_bucket_name
-        import zipfile
-        import tempfile
         
         minio_client = get_minio_client()
         bucket_name = get_minio_bucket_name()
         
-        def generate():
-            temp_zip = None
-            try:
-                # NUOVO: Usa file temporaneo per ZIP invece di memoria
-                temp_zip = tempfile.NamedTemporaryFile(delete=False, suffix='.zip')
-                
-                with zipfile.ZipFile(temp_zip.name, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as zipf:
-                    
-                    for file_path in file_paths:
-                        try:
-                            # Verifica esistenza file
-                            try:
-                                minio_client.stat_object(bucket_name, file_path)
-                            except Exception:
-                                logging.warning(f"File {file_path} non trovato, skip")
-                                continue
-                            
-                            file_name = os.path.basename(file_path)
-                            
-                            # OTTIMIZZATO: Stream file direttamente nel ZIP
-                            response = minio_client.get_object(bucket_name, file_path)
-                            try:
-                                # Buffer temporaneo per scrivere in ZIP
-                                file_buffer = io.BytesIO()
-                                for chunk in response.stream(8192):
-                                    file_buffer.write(chunk)
-                                
-                                file_buffer.seek(0)
-                                zipf.writestr(file_name, file_buffer.getvalue())
-                                file_buffer.close()
-                                
-                            finally:
-                                response.close()
-                                response.release_conn()
-                                
-                        except Exception as e:
-                            logging.error(f"Errore file ZIP {file_path}: {e}")
-                            continue
-                
-                temp_zip.close()
-                
-                # Stream ZIP finale in chunk
-                with open(temp_zip.name, 'rb') as zip_file:
-                    while True:
-                        chunk = zip_file.read(8192)  # 8KB chunk
-                        if not chunk:
-                            break
-                        yield chunk
-                        
-            except Exception as e:
-                logging.error(f"Errore ZIP streaming: {e}")
-                yield f"Error: {str(e)}".encode('utf-8')
-            finally:
-                # Cleanup file temporaneo
-                if temp_zip and os.path.exists(temp_zip.name):
-                    try:
-                        os.unlink(temp_zip.name)
-                    except:
-                        pass
-        
         return Response(
-            stream_with_context(generate()),
+            stream_with_context(generate_minio_zip(minio_client, bucket_name, file_paths)),
             mimetype='application/zip',
             headers={
-                'Content-Disposition': f'attachment; filename="{zip_name}"',
-                'Transfer-Encoding': 'chunked'
+                'Content-Disposition': f'attachment; filename="{zip_name}"'
             }
         )
         
@@ -2278,15 +2127,15 @@ def test_memory_benchmark():
             'benchmark_results': {
                 'test_scenarios': test_scenarios,
                 'streaming_optimizations': {
-                    'postgres_csv': 'File temporaneo + chunk 8KB',
+                    'postgres_csv': 'COPY in streaming + coda limitata',
                     'minio_file': 'Stream diretto + error handling',
-                    'zip_files': 'File temporaneo + buffer ottimizzato',
+                    'zip_files': 'ZIP in streaming al volo (stream_zip_files), nessun file temporaneo',
                     'target_memory': 'RAM costante < 10MB per qualsiasi dimensione'
                 },
                 'performance_targets': {
                     'max_memory_mb': 10,
                     'chunk_size_kb': 8,
-                    'streaming_method': 'Generator-based with file temp'
+                    'streaming_method': 'Generator-based, no temp files'
                 }
             },
             'timestamp': datetime.now().isoformat()
@@ -9,6 +9,9 @@ from flask import Blueprint, render_template, request, jsonify, redirect, url_fo
 import bcrypt
 from datetime import datetime
 from utils.db import execute_query
+from utils.traffic_control_utils import invalidate_traffic_profile
+from utils.api_token_cache import invalidate_api_tokens
+from utils.token_rate_limit import forget_token_bucket
 from .auth_routes import admin_required, get_current_user, login_required, verify_password
 import secrets
 import hashlib
@@ -118,12 +121,16 @@ def revoke_user_token(token_id, user_id):
     """Revoca (disattiva) token utente"""
     query = "UPDATE user_tokens SET is_active = false WHERE token_id = %s AND user_id = %s"
     result = execute_query(query, (token_id, user_id))
+    invalidate_api_tokens([token_id])
+    forget_token_bucket(token_id)
     return bool(result)
 
 def delete_user_token(token_id, user_id):
     """Elimina definitivamente token"""
     query = "DELETE FROM user_tokens WHERE token_id = %s AND user_id = %s"
     result = execute_query(query, (token_id, user_id))
+    invalidate_api_tokens([token_id])
+    forget_token_bucket(token_id)
     return bool(result)
 
 # ================================================
@@ -531,6 +538,10 @@ def save_user():
                 execute_query("INSERT INTO user_roles (user_id, role_id) VALUES (%s, %s)", 
                             (user_id, role_id))
             
+            # Limite traffico, ruolo e stato sono in cache (controllo traffico, token API)
+            invalidate_traffic_profile(int(user_id))
+            invalidate_api_tokens(user_id=int(user_id))
+            
             flash(f'Utente {nome} {cognome} aggiornato con successo', 'success')
             
         else:  # NUOVO UTENTE
@@ -596,6 +607,7 @@ def toggle_user_status(user_id):
     # Toggle stato
     query = "UPDATE users SET is_active = NOT is_active WHERE user_id = %s"
     result = execute_query(query, (user_id,))
+    invalidate_api_tokens(user_id=user_id)
     
     if result:
         flash('Stato utente aggiornato', 'success')
@@ -638,6 +650,8 @@ def delete_user(user_id):
         
         # 3. Elimina l'utente
         result = execute_query("DELETE FROM users WHERE user_id = %s", (user_id,))
+        invalidate_traffic_profile(user_id)
+        invalidate_api_tokens(user_id=user_id)
         
         if result:
             flash(f'Utente {user_name} eliminato definitivamente', 'success')
@@ -934,6 +948,8 @@ def admin_toggle_token(token_id):
             "UPDATE user_tokens SET is_active = NOT is_active WHERE token_id = %s", 
             (token_id,)
         )
+        invalidate_api_tokens([token_id])
+        forget_token_bucket(token_id)
         
         if result:
             flash('Stato token aggiornato', 'success')
@@ -966,6 +982,8 @@ def admin_delete_token(token_id):
             flash('Token non trovato', 'error')
         else:
             execute_query("DELETE FROM user_tokens WHERE token_id = %s", (token_id,))
+            invalidate_api_tokens([token_id])
+            forget_token_bucket(token_id)
             token_name = token_info[0]['token_name'] or token_info[0]['description'] or 'Token'
             flash(f'Token "{token_name}" eliminato', 'success')
             
@@ -1002,6 +1020,7 @@ def admin_set_rate_limit(token_id):
             "UPDATE user_tokens SET rate_limit_per_hour = %s WHERE token_id = %s", 
             (rate_limit if rate_limit > 0 else None, token_id)
         )
+        invalidate_api_tokens([token_id])
         
         if result:
             if rate_limit == 0:
@@ -1057,6 +1076,10 @@ def admin_bulk_token_action():
             
         else:
             flash('Azione non riconosciuta', 'error')
+        
+        invalidate_api_tokens(token_ids)
+        for token_id in token_ids:
+            forget_token_bucket(token_id)
             
     except Exception as e:
         flash(f'Errore: {str(e)}', 'error')
@@ -5,10 +5,12 @@ AUTHENTICATION ROUTES - GESTIONE AUTENTICAZIONE UTENTI
 Blueprint separato per login/logout/sessioni senza impattare layout esistente
 """
 
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, session
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, session, g
 import bcrypt
+import logging
 from datetime import datetime, timezone
 from utils.db import execute_query
+from utils.api_token_cache import get_cached_api_token
 
 # Crea blueprint separato
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
@@ -163,8 +165,104 @@ def get_current_user():
             'role': session['user_role'],
             'permissions': permissions
         }
+    token = get_api_token() if request.path.startswith('/api/') else None
+    if token:
+        return {
+            'user_id': token['user_id'],
+            'email': token['email'],
+            'name': token['name'],
+            'role': token['role'],
+            'permissions': token['permissions']
+        }
     return None
 
+def _load_api_token(token_hash):
+    """Record del token con utente e ruolo (None se inesistente)"""
+    query = """
+    SELECT ut.token_id, ut.user_id, ut.is_active, ut.rate_limit_per_hour,
+           u.is_active as user_active, u.email, u.nome, u.cognome,
+           r.name as role_name, r.permissions_json
+    FROM user_tokens ut
+    JOIN users u ON ut.user_id = u.user_id
+    LEFT JOIN user_roles ur ON u.user_id = ur.user_id
+    LEFT JOIN roles r ON ur.role_id = r.role_id
+    WHERE ut.token_hash = %s
+    LIMIT 1
+    """
+    results = execute_query(query, (token_hash,), fetch=True)
+    if results is None:
+        # Errore DB: non va in cache come token inesistente
+        raise RuntimeError("Database non disponibile per la verifica del token")
+    if not results:
+        return None
+
+    token = results[0]
+    permissions = token['permissions_json'] or '{}'
+    if isinstance(permissions, str):
+        try:
+            import json
+            permissions = json.loads(permissions)
+        except (json.JSONDecodeError, TypeError):
+            permissions = {}
+
+    return {
+        'token_id': token['token_id'],
+        'user_id': token['user_id'],
+        'is_active': bool(token['is_active']) and bool(token['user_active']),
+        'rate_limit_per_hour': token['rate_limit_per_hour'],
+        'email': token['email'],
+        'name': f"{token['nome']} {token['cognome']}",
+        'role': token['role_name'] or 'user',
+        'permissions': permissions
+    }
+
+def get_api_token():
+    """
+    Token API della richiesta (header Authorization: Bearer ...): record
+    con token_id, user_id, ruolo, permessi e rate_limit_per_hour se il
+    token esiste ed è attivo, altrimenti None. Il record arriva dalla
+    cache dei token (utils/api_token_cache.py) e resta in g per la
+    durata della richiesta.
+    """
+    if 'api_token' in g:
+        return g.api_token
+
+    g.api_token = None
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header[:7].lower() == 'bearer ' and auth_header[7:].strip():
+        from .admin_routes import hash_token
+
+        try:
+            token = get_cached_api_token(hash_token(auth_header[7:].strip()), _load_api_token)
+        except RuntimeError as e:
+            logging.error(f"Errore verifica token API: {e}")
+            token = None
+        if token and token['is_active']:
+            g.api_token = token
+    return g.api_token
+
+def authenticate_api_request():
+    """None se la richiesta ha una sessione o un token valido, altrimenti la risposta 401"""
+    if 'user_id' in session or get_api_token():
+        return None
+    response = jsonify({
+        'error': 'unauthorized',
+        'message': 'Token API mancante, non valido o disattivato'
+    })
+    response.status_code = 401
+    response.headers['WWW-Authenticate'] = 'Bearer'
+    return response
+
+def token_required(f):
+    """Decoratore per le API: sessione web oppure header Authorization: Bearer <token>"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        error = authenticate_api_request()
+        if error is not None:
+            return error
+        return f(*args, **kwargs)
+    return decorated_function
+
 def has_permission(permission_path):
     """Verifica se l'utente ha un permesso specifico"""
     user = get_current_user()
@@ -7,6 +7,7 @@ import json
 from datetime import datetime
 import logging
 from utils.db import execute_query
+from utils.dashboard_summary import invalidate_dashboard_summary
 
 areas_bp = Blueprint('areas', __name__, template_folder='templates')
 
@@ -190,6 +191,7 @@ def save_area():
         
         result = execute_query(query, params)
         if result:
+            invalidate_dashboard_summary()
             flash('Area salvata con successo!', 'success')
         else:
             # Se execute_query ritorna None, significa che c'è stato un errore
@@ -207,6 +209,7 @@ def save_area():
 def delete_area(area_id):
     """Elimina un'area"""
     if execute_query("DELETE FROM areas WHERE area_id = %s", (area_id,)):
+        invalidate_dashboard_summary()
         flash('Area eliminata con successo!', 'success')
     else:
         flash('Errore durante l\'eliminazione dell\'area', 'error')
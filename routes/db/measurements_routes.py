@@ -3,6 +3,7 @@
 # ================================================
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from utils.db import execute_query
+from utils.dashboard_summary import invalidate_dashboard_summary
 import json
 from datetime import datetime
 import logging
@@ -144,6 +145,7 @@ def save_measurement():
                   measurement_id))
             
             if result:
+                invalidate_dashboard_summary()
                 flash(f'Measurement "{name}" aggiornato con successo', 'success')
             else:
                 flash('Errore durante l\'aggiornamento', 'error')
@@ -167,6 +169,7 @@ def save_measurement():
                   json.dumps(metadata)))
             
             if result:
+                invalidate_dashboard_summary()
                 flash(f'Measurement "{name}" creato con successo', 'success')
             else:
                 flash('Errore durante la creazione', 'error')
@@ -197,6 +200,7 @@ def delete_measurement(measurement_id):
     """, (measurement_id,))
     
     if result:
+        invalidate_dashboard_summary()
         flash('Measurement eliminato con successo', 'success')
     else:
         flash('Errore durante l\'eliminazione', 'error')
@@ -4,6 +4,7 @@ import json
 from datetime import datetime
 import logging
 from utils.db import execute_query
+from utils.dashboard_summary import invalidate_dashboard_summary
 
 scenarios_bp = Blueprint('scenarios', __name__, template_folder='templates')
 # ================================================
@@ -102,6 +103,7 @@ def save_scenario():
             params = (data['name'], data['description'], code, lng, lat, json.dumps(metadata))
         
         if execute_query(query, params):
+            invalidate_dashboard_summary()
             flash('Scenario salvato con successo!', 'success')
         else:
             flash('Errore durante il salvataggio', 'error')
@@ -117,6 +119,7 @@ def save_scenario():
 def delete_scenario(scenario_id):
     """Elimina scenario"""
     if execute_query("DELETE FROM scenarios WHERE scenario_id = %s", (scenario_id,)):
+        invalidate_dashboard_summary()
         flash('Scenario eliminato', 'success')
     else:
         flash('Errore durante eliminazione', 'error')
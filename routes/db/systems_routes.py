@@ -3,6 +3,7 @@
 # ================================================
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from utils.db import execute_query
+from utils.dashboard_summary import invalidate_dashboard_summary
 import json
 from datetime import datetime
 import logging
@@ -97,6 +98,7 @@ def save_system():
             """, (name, description if description else None, system_id))
             
             if result:
+                invalidate_dashboard_summary()
                 flash(f'System "{name}" aggiornato con successo', 'success')
             else:
                 flash('Errore durante l\'aggiornamento', 'error')
@@ -107,6 +109,7 @@ def save_system():
             """, (name, description if description else None))
             
             if result:
+                invalidate_dashboard_summary()
                 flash(f'System "{name}" creato con successo', 'success')
             else:
                 flash('Errore durante la creazione (Sistema già esistente)', 'error')
@@ -140,6 +143,7 @@ def delete_system(system_id):
     """, (system_id,))
     
     if result:
+        invalidate_dashboard_summary()
         flash('System eliminato con successo', 'success')
     else:
         flash('Errore durante l\'eliminazione', 'error')
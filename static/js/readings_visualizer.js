@@ -21,6 +21,7 @@ class ReadingsVisualizerProxy {
             // 1. Utils (no dipendenze)
             await this.loadScript(`${VISUALIZER_BASE}js/utils/DateUtils.js`);
             await this.loadScript(`${VISUALIZER_BASE}js/utils/FileUtils.js`);
+            await this.loadScript(`${VISUALIZER_BASE}js/utils/ReadingsDecoder.js`);
             await this.loadScript(`${VISUALIZER_BASE}js/utils/ApiClient.js`);
             await this.loadScript(`${VISUALIZER_BASE}js/utils/TrafficIndicator.js`);
             await this.loadScript(`${VISUALIZER_BASE}js/utils/DownloadProgressModal.js`);
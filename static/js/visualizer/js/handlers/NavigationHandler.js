@@ -545,8 +545,9 @@ class NavigationHandler {
                             <div>
                                 <strong><i class="fas fa-folder-open me-2"></i>${this.currentFolderPath}</strong>
                                 <span class="ms-2 badge bg-light text-dark">
-                                    ${this.currentFolderData.total_folders} cartelle, ${this.currentFolderData.total_files} file
+                                    ${this.currentFolderData.total_folders}${this.currentFolderData.has_more ? '+' : ''} cartelle, ${this.currentFolderData.total_files}${this.currentFolderData.has_more ? '+' : ''} file
                                 </span>
+                                ${this.renderFolderAggregates(this.currentFolderData.aggregates, 'ms-2 badge bg-light text-dark')}
                             </div>
                             <div class="btn-group">
                                 <button class="btn btn-warning btn-sm" id="downloadSelectedFiles" 
@@ -580,11 +581,13 @@ class NavigationHandler {
             
             this.currentFolderData.folders.forEach(folder => {
                 const fullPath = this.currentFolderPath.replace(/\/$/, '') + '/' + folder;
+                const aggregates = (this.currentFolderData.folder_aggregates || {})[folder];
                 html += `
                     <tr class="table-light">
                         <td class="px-3">
                             <i class="fas fa-folder text-primary me-2"></i>
                             <strong>${folder}</strong>
+                            ${this.renderFolderAggregates(aggregates, 'ms-2 small text-muted')}
                         </td>
                         <td class="px-3">
                             <button class="btn btn-sm btn-outline-primary open-subfolder-btn" 
@@ -667,6 +670,17 @@ class NavigationHandler {
             `;
         }
         
+        // Pagine successive (listing a pagine lato server)
+        if (this.currentFolderData.has_more) {
+            html += `
+                <div class="text-center p-3">
+                    <button class="btn btn-outline-primary btn-sm" id="loadMoreFolderContents">
+                        <i class="fas fa-chevron-down me-1"></i> Carica altri
+                    </button>
+                </div>
+            `;
+        }
+        
         html += `
                     </div>
                 </div>
@@ -678,12 +692,53 @@ class NavigationHandler {
         // Bind eventi
         this.bindFolderContentsEvents();
         
+        const loadMoreBtn = document.getElementById('loadMoreFolderContents');
+        if (loadMoreBtn) {
+            loadMoreBtn.addEventListener('click', () => this.loadMoreFolderContents());
+        }
+        
         // NUOVO: Nascondi export quando siamo in sottocartelle
         if (window.readingsVisualizer && window.readingsVisualizer.core) {
             window.readingsVisualizer.core.updateExportVisibility('folder');
         }
     }
     
+    /**
+     * Riepilogo aggregati cartella (file, dimensione) se già calcolati dal server
+     */
+    renderFolderAggregates(aggregates, cssClass) {
+        if (!aggregates) return '';
+        return `<span class="${cssClass}">${aggregates.file_count} file, ${FileUtils.formatFileSize(aggregates.total_size)}</span>`;
+    }
+    
+    /**
+     * Carica la pagina successiva della cartella corrente e la accoda
+     */
+    async loadMoreFolderContents() {
+        const current = this.currentFolderData;
+        if (!current || !current.next_token) return;
+        
+        const loadMoreBtn = document.getElementById('loadMoreFolderContents');
+        if (loadMoreBtn) loadMoreBtn.disabled = true;
+        
+        try {
+            const page = await this.apiClient.listFolderContents(this.currentFolderPath, { token: current.next_token });
+            
+            current.folders = current.folders.concat(page.folders);
+            current.files = current.files.concat(page.files);
+            current.folder_aggregates = Object.assign({}, current.folder_aggregates, page.folder_aggregates);
+            current.total_folders = current.folders.length;
+            current.total_files = current.files.length;
+            current.has_more = page.has_more;
+            current.next_token = page.next_token;
+            
+            this.renderFolderContents();
+        } catch (error) {
+            console.error('❌ Errore caricamento pagina cartella:', error);
+            if (loadMoreBtn) loadMoreBtn.disabled = false;
+        }
+    }
+    
     /**
      * Bind eventi per contenuti cartella
      */
@@ -264,19 +264,8 @@ class FileRenderer {
             // Aggiungi pulsante "Torna alla lista"
             this.addBackButton('jsonViewerContainer');
             
-            // Carica e mostra JSON
-            const jsonResponse = await this.apiClient.getJsonData(filePath);
-            const jsonContentDiv = document.getElementById('jsonContent');
-            
-            jsonContentDiv.innerHTML = `
-                <div class="table-responsive" style="max-height: 600px; overflow: auto;">
-                    <table class="table table-striped table-hover table-sm" id="jsonTable">
-                    </table>
-                </div>
-            `;
-            
-            // Popola la tabella
-            this.tableRenderer.populateJSONTable(jsonResponse.data, 'jsonTable');
+            // Carica e mostra il nodo radice
+            await this.loadJSONNode(filePath, '', 0);
             
         } catch (error) {
             const jsonContent = document.getElementById('jsonContent');
@@ -286,6 +275,69 @@ class FileRenderer {
         }
     }
     
+    /**
+     * Carica una pagina del nodo JSON a pointer (i figli grandi arrivano
+     * come riferimenti da espandere con un click)
+     */
+    async loadJSONNode(filePath, pointer, offset = 0) {
+        const jsonResponse = await this.apiClient.getJsonData(filePath, { pointer, offset });
+        const jsonContentDiv = document.getElementById('jsonContent');
+        
+        // Breadcrumb del percorso: ogni segmento torna a quel nodo
+        const tokens = pointer ? pointer.split('/').slice(1) : [];
+        let crumbs = `<a href="#" class="json-nav" data-pointer="">radice</a>`;
+        tokens.forEach((token, i) => {
+            const target = '/' + tokens.slice(0, i + 1).join('/');
+            const label = token.replace(/~1/g, '/').replace(/~0/g, '~');
+            crumbs += ` / <a href="#" class="json-nav" data-pointer="${target}">${label}</a>`;
+        });
+        
+        let pager = '';
+        if (jsonResponse.offset > 0 || jsonResponse.has_more) {
+            const from = jsonResponse.offset + 1;
+            const to = jsonResponse.offset + jsonResponse.returned;
+            const total = jsonResponse.length !== null ? jsonResponse.length : 'oltre ' + to;
+            pager = `
+                <div class="d-flex align-items-center gap-2 mt-2">
+                    <button class="btn btn-sm btn-outline-secondary json-page" data-offset="${Math.max(0, jsonResponse.offset - jsonResponse.limit)}"
+                            ${jsonResponse.offset > 0 ? '' : 'disabled'}>&laquo;</button>
+                    <span class="text-muted small">Elementi ${from}-${to} di ${total}</span>
+                    <button class="btn btn-sm btn-outline-secondary json-page" data-offset="${to}"
+                            ${jsonResponse.has_more ? '' : 'disabled'}>&raquo;</button>
+                </div>
+            `;
+        }
+        
+        jsonContentDiv.innerHTML = `
+            <div class="small mb-2">${crumbs}</div>
+            <div class="table-responsive" style="max-height: 600px; overflow: auto;">
+                <table class="table table-striped table-hover table-sm" id="jsonTable">
+                </table>
+            </div>
+            ${pager}
+        `;
+        
+        // Popola la tabella
+        if (jsonResponse.type === 'object' || jsonResponse.type === 'array') {
+            this.tableRenderer.populateJSONTable(jsonResponse.data, 'jsonTable');
+        } else {
+            this.tableRenderer.populateJSONTable({ [tokens[tokens.length - 1] || 'valore']: jsonResponse.data }, 'jsonTable');
+        }
+        
+        // Espansione lazy dei riferimenti e navigazione
+        jsonContentDiv.querySelectorAll('.json-nav').forEach(link => {
+            link.addEventListener('click', (e) => {
+                e.preventDefault();
+                this.loadJSONNode(filePath, link.dataset.pointer, 0);
+            });
+        });
+        jsonContentDiv.querySelectorAll('.json-page').forEach(button => {
+            button.addEventListener('click', () => {
+                this.loadJSONNode(filePath, pointer, parseInt(button.dataset.offset, 10));
+            });
+        });
+    }
+    
     /**
      * Mostra CSV viewer
      */
@@ -323,20 +375,23 @@ class FileRenderer {
             // Aggiungi pulsante "Torna alla lista"
             this.addBackButton('csvViewerContainer');
             
-            // Carica dati CSV
-            const csvData = await this.apiClient.getCsvData(filePath);
+            // Carica dati CSV: prima pagina per la tabella, punti ridotti per il grafico
+            const [csvData, chartData] = await Promise.all([
+                this.apiClient.getCsvData(filePath),
+                this.apiClient.getCsvData(filePath, { downsample: 2000 })
+            ]);
             
             // Popola tabella
             this.tableRenderer.populateCSVTable(csvData, 'csvViewerTable');
             
             // Bind eventi per cambio vista
-            this.bindCSVViewerEvents(csvData);
+            this.bindCSVViewerEvents(chartData);
             
             // Renderizza grafico di default
             setTimeout(() => {
                 if (window.ChartRenderer) {
                     const chartRenderer = new ChartRenderer(this.dataManager);
-                    chartRenderer.renderCSVChart(csvData);
+                    chartRenderer.renderCSVChart(chartData);
                 }
             }, 100);
             
@@ -10,6 +10,7 @@ class TableRenderer {
         this.tablePage = 1;
         this.tableRowsPerPage = 50;
         this.tableLoading = false;
+        this.tablePagination = null;
     }
     
     /**
@@ -107,17 +108,34 @@ class TableRenderer {
                 }
             }
             
+            // Pagina adiacente: keyset con il cursore della risposta precedente,
+            // le altre pagine (prima, ultima, salto diretto) con page
+            const last = this.tablePagination;
+            let cursor = null;
+            if (last && last.parameterId === parameterId && last.per_page === this.tableRowsPerPage) {
+                if (page === last.page + 1) {
+                    cursor = last.next_cursor;
+                } else if (page === last.page - 1 && page > 1) {
+                    cursor = last.prev_cursor;
+                }
+            }
+            
             // Carica dati tabella
             const result = await this.apiClient.loadTableData(parameterId, {
                 page: page,
                 perPage: this.tableRowsPerPage,
                 startDate: dateRange.start_date,
-                endDate: dateRange.end_date
+                endDate: dateRange.end_date,
+                cursor: cursor
             });
             
             if (result.status === 'success') {
+                // In modalità cursore il server non conosce il numero di pagina
+                this.tablePagination = Object.assign(
+                    { parameterId: parameterId }, result.pagination, { page: page }
+                );
                 this.renderTableRows(result.data);
-                this.renderPaginationControls(result.pagination);
+                this.renderPaginationControls(this.tablePagination);
                 
                 // Aggiorna header con unità di misura
                 const unitSpan = document.getElementById('table-unit-header');
@@ -423,15 +441,35 @@ class TableRenderer {
         
         html += '</tbody>';
         
-        if (csvData.rows.length > 1000) {
+        // Il server restituisce una finestra di righe: totale noto solo se il file è già stato letto tutto
+        const totalRows = csvData.total_rows ?? (csvData.has_more ? null : csvData.rows.length);
+        if (csvData.has_more || csvData.rows.length > 1000) {
             html += `<tfoot><tr><td colspan="${csvData.columns.length}" class="text-center text-muted">
-                        Mostrate prime 1000 righe di ${csvData.rows.length} totali
+                        Mostrate prime ${maxRows} righe di ${totalRows !== null ? totalRows : 'oltre ' + csvData.rows.length} totali
                     </td></tr></tfoot>`;
         }
         
         table.innerHTML = html;
     }
     
+    /**
+     * Riferimento a un nodo JSON non ancora caricato ({$ref, type, size, length})
+     */
+    isJSONRef(value) {
+        return value !== null && typeof value === 'object' && !Array.isArray(value) && '$ref' in value;
+    }
+    
+    /**
+     * Link per espandere un riferimento JSON
+     */
+    renderJSONRef(ref) {
+        const label = ref.type === 'array' ? `[${ref.length ?? '…'} elementi]`
+            : ref.type === 'object' ? `{${ref.length ?? '…'} campi}`
+            : `${ref.type}`;
+        const size = ref.size !== null ? ` · ${(ref.size / 1024).toFixed(1)} KB` : '';
+        return `<a href="#" class="json-nav" data-pointer="${ref.$ref}">${label}${size}</a>`;
+    }
+    
     /**
      * Popola tabella JSON (key-value)
      */
@@ -447,7 +485,9 @@ class TableRenderer {
                 for (const [key, value] of Object.entries(obj)) {
                     const fullKey = prefix ? `${prefix}.${key}` : key;
                     
-                    if (typeof value === 'object' && value !== null && !Array.isArray(value)) {
+                    if (this.isJSONRef(value)) {
+                        html += `<tr><td class="px-3 fw-bold">${key}</td><td class="px-3">${this.renderJSONRef(value)}</td></tr>`;
+                    } else if (typeof value === 'object' && value !== null && !Array.isArray(value)) {
                         html += `<tr class="table-info"><td colspan="2" class="px-3 fw-bold">${fullKey}</td></tr>`;
                         addObjectRows(value, fullKey);
                     } else {
@@ -468,10 +508,15 @@ class TableRenderer {
             return;
         }
         
-        // Array di oggetti
+        // Array di valori semplici o di riferimenti: una colonna
         const firstItem = data[0];
-        if (typeof firstItem !== 'object') {
-            table.innerHTML = '<tr><td class="text-center text-muted">Array di valori semplici</td></tr>';
+        if (typeof firstItem !== 'object' || firstItem === null || this.isJSONRef(firstItem)) {
+            let html = '<thead class="table-dark"><tr><th class="px-3">#</th><th class="px-3">Valore</th></tr></thead><tbody>';
+            data.forEach((item, index) => {
+                const displayValue = this.isJSONRef(item) ? this.renderJSONRef(item) : JSON.stringify(item);
+                html += `<tr><td class="px-3 text-muted">${index}</td><td class="px-3">${displayValue}</td></tr>`;
+            });
+            table.innerHTML = html + '</tbody>';
             return;
         }
         
@@ -486,7 +531,11 @@ class TableRenderer {
         data.slice(0, 100).forEach((item, index) => {
             html += `<tr class="${index % 2 === 0 ? 'table-light' : ''}">`;
             columns.forEach(col => {
-                const value = item[col];
+                const value = item ? item[col] : undefined;
+                if (this.isJSONRef(value)) {
+                    html += `<td class="px-3">${this.renderJSONRef(value)}</td>`;
+                    return;
+                }
                 const displayValue = typeof value === 'object' ? JSON.stringify(value) : String(value || '');
                 html += `<td class="px-3">${displayValue.substring(0, 100)}</td>`;
             });
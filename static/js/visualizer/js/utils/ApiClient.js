@@ -35,35 +35,69 @@ class ApiClient {
         }
     }
     
+    /**
+     * Richiesta readings in formato binario colonnare (msgpack | arrow).
+     * Senza formato (o senza ReadingsDecoder) ricade su JSON.
+     */
+    async requestReadings(url, format = null) {
+        const accept = format && window.ReadingsDecoder ? ReadingsDecoder.acceptFor(format) : null;
+        if (!accept) {
+            return await this.request(url);
+        }
+        
+        try {
+            const response = await fetch(url, { headers: { 'Accept': accept } });
+            
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+            }
+            
+            return await ReadingsDecoder.decodeResponse(response);
+        } catch (error) {
+            console.error(`API Error [${url}]:`, error);
+            throw error;
+        }
+    }
+    
     /**
      * Carica dati parametro con supporto multi-formato
+     * downsample: minmax | lttb | m4 | avg (default server: minmax)
+     * format: null (JSON) | msgpack | arrow -> readings colonnari {timestamp_ms, value}
      */
-    async loadParameterData(parameterId, period = '7d') {
+    async loadParameterData(parameterId, period = '7d', downsample = null, format = null) {
         const dateRange = DateUtils.getDateRange(period);
         const params = new URLSearchParams(dateRange);
+        if (downsample) params.set('downsample', downsample);
         
-        return await this.request(`/api/readings/parameter/${parameterId}?${params}`);
+        return await this.requestReadings(`/api/readings/parameter/${parameterId}?${params}`, format);
     }
     
     /**
      * Carica dati canale con supporto multi-formato
+     * downsample: minmax | lttb | m4 | avg (default server: minmax)
+     * format: null (JSON) | msgpack | arrow -> readings colonnari per parametro
      */
-    async loadChannelData(channelId, period = '7d') {
+    async loadChannelData(channelId, period = '7d', downsample = null, format = null) {
         const dateRange = DateUtils.getDateRange(period);
         const params = new URLSearchParams(dateRange);
+        if (downsample) params.set('downsample', downsample);
         
-        return await this.request(`/api/readings/channel/${channelId}?${params}`);
+        return await this.requestReadings(`/api/readings/channel/${channelId}?${params}`, format);
     }
     
     /**
      * Carica dati tabella paginata
+     * cursor: pagination.next_cursor / prev_cursor della risposta precedente
+     * (più veloce di page sulle pagine profonde)
      */
     async loadTableData(parameterId, options = {}) {
         const {
             page = 1,
             perPage = 50,
             startDate,
-            endDate
+            endDate,
+            cursor = null,
+            exactCount = false
         } = options;
         
         const params = new URLSearchParams({
@@ -72,6 +106,8 @@ class ApiClient {
             page: page,
             per_page: perPage
         });
+        if (cursor) params.set('cursor', cursor);
+        if (exactCount) params.set('exact_count', '1');
         
         return await this.request(`/api/readings/parameter/${parameterId}/table?${params}`);
     }
@@ -87,22 +123,45 @@ class ApiClient {
     /**
      * Lista contenuti cartella
      */
-    async listFolderContents(folderPath) {
-        return await this.request(`/api/files/list-folder/${encodeURIComponent(folderPath)}`);
+    async listFolderContents(folderPath, options = {}) {
+        const params = new URLSearchParams();
+        if (options.token) params.set('token', options.token);
+        if (options.limit) params.set('limit', options.limit);
+        if (options.refresh) params.set('refresh', '1');
+        
+        const query = params.toString();
+        return await this.request(`/api/files/list-folder/${encodeURIComponent(folderPath)}${query ? `?${query}` : ''}`);
     }
     
     /**
-     * Dati CSV parsati
+     * Dati CSV parsati (a finestre)
+     * options: { offset, limit, columns: [...], downsample: punti, y: colonna }
      */
-    async getCsvData(filePath) {
-        return await this.request(`/api/files/csv-data/${encodeURIComponent(filePath)}`);
+    async getCsvData(filePath, options = {}) {
+        const params = new URLSearchParams();
+        if (options.offset) params.set('offset', options.offset);
+        if (options.limit) params.set('limit', options.limit);
+        if (options.columns && options.columns.length) params.set('columns', options.columns.join(','));
+        if (options.downsample) params.set('downsample', options.downsample);
+        if (options.y) params.set('y', options.y);
+        
+        const query = params.toString();
+        return await this.request(`/api/files/csv-data/${encodeURIComponent(filePath)}${query ? `?${query}` : ''}`);
     }
     
     /**
-     * Dati JSON parsati
+     * Nodo JSON (a pagine)
+     * options: { pointer: '/a/0', offset, limit, summary: true }
      */
-    async getJsonData(filePath) {
-        return await this.request(`/api/files/json-data/${encodeURIComponent(filePath)}`);
+    async getJsonData(filePath, options = {}) {
+        const params = new URLSearchParams();
+        if (options.pointer) params.set('pointer', options.pointer);
+        if (options.offset) params.set('offset', options.offset);
+        if (options.limit) params.set('limit', options.limit);
+        if (options.summary) params.set('summary', '1');
+        
+        const query = params.toString();
+        return await this.request(`/api/files/json-data/${encodeURIComponent(filePath)}${query ? `?${query}` : ''}`);
     }
     
     /**
@@ -174,10 +233,11 @@ class ApiClient {
     }
     
     /**
-     * URL per preview file
+     * URL per preview file (width: larghezza thumbnail per immagini/PDF)
      */
-    getFilePreviewUrl(filePath) {
-        return `/api/files/preview/${encodeURIComponent(filePath)}`;
+    getFilePreviewUrl(filePath, width = null) {
+        const url = `/api/files/preview/${encodeURIComponent(filePath)}`;
+        return width ? `${url}?w=${width}` : url;
     }
 
     /**
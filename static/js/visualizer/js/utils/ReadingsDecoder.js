@@ -0,0 +1,189 @@
+/**
+ * READINGS DECODER
+ * Decodifica delle risposte binarie degli endpoint readings
+ * (Accept: application/msgpack | application/vnd.apache.arrow.stream).
+ * Readings colonnari per parametro: { timestamp_ms: Float64Array, value: Float64Array | string[] }
+ * msgpack ext type: 1 = int64[] LE, 2 = float64[] LE (vedi utils/readings_columnar.py)
+ */
+
+class ReadingsDecoder {
+    static MSGPACK = 'application/msgpack';
+    static ARROW = 'application/vnd.apache.arrow.stream';
+
+    /**
+     * Mimetype da chiedere per il formato indicato (null = JSON).
+     * Arrow solo se la libreria apache-arrow è caricata (window.Arrow).
+     */
+    static acceptFor(format) {
+        if (format === 'arrow' && window.Arrow) return ReadingsDecoder.ARROW;
+        if (format === 'msgpack' || format === 'arrow') return ReadingsDecoder.MSGPACK;
+        return null;
+    }
+
+    /**
+     * Decodifica una Response fetch in base al Content-Type
+     */
+    static async decodeResponse(response) {
+        const contentType = response.headers.get('Content-Type') || '';
+
+        if (contentType.startsWith(ReadingsDecoder.MSGPACK)) {
+            return ReadingsDecoder.decodeMsgpack(await response.arrayBuffer());
+        }
+        if (contentType.startsWith(ReadingsDecoder.ARROW)) {
+            return ReadingsDecoder.decodeArrow(await response.arrayBuffer());
+        }
+        return await response.json();
+    }
+
+    /**
+     * Righe { timestamp_utc, value } da colonne (per i renderer esistenti)
+     */
+    static columnsToRows(columns) {
+        const rows = new Array(columns.timestamp_ms.length);
+        for (let i = 0; i < rows.length; i++) {
+            rows[i] = {
+                timestamp_utc: new Date(columns.timestamp_ms[i]).toISOString(),
+                value: columns.value[i]
+            };
+        }
+        return rows;
+    }
+
+    // ========== MSGPACK ==========
+
+    static decodeMsgpack(buffer) {
+        const view = new DataView(buffer);
+        const bytes = new Uint8Array(buffer);
+        const textDecoder = new TextDecoder('utf-8');
+        let offset = 0;
+
+        const readString = (length) => {
+            const value = textDecoder.decode(bytes.subarray(offset, offset + length));
+            offset += length;
+            return value;
+        };
+
+        const readArray = (length) => {
+            const result = new Array(length);
+            for (let i = 0; i < length; i++) result[i] = read();
+            return result;
+        };
+
+        const readMap = (length) => {
+            const result = {};
+            for (let i = 0; i < length; i++) {
+                const key = read();
+                result[key] = read();
+            }
+            return result;
+        };
+
+        const readExt = (length) => {
+            const type = view.getInt8(offset);
+            offset += 1;
+            // Copia su buffer allineato a 8 byte per i typed array
+            const data = buffer.slice(offset, offset + length);
+            offset += length;
+            if (type === 1) {
+                const ints = new BigInt64Array(data);
+                const result = new Float64Array(ints.length);
+                for (let i = 0; i < ints.length; i++) result[i] = Number(ints[i]);
+                return result;
+            }
+            if (type === 2) return new Float64Array(data);
+            return new Uint8Array(data);
+        };
+
+        const read = () => {
+            const byte = bytes[offset++];
+
+            if (byte <= 0x7f) return byte;
+            if (byte >= 0xe0) return byte - 0x100;
+            if ((byte & 0xf0) === 0x80) return readMap(byte & 0x0f);
+            if ((byte & 0xf0) === 0x90) return readArray(byte & 0x0f);
+            if ((byte & 0xe0) === 0xa0) return readString(byte & 0x1f);
+
+            let value;
+            switch (byte) {
+                case 0xc0: return null;
+                case 0xc2: return false;
+                case 0xc3: return true;
+                case 0xc4: value = bytes.slice(offset + 1, offset + 1 + view.getUint8(offset)); offset += 1 + value.length; return value;
+                case 0xc5: value = bytes.slice(offset + 2, offset + 2 + view.getUint16(offset)); offset += 2 + value.length; return value;
+                case 0xc6: value = bytes.slice(offset + 4, offset + 4 + view.getUint32(offset)); offset += 4 + value.length; return value;
+                case 0xc7: value = view.getUint8(offset); offset += 1; return readExt(value);
+                case 0xc8: value = view.getUint16(offset); offset += 2; return readExt(value);
+                case 0xc9: value = view.getUint32(offset); offset += 4; return readExt(value);
+                case 0xca: value = view.getFloat32(offset); offset += 4; return value;
+                case 0xcb: value = view.getFloat64(offset); offset += 8; return value;
+                case 0xcc: value = view.getUint8(offset); offset += 1; return value;
+                case 0xcd: value = view.getUint16(offset); offset += 2; return value;
+                case 0xce: value = view.getUint32(offset); offset += 4; return value;
+                case 0xcf: value = Number(view.getBigUint64(offset)); offset += 8; return value;
+                case 0xd0: value = view.getInt8(offset); offset += 1; return value;
+                case 0xd1: value = view.getInt16(offset); offset += 2; return value;
+                case 0xd2: value = view.getInt32(offset); offset += 4; return value;
+                case 0xd3: value = Number(view.getBigInt64(offset)); offset += 8; return value;
+                case 0xd9: value = view.getUint8(offset); offset += 1; return readString(value);
+                case 0xda: value = view.getUint16(offset); offset += 2; return readString(value);
+                case 0xdb: value = view.getUint32(offset); offset += 4; return readString(value);
+                case 0xdc: value = view.getUint16(offset); offset += 2; return readArray(value);
+                case 0xdd: value = view.getUint32(offset); offset += 4; return readArray(value);
+                case 0xde: value = view.getUint16(offset); offset += 2; return readMap(value);
+                case 0xdf: value = view.getUint32(offset); offset += 4; return readMap(value);
+                default:
+                    throw new Error(`msgpack: tipo 0x${byte.toString(16)} non supportato`);
+            }
+        };
+
+        return read();
+    }
+
+    // ========== ARROW IPC ==========
+
+    /**
+     * Stream Arrow (formato long: parameter_name, timestamp, value, text_value)
+     * riportato alla stessa struttura della risposta msgpack.
+     */
+    static decodeArrow(buffer) {
+        const table = window.Arrow.tableFromIPC(new Uint8Array(buffer));
+        const data = JSON.parse(table.schema.metadata.get('meta') || '{}');
+
+        // get(i) rispetta dizionario e null delle colonne
+        const names = table.getChild('parameter_name');
+        const timestamps = table.getChild('timestamp');
+        const values = table.getChild('value');
+        const textValues = table.getChild('text_value');
+
+        const readings = {};
+        for (let i = 0; i < table.numRows; i++) {
+            const name = names.get(i);
+            if (!readings[name]) readings[name] = { timestamp_ms: [], value: [] };
+            readings[name].timestamp_ms.push(Number(timestamps.get(i)));
+            readings[name].value.push(textValues.get(i) ?? values.get(i) ?? NaN);
+        }
+
+        Object.values(readings).forEach(columns => {
+            columns.timestamp_ms = Float64Array.from(columns.timestamp_ms);
+            if (columns.value.every(v => typeof v === 'number')) {
+                columns.value = Float64Array.from(columns.value);
+            }
+        });
+
+        // Parametri senza readings nel periodo
+        (data.stats || []).forEach(stat => {
+            if (stat.parameter_name !== undefined && !readings[stat.parameter_name]) {
+                readings[stat.parameter_name] = { timestamp_ms: new Float64Array(0), value: [] };
+            }
+        });
+
+        // Endpoint parametro: readings di un solo parametro, non indicizzati per nome
+        data.readings = data.parameter_info
+            ? (Object.values(readings)[0] || { timestamp_ms: new Float64Array(0), value: new Float64Array(0) })
+            : readings;
+        return data;
+    }
+}
+
+// Export globale
+window.ReadingsDecoder = ReadingsDecoder;
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+API TOKEN CACHE - CACHE DEI TOKEN API AUTENTICATI
+Le richieste con token (Authorization: Bearer ...) non interrogano il DB
+a ogni chiamata: il record del token (utente, ruolo, permessi, rate
+limit, stato attivo) resta in una LRU con TTL per token_hash.
+- token inesistenti in cache per negative_ttl (più breve), così un
+  client con un token sbagliato non genera una query per richiesta
+- invalidazione immediata per token_id o per utente quando l'admin
+  attiva/disattiva, revoca o elimina token o modifica l'utente
+- gli errori del DB non vengono messi in cache
+L'invalidazione è per processo: negli altri worker la modifica si vede
+al più dopo ttl secondi.
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+
+API_TOKEN_CACHE_CONFIG = {
+    'ttl': float(os.getenv('API_TOKEN_CACHE_TTL', 300)),
+    'negative_ttl': float(os.getenv('API_TOKEN_CACHE_NEGATIVE_TTL', 30)),
+    'max_entries': int(os.getenv('API_TOKEN_CACHE_MAX_ENTRIES', 10000)),
+}
+
+
+class ApiTokenCache:
+    """token_hash -> record del token (o None se inesistente)"""
+
+    def __init__(self, config):
+        self.config = config
+        self._entries = OrderedDict()   # token_hash -> (scadenza, record)
+        self._lock = threading.Lock()
+        # Incrementata a ogni invalidazione: un record letto dal DB prima
+        # di un'invalidazione (revoca durante loader) non viene salvato
+        self._generation = 0
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def get(self, token_hash, loader):
+        """
+        Record dalla cache o da loader(token_hash). loader restituisce il
+        record, None se il token non esiste, oppure solleva un'eccezione
+        (DB non disponibile) che non viene messa in cache.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(token_hash)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(token_hash)
+                self._stats['hits'] += 1
+                return entry[1]
+            self._stats['misses'] += 1
+            generation = self._generation
+
+        record = loader(token_hash)
+        ttl = self.config['ttl'] if record is not None else self.config['negative_ttl']
+        with self._lock:
+            if generation != self._generation:
+                return record
+            self._entries[token_hash] = (now + ttl, record)
+            self._entries.move_to_end(token_hash)
+            while len(self._entries) > self.config['max_entries']:
+                self._entries.popitem(last=False)
+        return record
+
+    def invalidate(self, token_ids=None, user_id=None):
+        """Scarta i token indicati, quelli di un utente, o tutto se senza argomenti"""
+        with self._lock:
+            self._generation += 1
+            if token_ids is None and user_id is None:
+                removed = len(self._entries)
+                self._entries.clear()
+            else:
+                token_ids = set(token_ids or ())
+                stale = [
+                    token_hash for token_hash, (_, record) in self._entries.items()
+                    if record is not None
+                    and (record['token_id'] in token_ids or record['user_id'] == user_id)
+                ]
+                for token_hash in stale:
+                    del self._entries[token_hash]
+                removed = len(stale)
+            self._stats['invalidations'] += removed
+            return removed
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            return stats
+
+
+_cache = ApiTokenCache(API_TOKEN_CACHE_CONFIG)
+
+
+def get_cached_api_token(token_hash, loader):
+    return _cache.get(token_hash, loader)
+
+
+def invalidate_api_tokens(token_ids=None, user_id=None):
+    """Da chiamare quando cambiano token (stato, rate limit, eliminazione) o utente"""
+    return _cache.invalidate(token_ids, user_id)
+
+
+def get_api_token_cache_stats():
+    return _cache.get_stats()
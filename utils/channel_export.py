@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+CHANNEL EXPORT - CSV CANALE IN FORMATO WIDE (STREAMING)
+Una riga per timestamp, una colonna per parametro numerico.
+I readings arrivano da un cursore server-side già ordinati per timestamp:
+il pivot avviene mentre si leggono, tenendo in memoria solo la riga
+corrente e il blocco di fetch, per qualunque periodo e numero di parametri.
+"""
+
+import io
+import csv
+import uuid
+
+import psycopg2
+
+from utils.db import execute_query, get_db_connection
+
+CHANNEL_EXPORT_FETCH_ROWS = 10000
+CHANNEL_EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+def build_channel_pivot_query(channel_id, start_date, end_date):
+    """
+    Query dei readings numerici del canale ordinati per timestamp, da
+    pivotare in streaming. Restituisce (query, params, parameters) con
+    parameters = [{'parameter_id', 'name'}] nell'ordine delle colonne,
+    oppure (None, None, None) se il canale non ha parametri numerici.
+    """
+    parameters = execute_query(
+        """
+        SELECT parameter_id, name
+        FROM parameters
+        WHERE channel_id = %s AND data_type = 'numeric'
+        ORDER BY name
+        """,
+        (channel_id,), fetch=True
+    )
+    if not parameters:
+        return None, None, None
+
+    query = """
+        SELECT r.timestamp_utc, r.parameter_id, r.value
+        FROM readings r
+        WHERE r.parameter_id = ANY(%s)
+          AND r.timestamp_utc BETWEEN %s AND %s
+          AND r.value IS NOT NULL
+        ORDER BY r.timestamp_utc DESC
+    """
+    params = ([p['parameter_id'] for p in parameters], start_date, end_date)
+    return query, params, parameters
+
+
+def iter_channel_pivot_rows(query, params, parameters, on_batch=None, fetch_rows=CHANNEL_EXPORT_FETCH_ROWS):
+    """
+    Generatore di righe [timestamp, valore_param1, valore_param2, ...]
+    dai readings ordinati per timestamp (cursore server-side).
+    on_batch(n) viene chiamata dopo ogni blocco di n readings letti.
+    """
+    column_of = {p['parameter_id']: i for i, p in enumerate(parameters)}
+    conn = get_db_connection()
+    if not conn:
+        raise psycopg2.OperationalError("Connessione database non disponibile")
+
+    try:
+        with conn.cursor(name=f"channel_export_{uuid.uuid4().hex}") as cur:
+            cur.itersize = fetch_rows
+            cur.execute(query, params)
+
+            current_ts, values = None, None
+            while True:
+                rows = cur.fetchmany(fetch_rows)
+                if not rows:
+                    break
+                for ts, parameter_id, value in rows:
+                    if ts != current_ts:
+                        if current_ts is not None:
+                            yield [current_ts.isoformat()] + values
+                        current_ts, values = ts, [''] * len(parameters)
+                    values[column_of[parameter_id]] = value
+                if on_batch:
+                    on_batch(len(rows))
+
+            if current_ts is not None:
+                yield [current_ts.isoformat()] + values
+    finally:
+        # Anche se il consumatore abbandona il generatore (client disconnesso)
+        conn.close()
+
+
+def stream_channel_pivot_csv(query, params, parameters, header=''):
+    """
+    Generatore di chunk CSV (bytes): BOM + header informativo, riga
+    intestazioni, poi una riga per timestamp a blocchi di ~64KB.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+
+    buffer.write('\ufeff' + header)
+    writer.writerow(['Timestamp'] + [p['name'] for p in parameters])
+
+    rows = iter_channel_pivot_rows(query, params, parameters)
+    try:
+        for row in rows:
+            writer.writerow(row)
+            if buffer.tell() >= CHANNEL_EXPORT_CHUNK_SIZE:
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate()
+    finally:
+        # Rilascia subito cursore e connessione
+        rows.close()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
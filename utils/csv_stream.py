@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+"""
+CSV STREAM - LETTURA A FINESTRE DI CSV SU MINIO
+I CSV dei sensori (anche centinaia di MB) non vengono più scaricati e
+caricati interi in pandas:
+- finestre di righe ?offset=&limit= lette in streaming dall'oggetto MinIO,
+  interrompendo il download appena la finestra è completa
+- proiezione delle colonne (?columns=a,b)
+- indice offset riga -> byte ogni CSV_INDEX_STEP righe, per ETag, costruito
+  man mano che il file viene letto: una pagina lontana riparte dal
+  checkpoint più vicino con una GET a range invece che dall'inizio
+- downsample min/max per grafici in un solo passaggio a memoria costante
+  (bucket di righe che raddoppiano quando superano il numero di punti)
+"""
+
+import csv
+import math
+import threading
+from collections import OrderedDict
+
+from utils.minio_client import get_minio_client, get_minio_bucket_name, iter_minio_object
+
+CSV_INDEX_STEP = 1000
+CSV_INDEX_MAX_ENTRIES = 128
+CSV_CHUNK_SIZE = 256 * 1024
+CSV_DEFAULT_LIMIT = 1000
+CSV_MAX_LIMIT = 10000
+CSV_MAX_DOWNSAMPLE_POINTS = 5000
+
+
+class CsvRowIndex:
+    """Checkpoint (byte) di un CSV: checkpoints[k] = inizio della riga dati k * step"""
+
+    def __init__(self, columns, data_start, size, step=CSV_INDEX_STEP):
+        self.columns = columns
+        self.size = size
+        self.step = step
+        self.checkpoints = [data_start]
+        self.total_rows = None
+        self._lock = threading.Lock()
+
+    def nearest(self, row):
+        """(riga, byte) del checkpoint noto più vicino prima di row"""
+        k = min(row // self.step, len(self.checkpoints) - 1)
+        return k * self.step, self.checkpoints[k]
+
+    def record(self, row, byte_offset):
+        if row % self.step == 0:
+            with self._lock:
+                if row // self.step == len(self.checkpoints):
+                    self.checkpoints.append(byte_offset)
+
+
+class CsvIndexCache:
+    """LRU degli indici per (file_path, etag): un file modificato ha un nuovo ETag"""
+
+    def __init__(self, max_entries=CSV_INDEX_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            index = self._entries.get(key)
+            if index is not None:
+                self._entries.move_to_end(key)
+            return index
+
+    def put(self, key, index):
+        with self._lock:
+            self._entries[key] = index
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_index_cache = CsvIndexCache()
+
+
+# =================================================================
+# PARSING IN STREAMING
+# =================================================================
+
+def _iter_records(file_path, start_byte):
+    """
+    (byte_offset, record_bytes) a partire da start_byte. Un record può
+    occupare più righe se contiene campi tra virgolette con a capo.
+    """
+    records = iter_minio_object(file_path, chunk_size=CSV_CHUNK_SIZE, offset=start_byte)
+    position = start_byte
+    buffer = b''
+    pending, pending_start = b'', None
+    try:
+        for chunk in records:
+            buffer += chunk
+            start = 0
+            while True:
+                newline = buffer.find(b'\n', start)
+                if newline < 0:
+                    break
+                line = buffer[start:newline + 1]
+                start = newline + 1
+                if not pending:
+                    pending_start = position
+                pending += line
+                position += len(line)
+                if pending.count(b'"') % 2 == 0:
+                    yield pending_start, pending
+                    pending = b''
+            buffer = buffer[start:]
+        if pending or buffer:
+            yield (pending_start if pending else position), pending + buffer
+    finally:
+        records.close()
+
+
+def _parse_record(record, strip_bom=False):
+    text = record.decode('utf-8', errors='replace').rstrip('\r\n')
+    if strip_bom:
+        text = text.lstrip('\ufeff')
+    if not text.strip():
+        return None
+    return next(csv.reader([text]))
+
+
+def _convert(value):
+    """Numeri come numeri (come pandas), stringa vuota come null"""
+    if value == '':
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        number = float(value)
+    except ValueError:
+        return value
+    # NaN/inf non sono JSON valido
+    return number if math.isfinite(number) else None
+
+
+def _stat(file_path):
+    return get_minio_client().stat_object(get_minio_bucket_name(), file_path)
+
+
+def _get_index(file_path, etag, size):
+    """Indice dal cache o nuovo (legge solo l'header)"""
+    key = (file_path, etag)
+    index = _index_cache.get(key)
+    if index is not None:
+        return index
+
+    columns, data_start = [], 0
+    if size:
+        records = _iter_records(file_path, 0)
+        try:
+            for offset, record in records:
+                values = _parse_record(record, strip_bom=(offset == 0))
+                if values is not None:
+                    columns, data_start = values, offset + len(record)
+                    break
+        finally:
+            records.close()
+
+    index = CsvRowIndex(columns, data_start, size)
+    if not columns:
+        index.total_rows = 0
+    _index_cache.put(key, index)
+    return index
+
+
+def _iter_rows(file_path, index, from_row=0):
+    """(numero_riga, valori) dalla riga from_row, aggiornando l'indice"""
+    row, start_byte = index.nearest(from_row)
+    if start_byte >= index.size:
+        # Solo header (o checkpoint a fine file): nessuna riga da leggere
+        index.total_rows = row
+        return
+    records = _iter_records(file_path, start_byte)
+    try:
+        for offset, record in records:
+            values = _parse_record(record)
+            if values is None:
+                continue
+            index.record(row, offset)
+            if row >= from_row:
+                yield row, values
+            row += 1
+        index.total_rows = row
+    finally:
+        records.close()
+
+
+def _project(columns, requested):
+    """Posizioni delle colonne richieste (ValueError per colonne inesistenti)"""
+    if not requested:
+        return list(range(len(columns)))
+    missing = [name for name in requested if name not in columns]
+    if missing:
+        raise ValueError(f"Colonne non presenti nel CSV: {', '.join(missing)}")
+    return [columns.index(name) for name in requested]
+
+
+def _dtypes(columns, rows):
+    dtypes = {}
+    for name in columns:
+        kinds = {type(row[name]) for row in rows if row.get(name) is not None}
+        if kinds and kinds <= {int}:
+            dtypes[name] = 'int64'
+        elif kinds and kinds <= {int, float}:
+            dtypes[name] = 'float64'
+        else:
+            dtypes[name] = 'object'
+    return dtypes
+
+
+# =================================================================
+# API
+# =================================================================
+
+def read_csv_window(file_path, offset=0, limit=CSV_DEFAULT_LIMIT, columns=None):
+    """Finestra di righe [offset, offset+limit) con le colonne richieste"""
+    stat = _stat(file_path)
+    index = _get_index(file_path, stat.etag, stat.size)
+    positions = _project(index.columns, columns)
+    names = [index.columns[i] for i in positions]
+
+    rows, has_more = [], False
+    rows_iter = _iter_rows(file_path, index, offset)
+    try:
+        for _, values in rows_iter:
+            if len(rows) >= limit:
+                has_more = True
+                break
+            rows.append({
+                name: _convert(values[i]) if i < len(values) else None
+                for name, i in zip(names, positions)
+            })
+    finally:
+        rows_iter.close()
+
+    total_rows = index.total_rows
+    return {
+        'columns': names,
+        'rows': rows,
+        'offset': offset,
+        'limit': limit,
+        'returned': len(rows),
+        'has_more': has_more,
+        'total_rows': total_rows,
+        'shape': [total_rows, len(names)],
+        'dtypes': _dtypes(names, rows),
+        'file_size': stat.size,
+    }
+
+
+def downsample_csv(file_path, points, columns=None, y_column=None):
+    """
+    Righe rappresentative per grafico: per ogni bucket di righe le righe
+    con minimo e massimo di y_column (default: seconda colonna proiettata).
+    Un solo passaggio sul file, memoria proporzionale a points.
+    """
+    stat = _stat(file_path)
+    index = _get_index(file_path, stat.etag, stat.size)
+    positions = _project(index.columns, columns)
+    names = [index.columns[i] for i in positions]
+    if y_column is None:
+        y_column = names[1] if len(names) > 1 else (names[0] if names else None)
+    if y_column not in names:
+        raise ValueError(f"Colonna {y_column} non presente nel CSV")
+    y_position = positions[names.index(y_column)]
+
+    bucket_size = 1
+    # bucket: [row_min, y_min, values_min, row_max, y_max, values_max]
+    buckets = []
+    current_id = None
+    source_rows = 0
+
+    for row, values in _iter_rows(file_path, index, 0):
+        source_rows += 1
+        y = _convert(values[y_position]) if y_position < len(values) else None
+        if not isinstance(y, (int, float)):
+            continue
+        bucket_id = row // bucket_size
+        if bucket_id != current_id:
+            buckets.append([row, y, values, row, y, values])
+            current_id = bucket_id
+            if len(buckets) > points:
+                # Raddoppia i bucket e fonde le coppie adiacenti
+                bucket_size *= 2
+                merged = []
+                for bucket in buckets:
+                    if merged and merged[-1][0] // bucket_size == bucket[0] // bucket_size:
+                        target = merged[-1]
+                        if bucket[1] < target[1]:
+                            target[0:3] = bucket[0:3]
+                        if bucket[4] > target[4]:
+                            target[3:6] = bucket[3:6]
+                    else:
+                        merged.append(bucket)
+                buckets = merged
+                current_id = row // bucket_size
+        else:
+            bucket = buckets[-1]
+            if y < bucket[1]:
+                bucket[0:3] = [row, y, values]
+            if y > bucket[4]:
+                bucket[3:6] = [row, y, values]
+
+    rows = []
+    for row_min, _, values_min, row_max, _, values_max in buckets:
+        picks = [(row_min, values_min)] if row_min == row_max else sorted(
+            [(row_min, values_min), (row_max, values_max)], key=lambda pick: pick[0]
+        )
+        for _, values in picks:
+            rows.append({
+                name: _convert(values[i]) if i < len(values) else None
+                for name, i in zip(names, positions)
+            })
+
+    return {
+        'columns': names,
+        'rows': rows,
+        'downsampled': True,
+        'y_column': y_column,
+        'source_rows': source_rows,
+        'total_rows': index.total_rows,
+        'returned': len(rows),
+        'shape': [index.total_rows, len(names)],
+        'dtypes': _dtypes(names, rows),
+        'file_size': stat.size,
+    }
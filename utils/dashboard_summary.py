@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+DASHBOARD SUMMARY - STATISTICHE DELLA HOME IN UNA QUERY
+La dashboard (index) mostra i conteggi delle 7 tabelle principali e
+l'attività recente (ultimi 3 record di ciascuna, top 10 complessivi).
+- conteggi e attività recente in un'unica query UNION ALL, quindi una
+  sola connessione e un solo round trip
+- risultato in cache nel processo per DASHBOARD_CACHE_TTL secondi
+- le route di salvataggio/eliminazione in routes/db (scenari, aree,
+  sistemi, misure) invalidano la cache, così chi modifica i dati vede
+  subito la dashboard aggiornata. Item, channel e parametri non hanno
+  route di scrittura nell'app: /items|channels|parameters/edit/<id>
+  rendono solo il form (GET), quindi le loro modifiche, fatte fuori
+  dall'app, compaiono entro DASHBOARD_CACHE_TTL. Una route di
+  salvataggio futura deve chiamare invalidate_dashboard_summary()
+Gli errori del DB non vengono messi in cache.
+"""
+
+import os
+import time
+import threading
+
+from utils.db import execute_query
+
+DASHBOARD_CONFIG = {
+    'ttl': float(os.getenv('DASHBOARD_CACHE_TTL', 30)),
+    'recent_per_table': 3,
+    'recent_total': 10,
+}
+
+# (chiave stats, tipo attività, tabella, alias, join per system_name)
+_SOURCES = [
+    ('scenarios', 'scenario', 'scenarios', 's', None),
+    ('areas', 'area', 'areas', 'a', None),
+    ('systems', 'system', 'systems', 'sy', None),
+    ('measurements', 'measurement', 'measurements', 'm',
+     'LEFT JOIN systems sy ON m.system_id = sy.system_id'),
+    ('items', 'item', 'items', 'i', None),
+    ('channels', 'channel', 'channels', 'c', None),
+    ('parameters', 'parameter', 'parameters', 'p', None),
+]
+
+# I sistemi sono contati ma non compaiono nell'attività recente
+_RECENT_TYPES = ('item', 'area', 'measurement', 'scenario', 'channel', 'parameter')
+
+
+def _build_query(recent_per_table):
+    # Prima le righe "recent": i tipi delle colonne di un UNION ALL si
+    # risolvono da sinistra, quindi i NULL delle righe "count" prendono
+    # quelli delle colonne reali (name, code, created_at)
+    parts = []
+    for _, activity, table, alias, join in _SOURCES:
+        if activity not in _RECENT_TYPES:
+            continue
+        system_name = 'sy.name' if join else 'NULL'
+        parts.append(
+            f"(SELECT 'recent' AS kind, '{activity}' AS entity, NULL::bigint AS count, "
+            f"{alias}.name AS name, {alias}.code AS code, {alias}.created_at AS created_at, "
+            f"{system_name} AS system_name FROM {table} {alias} {join or ''} "
+            f"ORDER BY {alias}.created_at DESC NULLS LAST LIMIT {int(recent_per_table)})"
+        )
+    parts.extend(
+        f"(SELECT 'count', '{key}', COUNT(*), NULL, NULL, NULL, NULL FROM {table})"
+        for key, _, table, _, _ in _SOURCES
+    )
+    return '\nUNION ALL\n'.join(parts)
+
+
+_SUMMARY_QUERY = _build_query(DASHBOARD_CONFIG['recent_per_table'])
+
+
+def _load_summary():
+    """(stats, recent_activity) nel formato del template index.html, None se errore DB"""
+    rows = execute_query(_SUMMARY_QUERY, fetch=True)
+    if rows is None:
+        return None
+
+    stats = {key: [] for key, _, _, _, _ in _SOURCES}
+    recent_activity = []
+    for row in rows:
+        if row['kind'] == 'count':
+            stats[row['entity']] = [{'count': row['count']}]
+        else:
+            activity = {
+                'name': row['name'],
+                'code': row['code'],
+                'created_at': row['created_at'],
+                'type': row['entity']
+            }
+            if row['entity'] == 'measurement':
+                activity['system_name'] = row['system_name']
+            recent_activity.append(activity)
+
+    # Senza created_at in fondo (senza confrontare None con date, con o senza fuso)
+    recent_activity.sort(key=lambda x: (x['created_at'] is not None, x['created_at'] or 0), reverse=True)
+    return stats, recent_activity[:DASHBOARD_CONFIG['recent_total']]
+
+
+class DashboardSummary:
+    """Riepilogo della dashboard in cache con TTL e invalidazione esplicita"""
+
+    def __init__(self, config):
+        self.config = config
+        self._lock = threading.Lock()
+        self._value = None
+        self._expires = 0
+        # Incrementata a ogni invalidazione: un calcolo partito prima
+        # di un salvataggio non rimette in cache dati vecchi
+        self._generation = 0
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'errors': 0}
+
+    def get(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._value is not None and self._expires > now:
+                self._stats['hits'] += 1
+                return self._value
+            self._stats['misses'] += 1
+            generation = self._generation
+
+        value = _load_summary()
+        if value is None:
+            self._stats['errors'] += 1
+            # Stesso risultato della dashboard con DB non raggiungibile
+            return {key: None for key, _, _, _, _ in _SOURCES}, []
+
+        with self._lock:
+            if generation == self._generation:
+                self._value = value
+                self._expires = now + self.config['ttl']
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._value = None
+            self._generation += 1
+            self._stats['invalidations'] += 1
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['cached'] = self._value is not None and self._expires > time.monotonic()
+            return stats
+
+
+_summary = DashboardSummary(DASHBOARD_CONFIG)
+
+
+def get_dashboard_summary():
+    """(stats, recent_activity) per la dashboard"""
+    return _summary.get()
+
+
+def invalidate_dashboard_summary():
+    """Da chiamare dopo salvataggi ed eliminazioni delle entità in dashboard"""
+    _summary.invalidate()
+
+
+def get_dashboard_stats():
+    return _summary.get_stats()
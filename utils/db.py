@@ -1,8 +1,14 @@
 # -*- coding: utf-8 -*-
 
 import psycopg2
+import psycopg2.extensions
 import psycopg2.extras
+import psycopg2.pool
 import os
+import queue
+import threading
+import time
+from collections import deque
 from dotenv import load_dotenv
 
 # Carica variabili ambiente dal file .env
@@ -16,26 +22,360 @@ DB_CONFIG = {
     'port': int(os.getenv('DB_PORT', 5432))
 }
 
-def get_db_connection():
-    try:
+# Configurazione pool connessioni (tutte sovrascrivibili da .env)
+DB_POOL_CONFIG = {
+    'min_size': int(os.getenv('DB_POOL_MIN', 2)),
+    'max_size': int(os.getenv('DB_POOL_MAX', 20)),
+    # Secondi massimi di attesa per una connessione libera
+    'checkout_timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+    # Connessioni più vecchie di così vengono chiuse e ricreate
+    'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', 1800)),
+    # Se una connessione è rimasta inattiva più di così, SELECT 1 al checkout
+    'health_check_idle': float(os.getenv('DB_POOL_HEALTH_CHECK_IDLE', 30)),
+}
+
+
+# ================================================
+# POOL CONNESSIONI
+# ================================================
+
+class PooledConnection:
+    """
+    Proxy sulla connessione psycopg2: close() restituisce la connessione
+    al pool invece di chiuderla, tutto il resto è delegato.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        conn = self.__dict__.get('_conn')
+        if conn is None:
+            raise psycopg2.InterfaceError('connessione già restituita al pool')
+        return getattr(conn, name)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self._conn.__exit__(exc_type, exc_value, traceback)
+
+    @property
+    def raw_connection(self):
+        """Connessione psycopg2 sottostante"""
+        return self._conn
+
+    def close(self):
+        """Restituisce la connessione al pool (idempotente)"""
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.release(conn)
+
+    def __del__(self):
+        # Rete di sicurezza: connessione dimenticata aperta dal chiamante.
+        # Il finalizer può girare su un thread che tiene già il lock del
+        # pool: niente release() qui, solo un append lock-free che il
+        # prossimo getconn() smaltisce
+        conn, self._conn = self.__dict__.get('_conn'), None
+        if conn is not None:
+            self._pool._leaked.append(conn)
+
+
+class ConnectionPool:
+    """
+    Pool thread-safe di connessioni PostgreSQL.
+    - setup di sessione (encoding, lc_messages, bytea_output) una sola volta per connessione
+    - health check al checkout per connessioni rimaste inattive a lungo
+    - riciclo delle connessioni rotte o più vecchie di max_lifetime
+    - metriche: attese, connessioni in uso, create, riciclate
+    """
+
+    def __init__(self, db_config, min_size=2, max_size=20, checkout_timeout=10,
+                 max_lifetime=1800, health_check_idle=30):
+        self.db_config = db_config
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.checkout_timeout = checkout_timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_idle = health_check_idle
+
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = deque()        # (conn, created_at, last_used)
+        self._created_at = {}       # id(conn) -> timestamp creazione
+        self._size = 0              # connessioni aperte (idle + in uso)
+        self._in_use = 0
+        self._pid = os.getpid()
+        # Connessioni ereditate da un fork: tenute referenziate e mai chiuse
+        self._orphaned = []
+        # Connessioni non chiuse dal chiamante, accodate dal finalizer di
+        # PooledConnection (deque.append/popleft sono atomici, senza lock)
+        self._leaked = deque()
+
+        self._stats = {
+            'checkouts': 0,
+            'created': 0,
+            'leaked': 0,
+            'recycled': 0,
+            'failed_health_checks': 0,
+            'timeouts': 0,
+            'wait_count': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+        }
+
+    # ---------- gestione connessioni fisiche ----------
+
+    def _create_connection(self):
+        """Apre una nuova connessione e applica il setup di sessione"""
+        config = self.db_config.copy()
         # Forza encoding UTF-8 nella stringa di connessione
-        DB_CONFIG_UTF8 = DB_CONFIG.copy()
-        DB_CONFIG_UTF8['options'] = '-c client_encoding=utf8'
-        
-        conn = psycopg2.connect(**DB_CONFIG_UTF8)
-        
-        # Forza encoding multiplo
+        config['options'] = '-c client_encoding=utf8'
+
+        conn = psycopg2.connect(**config)
         conn.set_client_encoding('UTF8')
-        
+
         with conn.cursor() as cur:
             cur.execute("SET client_encoding TO 'UTF8'")
             cur.execute("SET lc_messages TO 'C'")
             # Forza anche il server ad accettare solo UTF-8
-            cur.execute("SET bytea_output TO 'hex'")  
+            cur.execute("SET bytea_output TO 'hex'")
         conn.commit()
-        
         return conn
-    except psycopg2.Error as e:
+
+    def _close_connection(self, conn):
+        try:
+            if not conn.closed:
+                conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, conn, last_used):
+        """Controllo economico sempre, SELECT 1 solo se inattiva da tempo"""
+        if conn.closed:
+            return False
+        if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if time.monotonic() - last_used < self.health_check_idle:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _check_fork(self):
+        """Dopo un fork (gunicorn preload) le connessioni ereditate non sono utilizzabili"""
+        if self._pid != os.getpid():
+            with self._cond:
+                if self._pid != os.getpid():
+                    # Non chiudere: il socket appartiene al processo padre
+                    self._orphaned.extend(c for c, _, _ in self._idle)
+                    self._idle.clear()
+                    self._created_at.clear()
+                    self._size = 0
+                    self._in_use = 0
+                    self._pid = os.getpid()
+
+    # ---------- API pubblica ----------
+
+    def prefill(self):
+        """Apre le connessioni minime (chiamata opzionale all'avvio)"""
+        self._check_fork()
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._create_connection()
+            except psycopg2.Error:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            now = time.monotonic()
+            with self._cond:
+                self._created_at[id(conn)] = now
+                self._stats['created'] += 1
+                self._idle.append((conn, now, now))
+                self._cond.notify()
+
+    def _drain_leaked(self):
+        """Restituisce al pool le connessioni accodate dal finalizer"""
+        while True:
+            try:
+                conn = self._leaked.popleft()
+            except IndexError:
+                return
+            with self._cond:
+                self._stats['leaked'] += 1
+            self.release(conn)
+
+    def getconn(self):
+        """Preleva una connessione dal pool, aspettando se è esaurito"""
+        self._check_fork()
+        self._drain_leaked()
+        deadline = time.monotonic() + self.checkout_timeout
+        wait_start = None
+
+        while True:
+            candidate = None
+            must_create = False
+
+            with self._cond:
+                while not self._idle and self._size >= self.max_size:
+                    if wait_start is None:
+                        wait_start = time.monotonic()
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise psycopg2.pool.PoolError(
+                            f"Pool connessioni esaurito ({self.max_size}) dopo {self.checkout_timeout}s"
+                        )
+                    self._cond.wait(remaining)
+
+                if self._idle:
+                    candidate = self._idle.pop()  # LIFO: connessioni "calde"
+                else:
+                    self._size += 1
+                    must_create = True
+
+            if must_create:
+                try:
+                    conn = self._create_connection()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._created_at[id(conn)] = time.monotonic()
+                    self._stats['created'] += 1
+                break
+
+            conn, created_at, last_used = candidate
+            expired = self.max_lifetime and (time.monotonic() - created_at) > self.max_lifetime
+            if not expired and self._is_healthy(conn, last_used):
+                break
+
+            # Connessione rotta o scaduta: chiudi e riprova
+            if not expired:
+                with self._cond:
+                    self._stats['failed_health_checks'] += 1
+            self._discard(conn)
+
+        with self._cond:
+            self._in_use += 1
+            self._stats['checkouts'] += 1
+            if wait_start is not None:
+                waited = time.monotonic() - wait_start
+                self._stats['wait_count'] += 1
+                self._stats['wait_time_total'] += waited
+                self._stats['wait_time_max'] = max(self._stats['wait_time_max'], waited)
+
+        return PooledConnection(self, conn)
+
+    def release(self, conn):
+        """Rimette la connessione nel pool dopo aver ripulito la transazione"""
+        if self._pid != os.getpid():
+            self._orphaned.append(conn)
+            return
+
+        reusable = not conn.closed
+        if reusable:
+            try:
+                status = conn.get_transaction_status()
+                if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                    reusable = False
+                elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if reusable and conn.autocommit:
+                    conn.autocommit = False
+            except psycopg2.Error:
+                reusable = False
+
+        created_at = self._created_at.get(id(conn), 0)
+        if reusable and self.max_lifetime and (time.monotonic() - created_at) > self.max_lifetime:
+            reusable = False
+
+        with self._cond:
+            self._in_use = max(0, self._in_use - 1)
+
+        if not reusable:
+            self._discard(conn)
+            return
+
+        with self._cond:
+            self._idle.append((conn, created_at, time.monotonic()))
+            self._cond.notify()
+
+    def _discard(self, conn):
+        self._close_connection(conn)
+        with self._cond:
+            self._created_at.pop(id(conn), None)
+            self._size = max(0, self._size - 1)
+            self._stats['recycled'] += 1
+            self._cond.notify()
+
+    def closeall(self):
+        """Chiude tutte le connessioni inattive"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            for conn, _, _ in idle:
+                self._created_at.pop(id(conn), None)
+        for conn, _, _ in idle:
+            self._close_connection(conn)
+
+    def get_stats(self):
+        """Metriche del pool per monitoraggio"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                'pid': self._pid,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'size': self._size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'wait_time_avg': (
+                    stats['wait_time_total'] / stats['wait_count'] if stats['wait_count'] else 0.0
+                ),
+            })
+        return stats
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Pool globale, creato al primo utilizzo"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_CONFIG, **DB_POOL_CONFIG)
+    return _pool
+
+def get_pool_stats():
+    """Metriche del pool connessioni del processo corrente"""
+    return get_pool().get_stats()
+
+
+# ================================================
+# API DATABASE
+# ================================================
+
+def get_db_connection():
+    """Connessione dal pool: chiamare close() per restituirla"""
+    try:
+        return get_pool().getconn()
+    except (psycopg2.Error, psycopg2.pool.PoolError) as e:
         print(f"Errore connessione database: {e}")
         return None
 
@@ -56,10 +396,33 @@ def execute_query(query, params=None, fetch=False):
                 return True
     except psycopg2.Error as e:
         print(f"Errore query: {e}")
-        conn.rollback()
+        try:
+            conn.rollback()
+        except psycopg2.Error:
+            pass
+        conn.close()
+        return None
+
+def execute_query_rows(query, params=None):
+    """Come execute_query(fetch=True) ma con righe tuple (niente dict per riga)"""
+    conn = get_db_connection()
+    if not conn:
+        return None
+    try:
+        with conn.cursor() as cur:
+            cur.execute(query, params)
+            result = cur.fetchall()
+            conn.close()
+            return result
+    except psycopg2.Error as e:
+        print(f"Errore query: {e}")
+        try:
+            conn.rollback()
+        except psycopg2.Error:
+            pass
         conn.close()
         return None
-        
+
 def execute_insert_returning(query, params=None):
     """Esegue INSERT con RETURNING e fa il commit"""
     conn = get_db_connection()
@@ -74,6 +437,123 @@ def execute_insert_returning(query, params=None):
             return result
     except psycopg2.Error as e:
         print(f"Errore query: {e}")
-        conn.rollback()
+        try:
+            conn.rollback()
+        except psycopg2.Error:
+            pass
         conn.close()
-        return None
\ No newline at end of file
+        return None
+
+
+# ================================================
+# STREAMING COPY TO STDOUT
+# ================================================
+
+class _CopyAborted(Exception):
+    """Il consumatore ha chiuso lo stream (es. client disconnesso)"""
+
+
+class _CopyQueueWriter:
+    """
+    File-like passato a copy_expert: accorpa le righe COPY in chunk
+    e li mette in una coda limitata (backpressure sul thread lettore).
+    """
+
+    def __init__(self, out_queue, stop_event, chunk_size):
+        self.out_queue = out_queue
+        self.stop_event = stop_event
+        self.chunk_size = chunk_size
+        self._parts = []
+        self._buffered = 0
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self._parts.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self.chunk_size:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        if self._parts:
+            chunk = b''.join(self._parts)
+            self._parts = []
+            self._buffered = 0
+            self.put(chunk)
+
+    def put(self, item):
+        # Attesa a intervalli brevi per accorgersi subito di un abort
+        while True:
+            if self.stop_event.is_set():
+                raise _CopyAborted()
+            try:
+                self.out_queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+
+def stream_copy_csv(query, params=None, header=True, chunk_size=64 * 1024, max_queued_chunks=16):
+    """
+    Generatore di chunk CSV prodotti da COPY (query) TO STDOUT.
+
+    Un thread dedicato esegue il COPY e riempie una coda limitata
+    (max_queued_chunks * chunk_size byte in memoria al massimo): i chunk
+    arrivano al client mentre PostgreSQL sta ancora producendo righe.
+    Se il consumatore chiude il generatore il COPY viene annullato lato server.
+    """
+    conn = get_db_connection()
+    if not conn:
+        raise psycopg2.OperationalError("Connessione database non disponibile")
+
+    out_queue = queue.Queue(maxsize=max_queued_chunks)
+    stop_event = threading.Event()
+    conn_lock = threading.Lock()
+    state = {'released': False}
+    done = object()
+
+    def reader():
+        writer = _CopyQueueWriter(out_queue, stop_event, chunk_size)
+        try:
+            with conn.cursor() as cur:
+                copy_query = cur.mogrify(query, params).decode('utf-8')
+                options = 'CSV HEADER' if header else 'CSV'
+                cur.copy_expert(f"COPY ({copy_query}) TO STDOUT WITH {options}", writer)
+            writer.flush()
+            writer.put(done)
+        except _CopyAborted:
+            pass
+        except Exception as e:
+            if not stop_event.is_set():
+                try:
+                    writer.put(e)
+                except _CopyAborted:
+                    pass
+        finally:
+            with conn_lock:
+                state['released'] = True
+                conn.close()
+
+    thread = threading.Thread(target=reader, name='pg-copy-stream', daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item = out_queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        if thread.is_alive():
+            stop_event.set()
+            # Interrompe il COPY lato server (il thread rilascia la connessione)
+            with conn_lock:
+                if not state['released']:
+                    try:
+                        conn.cancel()
+                    except psycopg2.Error:
+                        pass
+            thread.join(timeout=5)
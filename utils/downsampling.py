@@ -0,0 +1,369 @@
+# -*- coding: utf-8 -*-
+"""
+DOWNSAMPLING READINGS - MOTORE PER I GRAFICI
+Modalità selezionabili con ?downsample=minmax|lttb|m4|avg:
+- minmax: punto minimo e massimo per bucket (SQL, da rollup se disponibili)
+- avg:    media per bucket (SQL, da rollup se disponibili)
+- m4:     primo/min/max/ultimo per bucket temporale (SQL, da rollup se disponibili)
+- lttb:   Largest-Triangle-Three-Buckets (NumPy) su una preselezione M4 in SQL
+          di al massimo LTTB_PRESELECT_RATIO * limit punti (MinMaxLTTB)
+Ogni modalità restituisce al massimo `limit` punti, ordinati per timestamp
+e senza duplicati. Nessuna modalità carica in memoria i readings raw del
+periodo: la memoria del worker è limitata dal numero di punti in uscita.
+"""
+
+import os
+import time
+import uuid
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+
+from utils.db import execute_query, execute_query_rows, get_db_connection
+from utils.readings_columnar import epoch_seconds_to_ms, readings_to_columns
+from utils.readings_rollup import (
+    RAW_RESOLUTION,
+    choose_rollup_resolution,
+    build_rollup_minmax_query,
+    build_rollup_m4_query,
+    build_rollup_avg_query
+)
+
+DOWNSAMPLE_MODES = ('minmax', 'lttb', 'm4', 'avg')
+DEFAULT_DOWNSAMPLE_MODE = 'minmax'
+
+# Righe per fetchmany dal cursore server-side
+FETCH_CHUNK_ROWS = 50000
+
+# Punti preselezionati (M4) per ogni punto LTTB in uscita
+LTTB_PRESELECT_RATIO = max(1, int(os.getenv('READINGS_LTTB_PRESELECT_RATIO', 4)))
+
+# Valore numerico tipizzato (migrations/002_readings_value_num.sql):
+# coperto dall'indice parziale (parameter_id, timestamp_utc) INCLUDE (value_num)
+_VALUE_NUM_SQL = ("r.value_num", "r.value_num IS NOT NULL")
+
+# Senza la migrazione: parsing del testo con la stessa regex di
+# readings_value_as_float (migrations/001_readings_rollup.sql)
+_NUMERIC_TEXT_PATTERN = r"'^\s*-?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][-+]?[0-9]+)?\s*$'"
+_VALUE_TEXT_SQL = (
+    f"(CASE WHEN r.value ~ {_NUMERIC_TEXT_PATTERN} THEN r.value::double precision END)",
+    f"r.value ~ {_NUMERIC_TEXT_PATTERN}",
+)
+
+_AVAILABILITY_TTL = 60  # secondi
+_value_num = {'value': None, 'checked_at': 0.0}
+_value_num_lock = threading.Lock()
+
+
+def value_num_available():
+    """True se readings.value_num esiste (controllo in cache per 60s)"""
+    now = time.monotonic()
+    with _value_num_lock:
+        if _value_num['value'] is not None and now - _value_num['checked_at'] < _AVAILABILITY_TTL:
+            return _value_num['value']
+
+    result = execute_query(
+        """
+        SELECT EXISTS (
+            SELECT 1 FROM pg_attribute
+            WHERE attrelid = to_regclass('readings') AND attname = 'value_num' AND NOT attisdropped
+        ) AS available
+        """,
+        fetch=True
+    )
+    # Con il DB non raggiungibile si usa il parsing del testo, sempre valido
+    available = bool(result) and bool(result[0]['available'])
+
+    with _value_num_lock:
+        _value_num['value'] = available
+        _value_num['checked_at'] = now
+    return available
+
+
+def numeric_value_sql():
+    """
+    (espressione, filtro) SQL del valore numerico di readings (alias r):
+    value_num se la migrazione 002 è applicata, altrimenti parsing del testo
+    """
+    return _VALUE_NUM_SQL if value_num_available() else _VALUE_TEXT_SQL
+
+
+# =================================================================
+# QUERY SQL (pushdown per minmax / avg)
+# =================================================================
+
+def bucket_id_sql(ts_column):
+    """
+    Bucket allineato all'inizio del periodo e limitato a [0, num_buckets-1]:
+    il numero di bucket non può superare num_buckets.
+    Parametri attesi: start_date, interval_seconds, num_buckets - 1
+    """
+    return (
+        f"LEAST(GREATEST(floor((extract(epoch from {ts_column}) - extract(epoch from %s)) / %s), 0), %s)"
+    )
+
+def build_raw_minmax_query(parameter_ids, start_date, end_date, num_buckets):
+    """
+    Min e max per bucket e parametro dai readings raw
+    (UNION: min e max sulla stessa riga contano una volta)
+    """
+    interval_seconds = max(1, (end_date - start_date).total_seconds() / num_buckets)
+    value_expr, value_filter = numeric_value_sql()
+    query = f"""
+        WITH buckets AS (
+            SELECT
+                r.parameter_id, r.timestamp_utc, {value_expr} as value,
+                {bucket_id_sql('r.timestamp_utc')} as bucket_id
+            FROM readings r
+            WHERE r.parameter_id = ANY(%s)
+              AND r.timestamp_utc >= %s
+              AND r.timestamp_utc <= %s
+              AND {value_filter}
+        ),
+        min_max_points AS (
+            (SELECT DISTINCT ON (parameter_id, bucket_id) parameter_id, timestamp_utc, value
+             FROM buckets ORDER BY parameter_id, bucket_id, value ASC, timestamp_utc ASC)
+            UNION
+            (SELECT DISTINCT ON (parameter_id, bucket_id) parameter_id, timestamp_utc, value
+             FROM buckets ORDER BY parameter_id, bucket_id, value DESC, timestamp_utc ASC)
+        )
+        SELECT parameter_id, timestamp_utc, value FROM min_max_points ORDER BY parameter_id, timestamp_utc ASC
+    """
+    params = (start_date, interval_seconds, num_buckets - 1, list(parameter_ids), start_date, end_date)
+    return query, params
+
+def build_raw_m4_query(parameter_ids, start_date, end_date, num_buckets):
+    """
+    M4 per bucket temporale e parametro dai readings raw: primo, min, max e
+    ultimo punto (UNION: i punti coincidenti contano una volta)
+    """
+    interval_seconds = max(1, (end_date - start_date).total_seconds() / num_buckets)
+    value_expr, value_filter = numeric_value_sql()
+    query = f"""
+        WITH buckets AS (
+            SELECT
+                r.parameter_id, r.timestamp_utc, {value_expr} as value,
+                {bucket_id_sql('r.timestamp_utc')} as bucket_id
+            FROM readings r
+            WHERE r.parameter_id = ANY(%s)
+              AND r.timestamp_utc >= %s
+              AND r.timestamp_utc <= %s
+              AND {value_filter}
+        ),
+        m4_points AS (
+            (SELECT DISTINCT ON (parameter_id, bucket_id) parameter_id, timestamp_utc, value
+             FROM buckets ORDER BY parameter_id, bucket_id, timestamp_utc ASC)
+            UNION
+            (SELECT DISTINCT ON (parameter_id, bucket_id) parameter_id, timestamp_utc, value
+             FROM buckets ORDER BY parameter_id, bucket_id, value ASC, timestamp_utc ASC)
+            UNION
+            (SELECT DISTINCT ON (parameter_id, bucket_id) parameter_id, timestamp_utc, value
+             FROM buckets ORDER BY parameter_id, bucket_id, value DESC, timestamp_utc ASC)
+            UNION
+            (SELECT DISTINCT ON (parameter_id, bucket_id) parameter_id, timestamp_utc, value
+             FROM buckets ORDER BY parameter_id, bucket_id, timestamp_utc DESC)
+        )
+        SELECT parameter_id, timestamp_utc, value FROM m4_points ORDER BY parameter_id, timestamp_utc ASC
+    """
+    params = (start_date, interval_seconds, num_buckets - 1, list(parameter_ids), start_date, end_date)
+    return query, params
+
+def build_raw_avg_query(parameter_ids, start_date, end_date, num_buckets):
+    """Media per bucket e parametro dai readings raw, timestamp al centro dei campioni del bucket"""
+    interval_seconds = max(1, (end_date - start_date).total_seconds() / num_buckets)
+    value_expr, value_filter = numeric_value_sql()
+    query = f"""
+        SELECT
+            r.parameter_id,
+            MIN(r.timestamp_utc) + (MAX(r.timestamp_utc) - MIN(r.timestamp_utc)) / 2 as timestamp_utc,
+            AVG({value_expr}) as value
+        FROM readings r
+        WHERE r.parameter_id = ANY(%s)
+          AND r.timestamp_utc >= %s
+          AND r.timestamp_utc <= %s
+          AND {value_filter}
+        GROUP BY r.parameter_id, {bucket_id_sql('r.timestamp_utc')}
+        ORDER BY 1, 2 ASC
+    """
+    params = (list(parameter_ids), start_date, end_date, start_date, interval_seconds, num_buckets - 1)
+    return query, params
+
+
+# =================================================================
+# FETCH TIPIZZATO IN STREAMING
+# =================================================================
+
+def fetch_numeric_series(query, params):
+    """
+    Risultato di una query (parameter_id, timestamp_utc, value) come array
+    NumPy (parameter_id int64, epoch secondi float64, valori float64)
+    ordinati per parametro e timestamp, letti a blocchi da un cursore
+    server-side senza creare dict per riga.
+    """
+    query = f"""
+        SELECT q.parameter_id, extract(epoch from q.timestamp_utc)::float8, q.value::float8
+        FROM ({query}) q
+        ORDER BY 1, 2
+    """
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Connessione database non disponibile")
+
+    chunks = []
+    try:
+        with conn.cursor(name=f"downsample_{uuid.uuid4().hex}") as cur:
+            cur.itersize = FETCH_CHUNK_ROWS
+            cur.execute(query, params)
+            while True:
+                rows = cur.fetchmany(FETCH_CHUNK_ROWS)
+                if not rows:
+                    break
+                chunks.append(np.array(rows, dtype=np.float64))
+    finally:
+        conn.close()
+
+    if not chunks:
+        empty = np.empty(0, dtype=np.float64)
+        return empty.astype(np.int64), empty, empty
+
+    data = np.concatenate(chunks)
+    return data[:, 0].astype(np.int64), data[:, 1], data[:, 2]
+
+
+# =================================================================
+# ALGORITMI NUMPY
+# =================================================================
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: primo e ultimo punto fissi,
+    n_out - 2 bucket intermedi da cui si sceglie il punto che forma il
+    triangolo di area massima con il punto precedente e la media del successivo.
+    """
+    n_points = len(x)
+    if n_out >= n_points:
+        return np.arange(n_points)
+    if n_out < 3:
+        return np.array([0, n_points - 1][:n_out], dtype=np.int64)
+
+    # Bucket intermedi su [1, n_points - 1)
+    bounds = np.linspace(1, n_points - 1, n_out - 1).astype(np.int64)
+    starts = bounds[:-1]
+    sizes = np.diff(bounds)
+
+    # Medie di ogni bucket (vettoriali); per l'ultimo bucket il "successivo" è l'ultimo punto
+    avg_x = np.append(np.add.reduceat(x[1:n_points - 1], starts - 1) / sizes, x[-1])
+    avg_y = np.append(np.add.reduceat(y[1:n_points - 1], starts - 1) / sizes, y[-1])
+
+    sampled = np.empty(n_out, dtype=np.int64)
+    sampled[0] = 0
+    sampled[-1] = n_points - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = bounds[i], bounds[i + 1]
+        next_x, next_y = avg_x[i + 1], avg_y[i + 1]
+        area = np.abs(
+            (x[a] - next_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y - y[a])
+        )
+        a = lo + int(np.argmax(area))
+        sampled[i + 1] = a
+    return sampled
+
+
+# =================================================================
+# ENTRY POINT
+# =================================================================
+
+def _rows_from_arrays(ts_seconds, values):
+    return [
+        {
+            'timestamp_utc': datetime.fromtimestamp(ts, tz=timezone.utc),
+            'value': value
+        }
+        for ts, value in zip(ts_seconds.tolist(), values.tolist())
+    ]
+
+def downsample_readings_batch(parameter_ids, start_date, end_date, limit, mode=DEFAULT_DOWNSAMPLE_MODE,
+                              columnar=False):
+    """
+    Serie sottocampionate di più parametri numerici con una sola query,
+    al massimo `limit` punti per parametro.
+    Restituisce ({parameter_id: rows}, resolution) con rows = [{'timestamp_utc', 'value'}, ...]
+    ordinati per timestamp e resolution = 'raw' o la risoluzione di rollup usata.
+    Con columnar=True ogni serie è già {'timestamp_ms', 'value'} (readings_to_columns),
+    senza passare da dict per riga.
+    """
+    limit = max(1, limit)
+    series = {p_id: [] for p_id in parameter_ids}
+    if not series:
+        return series, RAW_RESOLUTION
+
+    if mode not in DOWNSAMPLE_MODES:
+        raise ValueError(f"Modalità downsampling non supportata: {mode}")
+
+    # Pushdown SQL, sulla tabella di rollup più grossolana adatta se presente.
+    # LTTB parte da una preselezione M4 di al massimo LTTB_PRESELECT_RATIO * limit punti;
+    # con meno di 4 punti in uscita M4 degrada a min/max
+    if mode == 'lttb':
+        sql_mode, num_buckets = 'm4', max(1, limit * LTTB_PRESELECT_RATIO // 4)
+    elif mode == 'm4' and limit >= 4:
+        sql_mode, num_buckets = 'm4', limit // 4
+    elif mode in ('minmax', 'm4'):
+        sql_mode, num_buckets = 'minmax', max(1, limit // 2)
+    else:
+        sql_mode, num_buckets = 'avg', limit
+    rollup = choose_rollup_resolution(start_date, end_date, num_buckets)
+
+    if rollup:
+        builder = {
+            'minmax': build_rollup_minmax_query,
+            'm4': build_rollup_m4_query,
+            'avg': build_rollup_avg_query,
+        }[sql_mode]
+        query, params = builder(rollup, series.keys(), start_date, end_date, num_buckets)
+        resolution = rollup['name']
+    else:
+        builder = {
+            'minmax': build_raw_minmax_query,
+            'm4': build_raw_m4_query,
+            'avg': build_raw_avg_query,
+        }[sql_mode]
+        query, params = builder(series.keys(), start_date, end_date, num_buckets)
+        resolution = RAW_RESOLUTION
+
+    if mode != 'lttb':
+        if columnar:
+            for row in execute_query_rows(query, params) or []:
+                series[row[0]].append(row[1:])
+            return {p_id: readings_to_columns(rows, True) for p_id, rows in series.items()}, resolution
+
+        for row in execute_query(query, params, fetch=True) or []:
+            series[row.pop('parameter_id')].append(row)
+        return series, resolution
+
+    p_ids, ts_seconds, values = fetch_numeric_series(query, params)
+
+    # Confini dei blocchi contigui di ciascun parametro
+    splits = np.flatnonzero(np.diff(p_ids)) + 1
+    for lo, hi in zip(np.concatenate([[0], splits]), np.concatenate([splits, [len(p_ids)]])):
+        if hi <= lo:
+            continue
+        x, y = ts_seconds[lo:hi], values[lo:hi]
+        if len(x) > limit:
+            idx = lttb_indices(x, y, limit)
+            x, y = x[idx], y[idx]
+        if columnar:
+            series[int(p_ids[lo])] = {'timestamp_ms': epoch_seconds_to_ms(x), 'value': y}
+        else:
+            series[int(p_ids[lo])] = _rows_from_arrays(x, y)
+
+    return series, resolution
+
+def downsample_readings(parameter_id, start_date, end_date, limit, mode=DEFAULT_DOWNSAMPLE_MODE, columnar=False):
+    """
+    Serie sottocampionata di un parametro numerico con al massimo `limit` punti.
+    Restituisce (rows, resolution), vedi downsample_readings_batch.
+    """
+    series, resolution = downsample_readings_batch([parameter_id], start_date, end_date, limit, mode, columnar)
+    return series[parameter_id], resolution
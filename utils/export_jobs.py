@@ -0,0 +1,624 @@
+# -*- coding: utf-8 -*-
+"""
+EXPORT JOBS - EXPORT ASINCRONI DI PARAMETRI E CANALI
+Gli export completi non girano più nel thread della richiesta:
+submit -> job_id, polling dello stato/avanzamento, download dell'artifact.
+
+- Coda persistente nella tabella export_jobs (migrations/005_export_jobs.sql),
+  condivisa tra tutti i processi dell'app.
+- Pool di worker limitato per processo (EXPORT_JOBS_WORKERS), claim dei job
+  con FOR UPDATE SKIP LOCKED e al massimo EXPORT_JOBS_MAX_RUNNING_PER_USER
+  job in esecuzione per utente (controllo serializzato per utente con un
+  advisory lock).
+- I job in esecuzione hanno un heartbeat: quelli di un worker morto
+  vengono rimessi in coda o marcati failed.
+- I readings sono letti con cursore server-side e scritti in CSV su file
+  temporaneo a memoria costante, poi salvati su MinIO o su disco fino alla
+  scadenza (EXPORT_JOBS_TTL_HOURS).
+- Il traffico viene addebitato al download sulla dimensione reale dell'artifact.
+"""
+
+import os
+import csv
+import uuid
+import shutil
+import logging
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from utils.db import execute_query, execute_insert_returning, get_db_connection
+from utils.keyset_pagination import count_readings
+from utils.channel_export import build_channel_pivot_query, iter_channel_pivot_rows
+
+EXPORT_JOBS_CONFIG = {
+    'workers': int(os.getenv('EXPORT_JOBS_WORKERS', 2)),
+    'max_running_per_user': int(os.getenv('EXPORT_JOBS_MAX_RUNNING_PER_USER', 1)),
+    'max_pending_per_user': int(os.getenv('EXPORT_JOBS_MAX_PENDING_PER_USER', 5)),
+    # 'minio' | 'disk'
+    'storage': os.getenv('EXPORT_JOBS_STORAGE', 'disk').lower(),
+    'dir': os.getenv('EXPORT_JOBS_DIR', os.path.join(tempfile.gettempdir(), 'mercurio_exports')),
+    'minio_prefix': os.getenv('EXPORT_JOBS_MINIO_PREFIX', 'exports/'),
+    'ttl_hours': float(os.getenv('EXPORT_JOBS_TTL_HOURS', 24)),
+    # Secondi tra due controlli della coda quando è vuota
+    'poll_interval': float(os.getenv('EXPORT_JOBS_POLL_INTERVAL', 5)),
+    'fetch_rows': int(os.getenv('EXPORT_JOBS_FETCH_ROWS', 10000)),
+    # Lease dei job in esecuzione (migrations/008): heartbeat ogni
+    # heartbeat_interval, job con heartbeat più vecchio di stale_after
+    # rimessi in coda fino a max_attempts tentativi
+    'heartbeat_interval': float(os.getenv('EXPORT_JOBS_HEARTBEAT_INTERVAL', 30)),
+    'stale_after': float(os.getenv('EXPORT_JOBS_STALE_AFTER', 180)),
+    'max_attempts': int(os.getenv('EXPORT_JOBS_MAX_ATTEMPTS', 2)),
+}
+
+# Classi degli advisory lock Postgres per il claim e il submit per utente
+_ADVISORY_CLASS = 0x6578
+_SUBMIT_ADVISORY_CLASS = 0x6579
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+class ExportJobLimitError(Exception):
+    """Troppi job attivi per l'utente"""
+
+
+class _JobCancelled(Exception):
+    pass
+
+
+class _JobLost(Exception):
+    """Il job è stato dato per perso e ripreso da un altro tentativo"""
+
+
+# =================================================================
+# API DEI JOB
+# =================================================================
+
+def submit_export_job(user_id, kind, item_id, start_date, end_date):
+    """
+    Accoda un export ('parameter' | 'channel') e restituisce il job.
+    Conteggio dei job attivi e INSERT nella stessa transazione sotto un
+    advisory lock per utente: due submit concorrenti non superano il tetto.
+    """
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Impossibile creare il job di export")
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(%s, %s)", (_SUBMIT_ADVISORY_CLASS, user_id or 0))
+            cur.execute(
+                "SELECT COUNT(*) FROM export_jobs WHERE user_id IS NOT DISTINCT FROM %s AND status IN %s",
+                (user_id, ACTIVE_STATUSES)
+            )
+            if cur.fetchone()[0] >= EXPORT_JOBS_CONFIG['max_pending_per_user']:
+                raise ExportJobLimitError(
+                    f"Massimo {EXPORT_JOBS_CONFIG['max_pending_per_user']} export in coda o in esecuzione per utente"
+                )
+
+            cur.execute(
+                """
+                INSERT INTO export_jobs (job_id, user_id, kind, item_id, start_date, end_date, expires_at)
+                VALUES (%s, %s, %s, %s, %s, %s, now() + %s * interval '1 hour')
+                RETURNING *
+                """,
+                (str(uuid.uuid4()), user_id, kind, item_id, start_date, end_date, EXPORT_JOBS_CONFIG['ttl_hours'])
+            )
+            columns = [col[0] for col in cur.description]
+            job = dict(zip(columns, cur.fetchone()))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    get_export_runner().wake()
+    return job
+
+def get_export_job(job_id):
+    try:
+        uuid.UUID(str(job_id))
+    except ValueError:
+        return None
+    result = execute_query("SELECT * FROM export_jobs WHERE job_id = %s", (str(job_id),), fetch=True)
+    return result[0] if result else None
+
+def list_export_jobs(user_id, limit=50):
+    return execute_query(
+        """
+        SELECT * FROM export_jobs
+        WHERE user_id IS NOT DISTINCT FROM %s
+        ORDER BY created_at DESC
+        LIMIT %s
+        """,
+        (user_id, limit), fetch=True
+    ) or []
+
+def cancel_export_job(job_id):
+    """
+    Annulla un job in coda, chiede l'interruzione di uno in esecuzione
+    o elimina l'artifact di uno completato. Restituisce il job aggiornato.
+    """
+    result = execute_insert_returning(
+        """
+        UPDATE export_jobs
+        SET status = CASE WHEN status = 'queued' THEN 'cancelled' ELSE status END,
+            cancel_requested = (status = 'running'),
+            finished_at = CASE WHEN status = 'queued' THEN now() ELSE finished_at END
+        WHERE job_id = %s
+        RETURNING *
+        """,
+        (str(job_id),)
+    )
+    job = result[0] if result else None
+    if job and job['status'] == 'done':
+        _delete_artifact(job)
+        result = execute_insert_returning(
+            "UPDATE export_jobs SET status = 'cancelled', artifact_path = NULL WHERE job_id = %s RETURNING *",
+            (str(job_id),)
+        )
+        job = result[0] if result else job
+    return job
+
+def serialize_export_job(job):
+    """Job in formato JSON per le API (date ISO, avanzamento in %)"""
+    data = {}
+    for key, value in job.items():
+        if key == 'artifact_path':
+            continue
+        data[key] = value.isoformat() if hasattr(value, 'isoformat') else value
+    data['job_id'] = str(job['job_id'])
+
+    estimated = job.get('estimated_rows') or 0
+    if job['status'] == 'done':
+        data['progress_pct'] = 100
+    elif estimated > 0:
+        data['progress_pct'] = min(99, round(job['progress_rows'] * 100 / estimated))
+    else:
+        data['progress_pct'] = 0
+    return data
+
+
+# =================================================================
+# ARTIFACT
+# =================================================================
+
+def _minio():
+    from utils.minio_client import get_minio_client, get_minio_bucket_name
+    return get_minio_client(), get_minio_bucket_name()
+
+def _store_artifact(job, tmp_path):
+    """Sposta il CSV temporaneo nello storage configurato: (storage, path)"""
+    if EXPORT_JOBS_CONFIG['storage'] == 'minio':
+        client, bucket = _minio()
+        object_name = f"{EXPORT_JOBS_CONFIG['minio_prefix']}{job['job_id']}.csv"
+        client.fput_object(bucket, object_name, tmp_path, content_type='text/csv')
+        return 'minio', object_name
+
+    os.makedirs(EXPORT_JOBS_CONFIG['dir'], exist_ok=True)
+    path = os.path.join(EXPORT_JOBS_CONFIG['dir'], f"{job['job_id']}.csv")
+    shutil.move(tmp_path, path)
+    return 'disk', path
+
+def _delete_artifact(job):
+    if not job.get('artifact_path'):
+        return
+    try:
+        if job['storage'] == 'minio':
+            client, bucket = _minio()
+            client.remove_object(bucket, job['artifact_path'])
+        elif os.path.exists(job['artifact_path']):
+            os.remove(job['artifact_path'])
+    except Exception as e:
+        logging.error(f"Errore eliminazione artifact export {job['job_id']}: {e}")
+
+def iter_export_artifact(job, chunk_size=64 * 1024):
+    """Generatore dei byte dell'artifact (MinIO o disco) a chunk costanti"""
+    if job['storage'] == 'minio':
+        from utils.minio_client import iter_minio_object
+        client, bucket = _minio()
+        yield from iter_minio_object(job['artifact_path'], bucket, chunk_size=chunk_size, client=client)
+    else:
+        with open(job['artifact_path'], 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+def cleanup_expired_exports():
+    """Elimina gli artifact scaduti e marca i job come expired"""
+    expired = execute_insert_returning(
+        """
+        UPDATE export_jobs SET status = 'expired'
+        WHERE status = 'done' AND expires_at < now()
+        RETURNING job_id, storage, artifact_path
+        """
+    ) or []
+    for job in expired:
+        _delete_artifact(job)
+    return len(expired)
+
+
+# =================================================================
+# GENERAZIONE CSV
+# =================================================================
+
+def _stream_rows(query, params, on_batch):
+    """Righe dal cursore server-side a blocchi, on_batch(rows) per ogni blocco"""
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Connessione database non disponibile")
+    try:
+        with conn.cursor(name=f"export_{uuid.uuid4().hex}") as cur:
+            cur.itersize = EXPORT_JOBS_CONFIG['fetch_rows']
+            cur.execute(query, params)
+            while True:
+                rows = cur.fetchmany(EXPORT_JOBS_CONFIG['fetch_rows'])
+                if not rows:
+                    break
+                on_batch(rows)
+    finally:
+        conn.close()
+
+def _format_ts(ts):
+    return ts.isoformat() if hasattr(ts, 'isoformat') else str(ts)
+
+def _write_parameter_csv(job, f, progress):
+    info = execute_query(
+        """
+        SELECT p.name, p.code as parameter_code, p.unit,
+               c.name as channel_name, i.name as item_name,
+               a.name as area_name, s.name as scenario_name
+        FROM parameters p
+        JOIN channels c ON p.channel_id = c.channel_id
+        JOIN items i ON c.item_id = i.item_id
+        JOIN areas a ON i.area_id = a.area_id
+        JOIN scenarios s ON a.scenario_id = s.scenario_id
+        WHERE p.parameter_id = %s
+        """,
+        (job['item_id'],), fetch=True
+    )
+    if not info:
+        raise ValueError("Parametro non trovato")
+    info = info[0]
+
+    f.write(f"# Export Parametro: {info['name']} ({info['parameter_code']})\n")
+    f.write(f"# Scenario: {info['scenario_name']}\n")
+    f.write(f"# Area: {info['area_name']}\n")
+    f.write(f"# Item: {info['item_name']}\n")
+    f.write(f"# Channel: {info['channel_name']}\n")
+    f.write(f"# Unit: {info['unit'] or ''}\n")
+    f.write(f"# Periodo: {job['start_date']:%Y-%m-%d %H:%M:%S} - {job['end_date']:%Y-%m-%d %H:%M:%S}\n")
+    f.write(f"# Export Date: {datetime.now():%Y-%m-%d %H:%M:%S}\n\n")
+
+    writer = csv.writer(f)
+    writer.writerow(['Timestamp', 'Value'])
+
+    def on_batch(rows):
+        writer.writerows((_format_ts(ts), value) for ts, value in rows)
+        progress(len(rows))
+
+    _stream_rows(
+        """
+        SELECT timestamp_utc, value
+        FROM readings
+        WHERE parameter_id = %s AND timestamp_utc >= %s AND timestamp_utc <= %s
+        ORDER BY timestamp_utc DESC
+        """,
+        (job['item_id'], job['start_date'], job['end_date']),
+        on_batch
+    )
+    return f"parameter_{job['item_id']}_export_{job['start_date']:%Y%m%d}_{job['end_date']:%Y%m%d}.csv"
+
+def _write_channel_csv(job, f, progress):
+    info = execute_query(
+        """
+        SELECT c.name as channel_name, c.code as channel_code,
+               i.name as item_name, a.name as area_name, s.name as scenario_name
+        FROM channels c
+        JOIN items i ON c.item_id = i.item_id
+        JOIN areas a ON i.area_id = a.area_id
+        JOIN scenarios s ON a.scenario_id = s.scenario_id
+        WHERE c.channel_id = %s
+        """,
+        (job['item_id'],), fetch=True
+    )
+    if not info:
+        raise ValueError("Canale non trovato")
+    info = info[0]
+
+    query, params, parameters = build_channel_pivot_query(
+        job['item_id'], job['start_date'], job['end_date']
+    )
+    if not query:
+        raise ValueError("Nessun parametro numerico trovato")
+
+    f.write(f"# Export Canale: {info['channel_name']} ({info['channel_code']})\n")
+    f.write(f"# Scenario: {info['scenario_name']}\n")
+    f.write(f"# Area: {info['area_name']}\n")
+    f.write(f"# Item: {info['item_name']}\n")
+    f.write(f"# Periodo: {job['start_date']:%Y-%m-%d %H:%M:%S} - {job['end_date']:%Y-%m-%d %H:%M:%S}\n")
+    f.write(f"# Export Date: {datetime.now():%Y-%m-%d %H:%M:%S}\n\n")
+
+    writer = csv.writer(f)
+    writer.writerow(['Timestamp'] + [p['name'] for p in parameters])
+
+    rows = iter_channel_pivot_rows(
+        query, params, parameters, on_batch=progress, fetch_rows=EXPORT_JOBS_CONFIG['fetch_rows']
+    )
+    try:
+        writer.writerows(rows)
+    finally:
+        rows.close()
+    return f"channel_{job['item_id']}_export_{job['start_date']:%Y%m%d}_{job['end_date']:%Y%m%d}.csv"
+
+
+# =================================================================
+# WORKER POOL
+# =================================================================
+
+class ExportJobRunner:
+    """
+    Pool di thread worker del processo: ogni worker fa il claim del job
+    in coda più vecchio il cui utente non ha già troppi job in esecuzione.
+    """
+
+    def __init__(self, workers=2):
+        self.workers = workers
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._last_cleanup = 0.0
+        self._last_recovery = 0.0
+
+    def start(self):
+        """Avvia i worker (una volta per processo, anche dopo fork)"""
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            self._threads = [
+                threading.Thread(target=self._worker_loop, name=f'export-worker-{i}', daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def wake(self):
+        self.start()
+        self._wake.set()
+
+    def _recover_stale(self):
+        """Job 'running' senza heartbeat recente (worker morto): in coda o failed"""
+        recovered = execute_insert_returning(
+            """
+            UPDATE export_jobs
+            SET status = CASE
+                    WHEN cancel_requested THEN 'cancelled'
+                    WHEN attempts >= %s THEN 'failed'
+                    ELSE 'queued'
+                END,
+                error = CASE
+                    WHEN attempts >= %s AND NOT cancel_requested THEN 'Worker interrotto durante l''export'
+                    ELSE error
+                END,
+                finished_at = CASE
+                    WHEN cancel_requested OR attempts >= %s THEN now()
+                    ELSE finished_at
+                END,
+                started_at = NULL, heartbeat_at = NULL, progress_rows = 0
+            WHERE status = 'running'
+              AND COALESCE(heartbeat_at, started_at) < now() - %s * interval '1 second'
+            RETURNING job_id, status
+            """,
+            (EXPORT_JOBS_CONFIG['max_attempts'],) * 3 + (EXPORT_JOBS_CONFIG['stale_after'],)
+        ) or []
+        for job in recovered:
+            logging.warning(f"♻️ EXPORT STALE: job={job['job_id']} -> {job['status']}")
+        return len(recovered)
+
+    def _claim(self):
+        """
+        Job in coda più vecchio il cui utente ha posto. Il conteggio dei
+        job in esecuzione è ripetuto sotto un advisory lock per utente:
+        due worker non possono vedere entrambi "0 in esecuzione" e
+        avviare due job dello stesso utente.
+        """
+        conn = get_db_connection()
+        if not conn:
+            return None
+        try:
+            for _ in range(3):
+                with conn.cursor() as cur:
+                    cur.execute(
+                        """
+                        SELECT j.job_id, j.user_id FROM export_jobs j
+                        WHERE j.status = 'queued'
+                          AND (
+                              SELECT COUNT(*) FROM export_jobs r
+                              WHERE r.status = 'running' AND r.user_id IS NOT DISTINCT FROM j.user_id
+                          ) < %s
+                        ORDER BY j.created_at
+                        FOR UPDATE SKIP LOCKED
+                        LIMIT 1
+                        """,
+                        (EXPORT_JOBS_CONFIG['max_running_per_user'],)
+                    )
+                    candidate = cur.fetchone()
+                    if candidate is None:
+                        conn.rollback()
+                        return None
+                    job_id, user_id = candidate[0], candidate[1]
+
+                    # Il lock si ottiene dopo il commit dell'altro worker: il
+                    # nuovo conteggio (nuovo snapshot) vede il suo job
+                    cur.execute("SELECT pg_advisory_xact_lock(%s, %s)", (_ADVISORY_CLASS, user_id or 0))
+                    cur.execute(
+                        "SELECT COUNT(*) FROM export_jobs WHERE status = 'running' AND user_id IS NOT DISTINCT FROM %s",
+                        (user_id,)
+                    )
+                    if cur.fetchone()[0] >= EXPORT_JOBS_CONFIG['max_running_per_user']:
+                        conn.rollback()
+                        continue
+
+                    cur.execute(
+                        """
+                        UPDATE export_jobs
+                        SET status = 'running', started_at = now(), heartbeat_at = now(),
+                            attempts = attempts + 1
+                        WHERE job_id = %s
+                        RETURNING *
+                        """,
+                        (job_id,)
+                    )
+                    columns = [col[0] for col in cur.description]
+                    job = dict(zip(columns, cur.fetchone()))
+                conn.commit()
+                return job
+            return None
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def _worker_loop(self):
+        while True:
+            try:
+                now = time.monotonic()
+                if now - self._last_cleanup > 600:
+                    self._last_cleanup = now
+                    cleanup_expired_exports()
+                if now - self._last_recovery > EXPORT_JOBS_CONFIG['heartbeat_interval']:
+                    self._last_recovery = now
+                    self._recover_stale()
+
+                job = self._claim()
+                if job is None:
+                    self._wake.wait(EXPORT_JOBS_CONFIG['poll_interval'])
+                    self._wake.clear()
+                    continue
+                self._run(job)
+            except Exception as e:
+                logging.error(f"Errore worker export: {e}")
+                time.sleep(EXPORT_JOBS_CONFIG['poll_interval'])
+
+    def _heartbeat(self, job_id, attempt, done):
+        """
+        Aggiorna heartbeat_at finché il job è in esecuzione in questo worker,
+        solo per il proprio tentativo: si ferma se il job è stato ripreso
+        da un altro worker (nessuna riga aggiornata)
+        """
+        while not done.wait(EXPORT_JOBS_CONFIG['heartbeat_interval']):
+            updated = execute_insert_returning(
+                """
+                UPDATE export_jobs SET heartbeat_at = now()
+                WHERE job_id = %s AND status = 'running' AND attempts = %s
+                RETURNING job_id
+                """,
+                (job_id, attempt)
+            )
+            if updated == []:
+                return
+
+    def _run(self, job):
+        job_id = str(job['job_id'])
+        done = threading.Event()
+        threading.Thread(
+            target=self._heartbeat, args=(job_id, job['attempts'], done),
+            name=f'export-heartbeat-{job_id[:8]}', daemon=True
+        ).start()
+        try:
+            self._execute(job)
+        finally:
+            done.set()
+
+    def _execute(self, job):
+        job_id = str(job['job_id'])
+        # Tutti gli aggiornamenti valgono solo per questo tentativo: se il
+        # job è stato dato per perso e rimesso in coda non lo sovrascrivono
+        attempt = job['attempts']
+        logging.info(f"📦 EXPORT START: job={job_id} {job['kind']}={job['item_id']} user={job['user_id']}")
+
+        if job['kind'] == 'parameter':
+            where_sql, params = "r.parameter_id = %s AND r.timestamp_utc >= %s AND r.timestamp_utc <= %s", \
+                (job['item_id'], job['start_date'], job['end_date'])
+        else:
+            where_sql, params = (
+                "r.parameter_id IN (SELECT parameter_id FROM parameters WHERE channel_id = %s AND data_type = 'numeric')"
+                " AND r.timestamp_utc BETWEEN %s AND %s AND r.value IS NOT NULL"
+            ), (job['item_id'], job['start_date'], job['end_date'])
+        estimated_rows, _ = count_readings(where_sql, params)
+        execute_query(
+            "UPDATE export_jobs SET estimated_rows = %s WHERE job_id = %s AND attempts = %s",
+            (estimated_rows, job_id, attempt)
+        )
+
+        written = {'rows': 0}
+
+        def progress(batch_rows):
+            written['rows'] += batch_rows
+            state = execute_insert_returning(
+                """
+                UPDATE export_jobs SET progress_rows = %s
+                WHERE job_id = %s AND attempts = %s
+                RETURNING cancel_requested
+                """,
+                (written['rows'], job_id, attempt)
+            )
+            if state == []:
+                raise _JobLost()
+            if state and state[0]['cancel_requested']:
+                raise _JobCancelled()
+
+        fd, tmp_path = tempfile.mkstemp(prefix=f'export_{job_id}_', suffix='.csv')
+        try:
+            with os.fdopen(fd, 'w', newline='', encoding='utf-8') as f:
+                f.write('\ufeff')  # BOM per Excel
+                writer = _write_parameter_csv if job['kind'] == 'parameter' else _write_channel_csv
+                filename = writer(job, f, progress)
+
+            size = os.path.getsize(tmp_path)
+            storage, artifact_path = _store_artifact(job, tmp_path)
+            execute_query(
+                """
+                UPDATE export_jobs
+                SET status = 'done', storage = %s, artifact_path = %s, artifact_size = %s,
+                    filename = %s, progress_rows = %s, finished_at = now(),
+                    expires_at = now() + %s * interval '1 hour'
+                WHERE job_id = %s AND attempts = %s
+                """,
+                (storage, artifact_path, size, filename, written['rows'], EXPORT_JOBS_CONFIG['ttl_hours'],
+                 job_id, attempt)
+            )
+            logging.info(f"✅ EXPORT DONE: job={job_id} rows={written['rows']} bytes={size} storage={storage}")
+        except _JobCancelled:
+            execute_query(
+                "UPDATE export_jobs SET status = 'cancelled', finished_at = now() WHERE job_id = %s AND attempts = %s",
+                (job_id, attempt)
+            )
+            logging.info(f"🚫 EXPORT CANCELLED: job={job_id}")
+        except _JobLost:
+            logging.warning(f"♻️ EXPORT LOST: job={job_id} tentativo {attempt} ripreso da un altro worker")
+        except Exception as e:
+            logging.error(f"Errore export job {job_id}: {e}")
+            execute_query(
+                "UPDATE export_jobs SET status = 'failed', error = %s, finished_at = now() WHERE job_id = %s AND attempts = %s",
+                (str(e), job_id, attempt)
+            )
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+_runner = ExportJobRunner(workers=EXPORT_JOBS_CONFIG['workers'])
+
+
+def get_export_runner():
+    return _runner
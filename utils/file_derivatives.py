@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""
+FILE DERIVATIVES - THUMBNAIL E PREVIEW PER /api/files/preview
+Le gallery non scaricano più l'originale per ogni tile:
+- immagini: thumbnail JPEG a larghezze fisse (DERIVATIVES_WIDTHS)
+- PDF: raster della prima pagina (richiede PyMuPDF)
+- CSV/testo: prime righe del file (solo i primi KB, via Range)
+Generati al primo accesso su un pool di worker limitato (una sola
+generazione per derivato anche con richieste concorrenti), salvati su
+disco con LRU a dimensione massima o su MinIO sotto un prefisso dedicato.
+La chiave include l'ETag dell'originale: un file modificato genera
+nuovi derivati e i vecchi escono dall'LRU.
+Tipi non gestiti (video, ...) o librerie mancanti: None -> originale.
+"""
+
+import os
+import io
+import hashlib
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from flask import request, Response
+
+from utils.minio_client import get_minio_client, get_minio_bucket_name, iter_minio_object
+
+DERIVATIVES_CONFIG = {
+    # 'disk' | 'minio'
+    'storage': os.getenv('DERIVATIVES_STORAGE', 'disk').lower(),
+    'dir': os.getenv('DERIVATIVES_DIR', os.path.join(tempfile.gettempdir(), 'mercurio_derivatives')),
+    'max_disk_bytes': int(os.getenv('DERIVATIVES_MAX_MB', 512)) * 1024 * 1024,
+    'minio_prefix': os.getenv('DERIVATIVES_MINIO_PREFIX', 'derivatives/'),
+    'workers': int(os.getenv('DERIVATIVES_WORKERS', 2)),
+    'widths': [int(w) for w in os.getenv('DERIVATIVES_WIDTHS', '160,320,640').split(',')],
+    'default_width': int(os.getenv('DERIVATIVES_DEFAULT_WIDTH', 320)),
+    # Originali più grandi non vengono scaricati per fare la thumbnail
+    'max_source_bytes': int(os.getenv('DERIVATIVES_MAX_SOURCE_MB', 50)) * 1024 * 1024,
+    'csv_head_lines': int(os.getenv('DERIVATIVES_CSV_HEAD_LINES', 20)),
+    'csv_head_bytes': 64 * 1024,
+    'max_age': int(os.getenv('DERIVATIVES_MAX_AGE', 7 * 24 * 3600)),
+    # Attesa massima della richiesta per una generazione in corso
+    'wait_timeout': float(os.getenv('DERIVATIVES_WAIT_TIMEOUT', 20)),
+}
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tif', '.tiff'}
+PDF_EXTENSIONS = {'.pdf'}
+TEXT_EXTENSIONS = {'.csv', '.txt', '.log', '.tsv'}
+
+
+def pillow_available():
+    try:
+        import PIL  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def pymupdf_available():
+    try:
+        import fitz  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def derivative_kind(file_path):
+    """'image' | 'pdf' | 'text' | None (nessun derivato possibile)"""
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext in IMAGE_EXTENSIONS and pillow_available():
+        return 'image'
+    if ext in PDF_EXTENSIONS and pymupdf_available():
+        return 'pdf'
+    if ext in TEXT_EXTENSIONS:
+        return 'text'
+    return None
+
+
+def snap_width(width):
+    """Larghezza fissa più vicina (per eccesso) a quella richiesta"""
+    widths = sorted(DERIVATIVES_CONFIG['widths'])
+    if not width:
+        width = DERIVATIVES_CONFIG['default_width']
+    for candidate in widths:
+        if candidate >= width:
+            return candidate
+    return widths[-1]
+
+
+# =================================================================
+# STORAGE DERIVATI
+# =================================================================
+
+class DiskDerivativeStore:
+    """Cache su disco con LRU per dimensione totale (mtime = ultimo accesso)"""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total = None
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def _scan(self):
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file():
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path, None)
+            return data
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, data):
+        with self._lock:
+            if self._total is None:
+                self._total = sum(size for _, size, _ in self._scan())
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = self._path(f'.{key}.tmp')
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+            self._total += len(data)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Rimuove i meno usati fino al 90% del limite
+        entries = sorted(self._scan())
+        self._total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if self._total <= target:
+                break
+            try:
+                os.remove(path)
+                self._total -= size
+            except OSError:
+                pass
+
+
+class MinioDerivativeStore:
+    """Derivati come oggetti MinIO sotto un prefisso dedicato"""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    def get(self, key):
+        try:
+            return b''.join(iter_minio_object(self.prefix + key))
+        except Exception:
+            return None
+
+    def put(self, key, data):
+        get_minio_client().put_object(get_minio_bucket_name(), self.prefix + key, io.BytesIO(data), len(data))
+
+
+# =================================================================
+# GENERAZIONE
+# =================================================================
+
+def _read_source(file_path, size, limit=None):
+    if limit is None and size > DERIVATIVES_CONFIG['max_source_bytes']:
+        raise ValueError(f"Originale troppo grande per la preview ({size} bytes)")
+    return b''.join(iter_minio_object(file_path, length=limit or 0))
+
+
+def _image_thumbnail(file_path, size, width):
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(_read_source(file_path, size)))
+    # Decodifica JPEG già ridotta (molto più veloce sulle foto grandi)
+    image.draft('RGB', (width, width))
+    image.thumbnail((width, width * 4))
+    if image.mode not in ('RGB', 'L'):
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        rgba = image.convert('RGBA')
+        background.paste(rgba, mask=rgba.split()[-1])
+        image = background
+    out = io.BytesIO()
+    image.save(out, 'JPEG', quality=80, optimize=True)
+    return out.getvalue()
+
+
+def _pdf_first_page(file_path, size, width):
+    import fitz
+
+    with fitz.open(stream=_read_source(file_path, size), filetype='pdf') as document:
+        page = document[0]
+        zoom = width / page.rect.width
+        pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        return pixmap.tobytes('jpeg')
+
+
+def _text_head(file_path, size):
+    length = min(size, DERIVATIVES_CONFIG['csv_head_bytes'])
+    data = _read_source(file_path, size, limit=length) if length else b''
+    lines = data.decode('utf-8', errors='replace').splitlines()
+    if len(data) == DERIVATIVES_CONFIG['csv_head_bytes'] and lines:
+        lines = lines[:-1]  # ultima riga probabilmente troncata
+    head = '\n'.join(lines[:DERIVATIVES_CONFIG['csv_head_lines']]) + '\n'
+    return head.encode('utf-8')
+
+
+class DerivativeService:
+    """Pool di generazione + deduplica delle generazioni concorrenti"""
+
+    def __init__(self, config):
+        self.config = config
+        if config['storage'] == 'minio':
+            self.store = MinioDerivativeStore(config['minio_prefix'])
+        else:
+            self.store = DiskDerivativeStore(config['dir'], config['max_disk_bytes'])
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._executor = None
+        self._pid = None
+        self._stats = {'hits': 0, 'misses': 0, 'generated': 0, 'errors': 0}
+
+    def _get_executor(self):
+        pid = os.getpid()
+        if self._pid != pid:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.config['workers'], thread_name_prefix='derivatives'
+            )
+            self._pending = {}
+            self._pid = pid
+        return self._executor
+
+    @staticmethod
+    def make_key(file_path, etag, kind, width):
+        digest = hashlib.sha1(f"{file_path}|{etag}|{kind}|{width}".encode('utf-8')).hexdigest()
+        return f"{digest}.{'txt' if kind == 'text' else 'jpg'}"
+
+    def _generate(self, key, file_path, size, kind, width):
+        try:
+            if kind == 'image':
+                data = _image_thumbnail(file_path, size, width)
+            elif kind == 'pdf':
+                data = _pdf_first_page(file_path, size, width)
+            else:
+                data = _text_head(file_path, size)
+            self.store.put(key, data)
+            self._stats['generated'] += 1
+            return data
+        except Exception:
+            self._stats['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def get(self, file_path, size, etag, kind, width):
+        """Bytes del derivato (dalla cache o generato ora)"""
+        key = self.make_key(file_path, etag, kind, width)
+        data = self.store.get(key)
+        if data is not None:
+            self._stats['hits'] += 1
+            return data
+
+        self._stats['misses'] += 1
+        with self._lock:
+            executor = self._get_executor()
+            future = self._pending.get(key)
+            if future is None:
+                future = executor.submit(self._generate, key, file_path, size, kind, width)
+                self._pending[key] = future
+        return future.result(timeout=self.config['wait_timeout'])
+
+    def get_stats(self):
+        stats = dict(self._stats)
+        stats.update({'storage': self.config['storage'], 'pending': len(self._pending)})
+        return stats
+
+
+_service = DerivativeService(DERIVATIVES_CONFIG)
+
+
+def get_derivatives_stats():
+    return _service.get_stats()
+
+
+def derivative_response(file_path, width=None):
+    """
+    Risposta Flask con il derivato di file_path, oppure None se per questo
+    file non esiste un derivato (il chiamante serve l'originale).
+    """
+    kind = derivative_kind(file_path)
+    if kind is None:
+        return None
+
+    try:
+        stat = get_minio_client().stat_object(get_minio_bucket_name(), file_path)
+    except Exception as e:
+        logging.error(f"Preview: file non trovato {file_path} - {e}")
+        return None
+
+    width = None if kind == 'text' else snap_width(width)
+    etag = f'"{stat.etag.strip(chr(34))}-{kind}-{width or 0}"'
+    headers = {
+        'ETag': etag,
+        'Cache-Control': f"private, max-age={DERIVATIVES_CONFIG['max_age']}",
+        'Content-Disposition': 'inline',
+    }
+    if request.if_none_match.contains(etag.strip('"')):
+        return Response(status=304, headers=headers)
+
+    try:
+        data = _service.get(file_path, stat.size, stat.etag, kind, width)
+    except FutureTimeoutError:
+        logging.warning(f"Preview {file_path}: generazione oltre {DERIVATIVES_CONFIG['wait_timeout']}s, servo l'originale")
+        return None
+    except Exception as e:
+        logging.error(f"Errore generazione preview {file_path}: {e}")
+        return None
+
+    mimetype = 'text/plain; charset=utf-8' if kind == 'text' else 'image/jpeg'
+    return Response(data, mimetype=mimetype, headers=headers)
@@ -0,0 +1,560 @@
+# -*- coding: utf-8 -*-
+"""
+JSON STREAM - NAVIGAZIONE INCREMENTALE DI JSON SU MINIO
+I file JSON non vengono più scaricati, parsati e riserializzati interi:
+- ogni nodo è indirizzato da un JSON pointer (RFC 6901, es. /dati/3/valori)
+- array e oggetti si leggono a pagine (?offset=&limit= sui figli)
+- i figli piccoli sono restituiti inline, quelli grandi come stub
+  {'$ref': pointer, 'type', 'size', 'length'} da espandere su richiesta
+- un parser incrementale sullo stream MinIO salta i valori non richiesti
+  senza costruirli e si ferma appena la pagina è completa
+- indice per (file_path, ETag) con posizione in byte dei nodi visti e
+  checkpoint ogni JSON_INDEX_STEP elementi: una pagina o un nodo già
+  localizzati ripartono con una GET a range dal punto giusto
+"""
+
+import re
+import json
+import threading
+from collections import OrderedDict
+
+from utils.minio_client import get_minio_client, get_minio_bucket_name, iter_minio_object
+
+JSON_INDEX_STEP = 1000
+JSON_INDEX_MAX_ENTRIES = 64
+JSON_INDEX_MAX_NODES = 50000
+JSON_CHUNK_SIZE = 256 * 1024
+JSON_DEFAULT_LIMIT = 100
+JSON_MAX_LIMIT = 5000
+# Figli più grandi diventano stub da espandere
+JSON_INLINE_BYTES = 16 * 1024
+# Valore massimo restituito per un nodo scalare richiesto direttamente
+JSON_MAX_SCALAR_BYTES = 1024 * 1024
+
+_NON_WS = re.compile(rb'[^ \t\r\n]')
+_STRING_SPECIAL = re.compile(rb'["\\]')
+_SCALAR_END = re.compile(rb'[,\]}: \t\r\n]')
+_STRUCTURAL = re.compile(rb'["\[\]{}]')
+
+_KINDS = {b'{': 'object', b'[': 'array', b'"': 'string', b't': 'boolean', b'f': 'boolean', b'n': 'null'}
+_BOM = b'\xef\xbb\xbf'
+
+
+class JsonNode:
+    """Nodo localizzato: byte di inizio/fine e checkpoint dei figli"""
+
+    def __init__(self, kind, start, end=None, length=None, step=JSON_INDEX_STEP):
+        self.kind = kind
+        self.start = start
+        self.end = end
+        self.length = length
+        self.step = step
+        # checkpoints[k] = inizio del figlio k * step (dopo '[' / '{' o dopo la virgola)
+        self.checkpoints = [start + 1]
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        return self.end - self.start if self.end is not None else None
+
+    def nearest(self, child):
+        """(indice, byte) del checkpoint noto più vicino prima di child"""
+        k = min(child // self.step, len(self.checkpoints) - 1)
+        return k * self.step, self.checkpoints[k]
+
+    def record(self, child, byte_offset):
+        if child % self.step == 0:
+            with self._lock:
+                if child // self.step == len(self.checkpoints):
+                    self.checkpoints.append(byte_offset)
+
+
+class JsonIndex:
+    """Nodi noti di un file (per pointer)"""
+
+    def __init__(self, size):
+        self.size = size
+        self.nodes = {}
+        self._lock = threading.Lock()
+
+    def get(self, pointer):
+        return self.nodes.get(pointer)
+
+    def add(self, pointer, kind, start, end=None, length=None):
+        node = self.nodes.get(pointer)
+        if node is not None:
+            if end is not None:
+                node.end = end
+            if length is not None:
+                node.length = length
+            return node
+        node = JsonNode(kind, start, end, length)
+        with self._lock:
+            if len(self.nodes) < JSON_INDEX_MAX_NODES:
+                self.nodes[pointer] = node
+        return node
+
+
+class JsonIndexCache:
+    """LRU degli indici per (file_path, etag): un file modificato ha un nuovo ETag"""
+
+    def __init__(self, max_entries=JSON_INDEX_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            index = self._entries.get(key)
+            if index is not None:
+                self._entries.move_to_end(key)
+            return index
+
+    def put(self, key, index):
+        with self._lock:
+            self._entries[key] = index
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_index_cache = JsonIndexCache()
+
+
+# =================================================================
+# PARSER INCREMENTALE
+# =================================================================
+
+class _JsonReader:
+    """
+    Lettore sequenziale sullo stream MinIO da un offset. Salta i valori
+    cercando solo i caratteri strutturali; cattura i byte di un valore
+    solo se richiesto e solo fino a un limite.
+    """
+
+    def __init__(self, file_path, start):
+        self._chunks = iter_minio_object(file_path, chunk_size=JSON_CHUNK_SIZE, offset=start)
+        self._buf = b''
+        self._base = start
+        self._pos = 0
+        self._eof = False
+        self._capture_from = None
+        self._capture_limit = None
+        self._capture_overflow = False
+
+    def tell(self):
+        return self._base + self._pos
+
+    def close(self):
+        self._chunks.close()
+
+    def _fill(self):
+        """Aggiunge un chunk al buffer scartando i byte già letti; False a fine stream"""
+        if self._eof:
+            return False
+        keep_from = self._pos
+        if self._capture_from is not None:
+            keep_from = min(keep_from, self._capture_from - self._base)
+        if keep_from:
+            self._buf = self._buf[keep_from:]
+            self._base += keep_from
+            self._pos -= keep_from
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._eof = True
+            return False
+        self._buf += chunk
+        if self._capture_from is not None and self._base + len(self._buf) - self._capture_from > self._capture_limit:
+            # Valore troppo grande per essere restituito: si continua solo a saltarlo
+            self._capture_from = None
+            self._capture_overflow = True
+        return True
+
+    def _error(self, message):
+        return ValueError(f"JSON non valido all'offset {self.tell()}: {message}")
+
+    def skip_bom(self):
+        while len(self._buf) - self._pos < len(_BOM) and self._fill():
+            pass
+        if self._buf.startswith(_BOM, self._pos):
+            self._pos += len(_BOM)
+
+    def peek(self):
+        """Prossimo byte non di spaziatura (senza consumarlo), None a fine stream"""
+        while True:
+            match = _NON_WS.search(self._buf, self._pos)
+            if match:
+                self._pos = match.start()
+                return self._buf[self._pos:self._pos + 1]
+            self._pos = len(self._buf)
+            if not self._fill():
+                return None
+
+    def expect(self, allowed):
+        c = self.peek()
+        if c is None or c not in allowed:
+            raise self._error(f"atteso uno tra {allowed.decode()}, trovato {c!r}")
+        self._pos += 1
+        return c
+
+    def start_capture(self, limit):
+        self._capture_from = self.tell()
+        self._capture_limit = limit
+        self._capture_overflow = False
+
+    def stop_capture(self):
+        """Byte catturati, None se il valore superava il limite"""
+        start, self._capture_from = self._capture_from, None
+        if self._capture_overflow or start is None or self.tell() - start > self._capture_limit:
+            return None
+        return self._buf[start - self._base:self._pos]
+
+    def _skip_string(self):
+        self._pos += 1
+        while True:
+            match = _STRING_SPECIAL.search(self._buf, self._pos)
+            if match is None:
+                self._pos = len(self._buf)
+                if not self._fill():
+                    raise self._error('stringa non terminata')
+                continue
+            if match.group() == b'"':
+                self._pos = match.end()
+                return
+            # Escape: serve anche il carattere successivo
+            if match.end() >= len(self._buf):
+                self._pos = match.start()
+                if not self._fill():
+                    raise self._error('stringa non terminata')
+                continue
+            self._pos = match.end() + 1
+
+    def _skip_scalar(self):
+        while True:
+            match = _SCALAR_END.search(self._buf, self._pos)
+            if match:
+                self._pos = match.start()
+                return
+            self._pos = len(self._buf)
+            if not self._fill():
+                return
+
+    def read_string(self):
+        if self.peek() != b'"':
+            raise self._error('attesa una stringa')
+        self.start_capture(JSON_MAX_SCALAR_BYTES)
+        self._skip_string()
+        raw = self.stop_capture()
+        if raw is None:
+            raise self._error('chiave troppo lunga')
+        return json.loads(raw)
+
+    def skip_value(self):
+        """
+        Salta il valore corrente senza costruirlo: (tipo, numero di figli).
+        I figli di primo livello si contano dalle virgole fuori dalle stringhe.
+        """
+        c = self.peek()
+        if c is None:
+            raise self._error('valore mancante')
+        kind = _KINDS.get(c, 'number')
+        if c == b'"':
+            self._skip_string()
+            return kind, None
+        if kind not in ('object', 'array'):
+            self._skip_scalar()
+            return kind, None
+
+        self._pos += 1
+        if self.peek() in (b']', b'}'):
+            self._pos += 1
+            return kind, 0
+
+        depth, count = 1, 1
+        while True:
+            match = _STRUCTURAL.search(self._buf, self._pos)
+            if depth == 1:
+                end = match.start() if match else len(self._buf)
+                count += self._buf.count(b',', self._pos, end)
+            if match is None:
+                self._pos = len(self._buf)
+                if not self._fill():
+                    raise self._error(f'{kind} non terminato')
+                continue
+            self._pos = match.start()
+            c = match.group()
+            if c == b'"':
+                self._skip_string()
+                continue
+            self._pos += 1
+            if c in (b'[', b'{'):
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return kind, count
+
+
+# =================================================================
+# JSON POINTER
+# =================================================================
+
+def split_pointer(pointer):
+    """'/a~1b/0' -> ['a/b', '0'] (RFC 6901)"""
+    if not pointer:
+        return []
+    if not pointer.startswith('/'):
+        raise ValueError(f"JSON pointer non valido: {pointer}")
+    return [token.replace('~1', '/').replace('~0', '~') for token in pointer[1:].split('/')]
+
+
+def child_pointer(pointer, token):
+    return f"{pointer}/{str(token).replace('~', '~0').replace('/', '~1')}"
+
+
+# =================================================================
+# NAVIGAZIONE
+# =================================================================
+
+def _stat(file_path):
+    return get_minio_client().stat_object(get_minio_bucket_name(), file_path)
+
+
+def _get_index(file_path, etag, size):
+    """Indice dal cache o nuovo (legge solo i primi byte per il nodo radice)"""
+    key = (file_path, etag)
+    index = _index_cache.get(key)
+    if index is not None:
+        return index
+
+    index = JsonIndex(size)
+    reader = _JsonReader(file_path, 0)
+    try:
+        reader.skip_bom()
+        c = reader.peek()
+        if c is None:
+            raise ValueError("File JSON vuoto")
+        index.add('', _KINDS.get(c, 'number'), reader.tell())
+    finally:
+        reader.close()
+    _index_cache.put(key, index)
+    return index
+
+
+def _iter_children(file_path, index, node, pointer, from_child=0, capture=0):
+    """
+    (i, chiave, pointer, nodo, raw) dei figli di node dal figlio from_child. raw sono i byte del valore se <= capture, altrimenti None.
+    Aggiorna checkpoint, lunghezza e nodi figli nell'indice.
+    """
+    i, start_byte = node.nearest(from_child)
+    reader = _JsonReader(file_path, start_byte)
+    closer = b']' if node.kind == 'array' else b'}'
+    try:
+        while True:
+            c = reader.peek()
+            if c is None:
+                raise reader._error(f'{node.kind} non terminato')
+            if c == closer:
+                node.length, node.end = i, reader.tell() + 1
+                return
+            node.record(i, reader.tell())
+
+            key = None
+            if node.kind == 'object':
+                key = reader.read_string()
+                reader.expect(b':')
+            reader.peek()
+            start = reader.tell()
+            wanted = i >= from_child
+            if wanted and capture:
+                reader.start_capture(capture)
+            kind, length = reader.skip_value()
+            raw = reader.stop_capture() if wanted and capture else None
+            end = reader.tell()
+
+            if wanted:
+                path = child_pointer(pointer, key if key is not None else i)
+                child = index.add(path, kind, start, end, length)
+                yield i, key, path, child, raw
+
+            i += 1
+            if reader.expect(b',' + closer) == closer:
+                node.length, node.end = i, reader.tell()
+                return
+    finally:
+        reader.close()
+
+
+def _locate(file_path, index, pointer):
+    """Nodo per pointer, partendo dal più lungo prefisso già indicizzato"""
+    node = index.get(pointer)
+    if node is not None:
+        return node
+
+    tokens = split_pointer(pointer)
+    depth = len(tokens) - 1
+    while depth > 0 and index.get(_join(tokens[:depth])) is None:
+        depth -= 1
+    current = _join(tokens[:depth])
+    node = index.get(current)
+
+    for token in tokens[depth:]:
+        if node.kind == 'array':
+            try:
+                position = int(token)
+            except ValueError:
+                raise KeyError(f"Indice array non valido: {token}")
+            if position < 0:
+                raise KeyError(f"Indice array non valido: {token}")
+            from_child = position
+        elif node.kind == 'object':
+            from_child = 0
+        else:
+            raise KeyError(f"{current or '/'} non è un contenitore")
+
+        found = None
+        children = _iter_children(file_path, index, node, current, from_child)
+        try:
+            for i, key, path, child, _ in children:
+                if (key == token) if node.kind == 'object' else (i == from_child):
+                    found = path, child
+                    break
+        finally:
+            children.close()
+        if found is None:
+            raise KeyError(f"Percorso JSON non trovato: {child_pointer(current, token)}")
+        current, node = found
+    return node
+
+
+def _join(tokens):
+    pointer = ''
+    for token in tokens:
+        pointer = child_pointer(pointer, token)
+    return pointer
+
+
+def _entry(path, child, raw):
+    """Valore inline se catturato, altrimenti stub da espandere"""
+    if raw is not None:
+        return json.loads(raw)
+    return {'$ref': path, 'type': child.kind, 'size': child.size, 'length': child.length}
+
+
+def _read_scalar(file_path, node):
+    reader = _JsonReader(file_path, node.start)
+    try:
+        reader.start_capture(JSON_MAX_SCALAR_BYTES)
+        reader.skip_value()
+        raw = reader.stop_capture()
+        node.end = reader.tell()
+    finally:
+        reader.close()
+    if raw is None:
+        raise ValueError(f"Valore oltre {JSON_MAX_SCALAR_BYTES} bytes")
+    return json.loads(raw)
+
+
+def _node_length(file_path, node):
+    """Numero di figli: se ignoto, un passaggio sul nodo contando le virgole"""
+    if node.length is None and node.kind in ('object', 'array'):
+        reader = _JsonReader(file_path, node.start)
+        try:
+            _, node.length = reader.skip_value()
+            node.end = reader.tell()
+        finally:
+            reader.close()
+    return node.length
+
+
+# =================================================================
+# API
+# =================================================================
+
+def read_json_node(file_path, pointer='', offset=0, limit=JSON_DEFAULT_LIMIT, inline_bytes=JSON_INLINE_BYTES):
+    """
+    Pagina dei figli [offset, offset+limit) del nodo a pointer.
+    data: lista (array), dict (oggetto) o il valore (scalare).
+    """
+    stat = _stat(file_path)
+    index = _get_index(file_path, stat.etag, stat.size)
+    node = _locate(file_path, index, pointer)
+
+    result = {
+        'pointer': pointer,
+        'type': node.kind,
+        'file_size': stat.size,
+    }
+    if node.kind not in ('object', 'array'):
+        result['data'] = _read_scalar(file_path, node)
+        result['size'] = node.size
+        return result
+
+    entries, has_more = [], False
+    children = _iter_children(file_path, index, node, pointer, offset, capture=inline_bytes)
+    try:
+        for i, key, path, child, raw in children:
+            if i >= offset + limit:
+                has_more = True
+                break
+            entries.append((key, _entry(path, child, raw)))
+    finally:
+        children.close()
+
+    if node.kind == 'array':
+        data = [value for _, value in entries]
+    else:
+        data = {key: value for key, value in entries}
+
+    result.update({
+        'data': data,
+        'offset': offset,
+        'limit': limit,
+        'returned': len(entries),
+        'has_more': has_more,
+        'length': node.length,
+        'size': node.size if node.size is not None else (stat.size if pointer == '' else None),
+    })
+    return result
+
+
+def json_summary(file_path, pointer='', limit=JSON_DEFAULT_LIMIT):
+    """
+    Forma del nodo a pointer: tipo, dimensione in byte, numero di figli e
+    descrittori (chiave, tipo, size, length) dei primi limit figli, senza valori.
+    Il conteggio dei figli costa un passaggio sul nodo (una volta per ETag).
+    """
+    stat = _stat(file_path)
+    index = _get_index(file_path, stat.etag, stat.size)
+    node = _locate(file_path, index, pointer)
+
+    summary = {
+        'pointer': pointer,
+        'type': node.kind,
+        'file_size': stat.size,
+    }
+    if node.kind not in ('object', 'array'):
+        _read_scalar(file_path, node)
+        summary['size'] = node.size
+        return summary
+
+    children = []
+    items = _iter_children(file_path, index, node, pointer)
+    try:
+        for i, key, path, child, _ in items:
+            if i >= limit:
+                break
+            descriptor = {'pointer': path, 'type': child.kind, 'size': child.size, 'length': child.length}
+            if key is not None:
+                descriptor['key'] = key
+            children.append(descriptor)
+    finally:
+        items.close()
+
+    summary.update({
+        'length': _node_length(file_path, node),
+        'size': node.size,
+        'children': children,
+        'has_more': node.length > len(children),
+    })
+    return summary
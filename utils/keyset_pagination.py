@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+KEYSET PAGINATION - PAGINAZIONE A CURSORE SU READINGS
+Pagine ordinate per (timestamp_utc DESC, reading_id DESC): ogni pagina
+riparte dall'ultima chiave vista invece di saltare OFFSET righe, quindi
+il costo non cresce con la profondità. I cursori next/prev sono opachi
+(base64 url-safe) per il client.
+Il vecchio parametro page resta supportato (OFFSET) per compatibilità.
+"""
+
+import json
+import base64
+import binascii
+from datetime import datetime
+
+from utils.db import execute_query
+
+
+# =================================================================
+# CURSORI
+# =================================================================
+
+def encode_cursor(row, direction):
+    """Cursore opaco dalla chiave (timestamp_utc, reading_id) di una riga"""
+    ts = row['timestamp_utc']
+    payload = {
+        't': ts.isoformat() if hasattr(ts, 'isoformat') else str(ts),
+        'id': row['reading_id'],
+        'd': direction
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """(timestamp, reading_id, direction) dal cursore; ValueError se non valido"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        direction = payload['d']
+        if direction not in ('next', 'prev'):
+            raise ValueError(direction)
+        return datetime.fromisoformat(payload['t']), int(payload['id']), direction
+    except (binascii.Error, ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Cursore non valido: {e}")
+
+
+# =================================================================
+# PAGINA
+# =================================================================
+
+def fetch_readings_page(columns, where_sql, params, per_page, cursor=None, page=1):
+    """
+    Una pagina di readings (alias r) filtrata da where_sql/params.
+    columns: colonne aggiuntive oltre a r.reading_id e r.timestamp_utc.
+    Con cursor usa la keyset pagination, altrimenti OFFSET da page.
+    Restituisce (rows, info) con rows in ordine timestamp decrescente e
+    info = {'next_cursor', 'prev_cursor', 'has_next', 'has_prev', 'mode'}.
+    """
+    direction = 'next'
+    query_params = list(params)
+    keyset_sql = ''
+    offset_sql = ''
+
+    if cursor:
+        cursor_ts, cursor_id, direction = decode_cursor(cursor)
+        keyset_sql = f"AND (r.timestamp_utc, r.reading_id) {'>' if direction == 'prev' else '<'} (%s, %s)"
+        query_params += [cursor_ts, cursor_id]
+    elif page > 1:
+        offset_sql = "OFFSET %s"
+
+    order = 'ASC' if direction == 'prev' else 'DESC'
+    query = f"""
+        SELECT r.reading_id, r.timestamp_utc, {columns}
+        FROM readings r
+        WHERE {where_sql}
+          {keyset_sql}
+        ORDER BY r.timestamp_utc {order}, r.reading_id {order}
+        LIMIT %s {offset_sql}
+    """
+    # Una riga in più per sapere se esiste la pagina successiva
+    query_params.append(per_page + 1)
+    if offset_sql:
+        query_params.append((page - 1) * per_page)
+
+    rows = execute_query(query, query_params, fetch=True) or []
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if direction == 'prev':
+        rows.reverse()
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = bool(cursor) or page > 1, has_more
+
+    info = {
+        'next_cursor': encode_cursor(rows[-1], 'next') if rows and has_next else None,
+        'prev_cursor': encode_cursor(rows[0], 'prev') if rows and has_prev else None,
+        'has_next': has_next,
+        'has_prev': has_prev,
+        'mode': 'cursor' if cursor else 'offset'
+    }
+    return rows, info
+
+
+# =================================================================
+# TOTALI
+# =================================================================
+
+def count_readings(where_sql, params, exact=False):
+    """
+    Numero di readings (alias r) che soddisfano where_sql.
+    Di default stima del planner (EXPLAIN, nessuna scansione);
+    exact=True esegue COUNT(*). Restituisce (totale, is_estimate).
+    """
+    if exact:
+        result = execute_query(
+            f"SELECT COUNT(*) as total FROM readings r WHERE {where_sql}", params, fetch=True
+        )
+        return (result[0]['total'] if result else 0), False
+
+    result = execute_query(
+        f"EXPLAIN (FORMAT JSON) SELECT 1 FROM readings r WHERE {where_sql}", params, fetch=True
+    )
+    if not result:
+        return 0, True
+    plan = list(result[0].values())[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows']), True
+
+
+def paginate_readings(columns, where_sql, params, per_page, cursor=None, page=1, exact_count=False):
+    """
+    Pagina + blocco 'pagination' per le risposte API (compatibile con il
+    vecchio formato page/pages/total, più next_cursor/prev_cursor).
+    In modalità cursore page è None: la posizione non è nota.
+    """
+    rows, info = fetch_readings_page(columns, where_sql, params, per_page, cursor=cursor, page=page)
+    seen = (page - 1) * per_page + len(rows)
+
+    if info['mode'] == 'offset' and not info['has_next'] and (rows or page == 1):
+        # In modalità offset l'ultima pagina dà il totale esatto senza altre query
+        total, is_estimate = seen, False
+    else:
+        total, is_estimate = count_readings(where_sql, params, exact=exact_count)
+        if is_estimate and info['mode'] == 'offset' and rows:
+            # La stima non può essere inferiore alle righe già viste (qui
+            # esiste una pagina successiva); oltre la fine non si inventano righe
+            total = max(total, seen + 1)
+
+    pagination = {
+        'page': page if info['mode'] == 'offset' else None,
+        'per_page': per_page,
+        'total': total,
+        'total_is_estimate': is_estimate,
+        'pages': (total + per_page - 1) // per_page if total > 0 else 1,
+        'has_prev': info['has_prev'],
+        'has_next': info['has_next'],
+        'next_cursor': info['next_cursor'],
+        'prev_cursor': info['prev_cursor']
+    }
+    return rows, pagination
@@ -1,19 +1,126 @@
 import os
+import socket
+import threading
+import urllib3
+from urllib3.connection import HTTPConnection
 from minio import Minio
 from dotenv import load_dotenv
 
 # Carica le variabili dal file .env
 load_dotenv()
 
+# Pool HTTP verso MinIO (tutte sovrascrivibili da .env)
+MINIO_POOL_CONFIG = {
+    # Connessioni keep-alive tenute nel pool per host; il prefetch ZIP ne
+    # usa al più un quarto per export (vedi utils/minio_prefetch.py)
+    'maxsize': int(os.getenv('MINIO_POOL_MAXSIZE', 32)),
+    'connect_timeout': float(os.getenv('MINIO_CONNECT_TIMEOUT', 5)),
+    'read_timeout': float(os.getenv('MINIO_READ_TIMEOUT', 120)),
+    'retries': int(os.getenv('MINIO_RETRIES', 3)),
+    'backoff_factor': float(os.getenv('MINIO_RETRY_BACKOFF', 0.2)),
+}
+
+
+# ================================================
+# CLIENT CONDIVISO
+# ================================================
+
+class MinioClientManager:
+    """
+    Un solo client Minio (e un solo PoolManager urllib3) per processo:
+    le connessioni HTTP keep-alive vengono riusate tra richieste e thread.
+    Dopo un fork (gunicorn preload) il processo figlio crea il proprio pool.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self._lock = threading.Lock()
+        self._client = None
+        self._http = None
+        self._pid = None
+
+    def _create_http(self):
+        return urllib3.PoolManager(
+            maxsize=self.config['maxsize'],
+            # Limite morbido: oltre maxsize si apre una connessione in più che
+            # viene chiusa dopo l'uso. Con block=True (e senza pool_timeout,
+            # che il client Minio non passa) export concorrenti aspetterebbero
+            # una connessione libera senza scadenza
+            block=False,
+            timeout=urllib3.Timeout(
+                connect=self.config['connect_timeout'],
+                read=self.config['read_timeout']
+            ),
+            retries=urllib3.Retry(
+                total=self.config['retries'],
+                backoff_factor=self.config['backoff_factor'],
+                status_forcelist=[500, 502, 503, 504]
+            ),
+            # TCP keep-alive: le connessioni inattive nel pool non vengono chiuse dai firewall
+            socket_options=HTTPConnection.default_socket_options + [
+                (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            ]
+        )
+
+    def get_client(self):
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    # Il pool del processo padre non va chiuso: i socket sono suoi
+                    self._http = self._create_http()
+                    self._client = Minio(
+                        endpoint=os.getenv('MINIO_ENDPOINT', 'localhost:9000'),
+                        access_key=os.getenv('MINIO_ACCESS_KEY'),
+                        # La chiave segreta nel .env 
+                        secret_key=os.getenv('MINIO_SECRET_KEY'),
+                        secure=False,
+                        # Con la region nota il client salta la richiesta GetBucketLocation
+                        region=os.getenv('MINIO_REGION') or None,
+                        http_client=self._http
+                    )
+                    self._pid = pid
+        return self._client
+
+    def get_stats(self):
+        """Riuso connessioni: richieste totali vs connessioni aperte"""
+        stats = {
+            'pid': self._pid,
+            'maxsize': self.config['maxsize'],
+            'pools': 0,
+            'requests': 0,
+            'connections_created': 0,
+            'idle_connections': 0,
+        }
+        if self._http is None or self._pid != os.getpid():
+            return stats
+
+        pools = self._http.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            stats['pools'] += 1
+            stats['requests'] += pool.num_requests
+            stats['connections_created'] += pool.num_connections
+            # La coda del pool contiene None per gli slot mai usati
+            stats['idle_connections'] += sum(1 for conn in list(pool.pool.queue) if conn is not None) if pool.pool else 0
+        stats['connections_reused'] = max(0, stats['requests'] - stats['connections_created'])
+        stats['reuse_ratio'] = (
+            round(stats['connections_reused'] / stats['requests'], 3) if stats['requests'] else 0.0
+        )
+        return stats
+
+
+_manager = MinioClientManager(MINIO_POOL_CONFIG)
+
 def get_minio_client():
-    """Configura il client MinIO usando le variabili d'ambiente"""
-    return Minio(
-        endpoint=os.getenv('MINIO_ENDPOINT', 'localhost:9000'),
-        access_key=os.getenv('MINIO_ACCESS_KEY'),
-        # La chiave segreta nel .env 
-        secret_key=os.getenv('MINIO_SECRET_KEY'),
-        secure=False
-    )
+    """Client MinIO condiviso del processo (configurato dalle variabili d'ambiente)"""
+    return _manager.get_client()
+
+def get_minio_stats():
+    """Metriche del pool HTTP MinIO del processo corrente"""
+    return _manager.get_stats()
 
 def get_minio_bucket_name():
     """
@@ -33,4 +140,22 @@ def get_file_from_minio(file_path, bucket_name=None):
         return response.read()
     except Exception as e:
         print(f"Errore durante il recupero del file {file_path}: {e}")
-        return None
\ No newline at end of file
+        return None
+
+def iter_minio_object(file_path, bucket_name=None, chunk_size=64 * 1024, client=None, offset=0, length=0):
+    """
+    Generatore dei byte di un oggetto MinIO a chunk, connessione rilasciata alla fine.
+    offset/length per leggere solo una parte (length=0: fino alla fine)
+    """
+    if bucket_name is None:
+        bucket_name = get_minio_bucket_name()
+    if client is None:
+        client = get_minio_client()
+
+    response = client.get_object(bucket_name, file_path, offset=offset, length=length)
+    try:
+        for chunk in response.stream(chunk_size):
+            yield chunk
+    finally:
+        response.close()
+        response.release_conn()
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+MINIO LISTING - LISTING CARTELLE A PAGINE CON CACHE
+Una cartella si lista con delimiter '/' (non ricorsivo): MinIO restituisce
+file e sottocartelle di un solo livello invece dell'intero sottoalbero.
+- paginazione con token di continuazione opaco (start_after codificato)
+- cache in memoria con TTL per (bucket, prefix), con tutte le pagine lette
+- aggregati opzionali per cartella (numero file, dimensione totale,
+  istogramma tipi) calcolati in background con un listing ricorsivo e
+  serviti anche scaduti mentre vengono ricalcolati. Il listing ricorsivo
+  percorre tutto il sottoalbero: gli aggregati sono disattivati di default
+  (MINIO_LISTING_AGGREGATES=true per abilitarli) e calcolati solo su
+  richiesta esplicita del client
+"""
+
+import os
+import time
+import base64
+import logging
+import threading
+from collections import OrderedDict, Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.minio_client import get_minio_client, get_minio_bucket_name
+
+MINIO_LISTING_CONFIG = {
+    'ttl': float(os.getenv('MINIO_LISTING_TTL', 60)),
+    'max_entries': int(os.getenv('MINIO_LISTING_MAX_ENTRIES', 1024)),
+    'page_size': int(os.getenv('MINIO_LISTING_PAGE_SIZE', 500)),
+    'max_page_size': int(os.getenv('MINIO_LISTING_MAX_PAGE_SIZE', 5000)),
+    'aggregates': os.getenv('MINIO_LISTING_AGGREGATES', 'false').lower() in ('1', 'true', 'yes'),
+    'aggregates_ttl': float(os.getenv('MINIO_LISTING_AGGREGATES_TTL', 900)),
+    'aggregates_workers': int(os.getenv('MINIO_LISTING_AGGREGATES_WORKERS', 2)),
+    'aggregates_max_pending': int(os.getenv('MINIO_LISTING_AGGREGATES_MAX_PENDING', 64)),
+}
+
+# Dopo ogni chiave che inizia con "prefix/": il token di una sottocartella
+# riparte dopo tutto il suo contenuto
+_AFTER_PREFIX = '\U0010ffff'
+
+
+def _encode_token(start_after):
+    return base64.urlsafe_b64encode(start_after.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _decode_token(token):
+    if not token:
+        return None
+    try:
+        return base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode('utf-8')
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Token di continuazione non valido")
+
+
+class _TTLCache:
+    """LRU con scadenza per voce"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, allow_expired=False):
+        """(valore, scaduto) oppure (None, True)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, True
+            expires, value = entry
+            expired = time.monotonic() >= expires
+            if expired and not allow_expired:
+                del self._entries[key]
+                return None, True
+            self._entries.move_to_end(key)
+            return value, expired
+
+    def put(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FolderListing:
+    """Pagine di listing e aggregati per cartella"""
+
+    def __init__(self, config):
+        self.config = config
+        self._pages = _TTLCache(config['max_entries'])
+        self._aggregates = _TTLCache(config['max_entries'])
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._executor = None
+        self._pid = None
+        self._stats = {'hits': 0, 'misses': 0, 'aggregates_computed': 0, 'aggregates_errors': 0}
+
+    # ---------- pagine ----------
+
+    def list_page(self, prefix, token=None, limit=None, classify=None, refresh=False):
+        """
+        Pagina di sottocartelle e file diretti di prefix.
+        classify(nome) -> tipo del file (per 'type' e per gli aggregati).
+        """
+        limit = min(max(1, limit or self.config['page_size']), self.config['max_page_size'])
+        bucket_name = get_minio_bucket_name()
+        key = (bucket_name, prefix)
+        if refresh:
+            self._pages.pop(key)
+            self._aggregates.pop(key)
+
+        pages, _ = self._pages.get(key)
+        page = pages.get((token, limit)) if pages else None
+        if page is not None:
+            self._stats['hits'] += 1
+            return dict(page, cached=True)
+
+        self._stats['misses'] += 1
+        page = self._read_page(bucket_name, prefix, _decode_token(token), limit, classify)
+        if pages is None:
+            pages = {}
+            self._pages.put(key, pages, self.config['ttl'])
+        pages[(token, limit)] = page
+        return dict(page, cached=False)
+
+    def _read_page(self, bucket_name, prefix, start_after, limit, classify):
+        objects = get_minio_client().list_objects(
+            bucket_name, prefix=prefix, recursive=False, start_after=start_after
+        )
+        folders, files = [], []
+        last_key, has_more = None, False
+
+        for obj in objects:
+            if len(folders) + len(files) >= limit:
+                has_more = True
+                break
+            name = obj.object_name[len(prefix):]
+            if obj.is_dir:
+                folders.append(name.rstrip('/'))
+                last_key = obj.object_name + _AFTER_PREFIX
+            elif name:  # Ignora il marker della cartella stessa
+                files.append({
+                    'name': name,
+                    'path': obj.object_name,
+                    'size': obj.size,
+                    'last_modified': obj.last_modified.isoformat() if obj.last_modified else None,
+                    'type': classify(name) if classify else 'file'
+                })
+                last_key = obj.object_name
+
+        return {
+            'folders': folders,
+            'files': files,
+            'has_more': has_more,
+            'next_token': _encode_token(last_key) if has_more and last_key else None,
+            'limit': limit,
+        }
+
+    # ---------- aggregati ----------
+
+    def _get_executor(self):
+        pid = os.getpid()
+        if self._pid != pid:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.config['aggregates_workers'], thread_name_prefix='minio-listing'
+            )
+            self._pending = set()
+            self._pid = pid
+        return self._executor
+
+    def get_aggregates(self, prefix, classify=None):
+        """
+        Aggregati del sottoalbero di prefix se già calcolati (anche scaduti),
+        altrimenti None; in entrambi i casi il ricalcolo parte in background.
+        """
+        if not self.config['aggregates']:
+            return None
+        key = (get_minio_bucket_name(), prefix)
+        value, expired = self._aggregates.get(key, allow_expired=True)
+        if expired:
+            self._schedule(key, classify)
+        return value
+
+    def _schedule(self, key, classify):
+        with self._lock:
+            executor = self._get_executor()
+            if key in self._pending or len(self._pending) >= self.config['aggregates_max_pending']:
+                return
+            self._pending.add(key)
+            executor.submit(self._compute, key, classify)
+
+    def _compute(self, key, classify):
+        bucket_name, prefix = key
+        started = time.monotonic()
+        try:
+            file_count, total_size, last_modified = 0, 0, None
+            types = Counter()
+            for obj in get_minio_client().list_objects(bucket_name, prefix=prefix, recursive=True):
+                name = obj.object_name[len(prefix):]
+                if not name or obj.object_name.endswith('/'):
+                    continue
+                file_count += 1
+                total_size += obj.size or 0
+                types[classify(name) if classify else 'file'] += 1
+                if obj.last_modified and (last_modified is None or obj.last_modified > last_modified):
+                    last_modified = obj.last_modified
+
+            self._aggregates.put(key, {
+                'file_count': file_count,
+                'total_size': total_size,
+                'types': dict(types),
+                'last_modified': last_modified.isoformat() if last_modified else None,
+                'computed_at': time.time(),
+                'compute_ms': round((time.monotonic() - started) * 1000, 1),
+            }, self.config['aggregates_ttl'])
+            self._stats['aggregates_computed'] += 1
+        except Exception as e:
+            self._stats['aggregates_errors'] += 1
+            logging.error(f"Errore aggregati cartella {prefix}: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def get_stats(self):
+        stats = dict(self._stats)
+        stats.update({
+            'cached_folders': len(self._pages),
+            'cached_aggregates': len(self._aggregates),
+            'aggregates_pending': len(self._pending),
+        })
+        return stats
+
+
+_listing = FolderListing(MINIO_LISTING_CONFIG)
+
+
+def list_folder_page(prefix, token=None, limit=None, classify=None, refresh=False):
+    return _listing.list_page(prefix, token, limit, classify, refresh)
+
+
+def get_folder_aggregates(prefix, classify=None):
+    return _listing.get_aggregates(prefix, classify)
+
+
+def get_listing_stats():
+    return _listing.get_stats()
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+MINIO RANGE - RISPOSTE PARZIALI (HTTP RANGE) PER FILE MINIO
+Range / If-Range del client tradotti in get_object con offset/length:
+seek nei video e download ripresi trasferiscono solo i byte richiesti.
+- 206 + Content-Range per un range valido, 416 se fuori dal file
+- Range multipli o malformati: file intero (200), come da RFC 9110
+- If-Range con ETag (confronto forte) o data: se non corrisponde, file intero
+- Streaming a chunk costanti, nessun read() dell'oggetto in memoria
+"""
+
+import os
+import logging
+import mimetypes
+from email.utils import parsedate_to_datetime, format_datetime
+
+from flask import request, jsonify, Response, stream_with_context
+
+from utils.minio_client import get_minio_client, get_minio_bucket_name, iter_minio_object
+
+MINIO_RANGE_CHUNK_SIZE = 64 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    """Range che inizia oltre la fine del file"""
+
+
+def parse_range(header, size):
+    """(start, end) inclusivi dall'header Range, None = file intero"""
+    if not header or size <= 0:
+        return None
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec or ',' in spec:
+        return None
+
+    first, sep, last = spec.strip().partition('-')
+    if not sep:
+        return None
+    try:
+        if first == '':
+            # Suffix range: ultimi N byte
+            suffix = int(last)
+            if suffix <= 0:
+                raise RangeNotSatisfiable()
+            return max(0, size - suffix), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+
+    if start >= size:
+        raise RangeNotSatisfiable()
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def _quoted_etag(etag):
+    return etag if etag.startswith('"') else f'"{etag}"'
+
+
+def if_range_matches(if_range, etag, last_modified):
+    """True se la risorsa non è cambiata rispetto a If-Range (o If-Range assente)"""
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('W/'):
+        return False
+    if if_range.startswith('"'):
+        return bool(etag) and if_range == _quoted_etag(etag)
+    try:
+        since = parsedate_to_datetime(if_range)
+    except (TypeError, ValueError):
+        return False
+    return last_modified is not None and since is not None and \
+        int(since.timestamp()) == int(last_modified.timestamp())
+
+
+def requested_range(size, etag=None, last_modified=None):
+    """Range della richiesta corrente per un oggetto di size byte (None = intero)"""
+    if not if_range_matches(request.headers.get('If-Range'), etag, last_modified):
+        return None
+    return parse_range(request.headers.get('Range'), size)
+
+
+def minio_range_response(file_path, disposition='inline', filename=None):
+    """
+    Risposta Flask per un oggetto MinIO con supporto Range/If-Range:
+    200 intero, 206 parziale, 416 fuori range, 304 se l'ETag coincide.
+    """
+    client = get_minio_client()
+    bucket_name = get_minio_bucket_name()
+
+    try:
+        stat = client.stat_object(bucket_name, file_path)
+    except Exception as e:
+        logging.error(f"File non trovato: {file_path} - {e}")
+        return jsonify({'error': 'File non trovato'}), 404
+
+    mime_type, _ = mimetypes.guess_type(file_path)
+    if not mime_type:
+        mime_type = 'application/octet-stream'
+
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'Content-Disposition': disposition if disposition == 'inline'
+            else f'{disposition}; filename="{filename or os.path.basename(file_path)}"',
+    }
+    if stat.etag:
+        headers['ETag'] = _quoted_etag(stat.etag)
+    if stat.last_modified:
+        headers['Last-Modified'] = format_datetime(stat.last_modified, usegmt=True)
+
+    if stat.etag and request.if_none_match.contains(stat.etag.strip('"')):
+        return Response(status=304, headers=headers)
+
+    try:
+        byte_range = requested_range(stat.size, stat.etag, stat.last_modified)
+    except RangeNotSatisfiable:
+        headers['Content-Range'] = f'bytes */{stat.size}'
+        return Response(status=416, headers=headers)
+
+    if byte_range:
+        start, end = byte_range
+        status = 206
+        headers['Content-Range'] = f'bytes {start}-{end}/{stat.size}'
+    else:
+        start, end = 0, stat.size - 1
+        status = 200
+    length = end - start + 1
+    headers['Content-Length'] = str(length)
+
+    def generate():
+        if length <= 0:
+            return
+        try:
+            # get_object solo quando il body viene davvero letto (non per HEAD)
+            yield from iter_minio_object(
+                file_path, bucket_name, chunk_size=MINIO_RANGE_CHUNK_SIZE, client=client,
+                offset=start, length=length
+            )
+        except Exception as e:
+            logging.error(f"Errore streaming file {file_path} ({start}-{end}): {e}")
+
+    return Response(
+        stream_with_context(generate()),
+        status=status,
+        mimetype=mime_type,
+        headers=headers,
+        direct_passthrough=True
+    )
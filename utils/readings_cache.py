@@ -0,0 +1,406 @@
+# -*- coding: utf-8 -*-
+"""
+READINGS CACHE - CACHE RISPOSTE DEGLI ENDPOINT READINGS
+Le risposte di /api/readings/parameter/<id> e /api/readings/channel/<id>
+vengono tenute in memoria (LRU + TTL + tetto in MB) con chiave
+(endpoint, id, range normalizzato, limit, downsample, formato) ed ETag forte:
+una richiesta ripetuta con If-None-Match risponde 304 senza toccare PostgreSQL.
+
+Invalidazione: il trigger di migrations/003_readings_notify.sql invia
+NOTIFY readings_changed con (parameter_id, min/max timestamp) per ogni
+statement su readings; un thread in ascolto elimina le voci dei parametri
+toccati il cui range si sovrappone. Senza listener attivo le voci durano
+al massimo READINGS_CACHE_TTL_NO_LISTENER secondi.
+"""
+
+import os
+import json
+import math
+import time
+import select
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+
+import psycopg2
+import psycopg2.extensions
+from flask import request, make_response, g
+
+from utils.db import DB_CONFIG
+from utils.readings_columnar import negotiate_readings_format
+from utils.downsampling import DEFAULT_DOWNSAMPLE_MODE
+
+READINGS_CACHE_CONFIG = {
+    'enabled': os.getenv('READINGS_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes'),
+    'max_entries': int(os.getenv('READINGS_CACHE_MAX_ENTRIES', 512)),
+    'max_bytes': int(float(os.getenv('READINGS_CACHE_MAX_MB', 64)) * 1024 * 1024),
+    'ttl': float(os.getenv('READINGS_CACHE_TTL', 600)),
+    # TTL usato quando il listener NOTIFY non è connesso
+    'ttl_no_listener': float(os.getenv('READINGS_CACHE_TTL_NO_LISTENER', 30)),
+    # Granularità (secondi) a cui vengono arrotondati start/end di default (senza date)
+    'range_granularity': int(os.getenv('READINGS_CACHE_RANGE_SECONDS', 60)),
+}
+
+NOTIFY_CHANNEL = 'readings_changed'
+
+
+# =================================================================
+# RANGE NORMALIZZATO
+# =================================================================
+
+def _to_epoch(dt):
+    """Epoch in secondi; i datetime naive sono considerati UTC"""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+def _quantize(dt, step, up=False):
+    """Arrotonda dt a multipli di step secondi mantenendo il fuso (o l'assenza di fuso)"""
+    rounding = math.ceil if up else math.floor
+    quantized = datetime.fromtimestamp(rounding(_to_epoch(dt) / step) * step, tz=timezone.utc)
+    return quantized.replace(tzinfo=None) if dt.tzinfo is None else quantized.astimezone(dt.tzinfo)
+
+def resolve_readings_range(start_arg, end_arg, default_days=7):
+    """
+    Range delle richieste readings da query string (ISO, anche con 'Z').
+    Default: ultimi default_days giorni. Solo gli estremi di default
+    (relativi ad "adesso") sono arrotondati alla granularità della cache,
+    start per difetto ed end per eccesso, così richieste ripetute senza
+    date condividono la stessa voce; le date esplicite restano esatte e
+    i dati serviti sono quelli della finestra richiesta.
+    """
+    step = READINGS_CACHE_CONFIG['range_granularity']
+
+    if not end_arg:
+        end_date = datetime.now()
+        if step > 0:
+            end_date = _quantize(end_date, step, up=True)
+    else:
+        end_date = datetime.fromisoformat(end_arg.replace('Z', '+00:00'))
+
+    if not start_arg:
+        start_date = end_date - timedelta(days=default_days)
+        if step > 0:
+            start_date = _quantize(start_date, step)
+    else:
+        start_date = datetime.fromisoformat(start_arg.replace('Z', '+00:00'))
+    return start_date, end_date
+
+def resolve_readings_limit(default):
+    """
+    Limite punti delle richieste readings (?limit=, almeno 1): usato sia
+    dalla view sia dalla chiave della cache, così limit assente, vuoto o
+    uguale al default condividono la stessa voce
+    """
+    return max(1, request.args.get('limit', default, type=int))
+
+
+# =================================================================
+# CACHE LRU
+# =================================================================
+
+class ReadingsResponseCache:
+    """
+    Cache LRU thread-safe dei corpi JSON, con TTL, tetto su numero di voci
+    e byte totali. Ogni voce ricorda i parameter_id e il range (epoch)
+    per l'invalidazione mirata.
+    """
+
+    def __init__(self, max_entries=512, max_bytes=64 * 1024 * 1024, ttl=600, ttl_no_listener=30):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.ttl_no_listener = ttl_no_listener
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._size = 0
+        # Contatore incrementato a ogni invalidazione; per ogni parameter_id
+        # si ricorda il valore dell'ultima invalidazione, così una risposta
+        # calcolata prima di un'invalidazione dei *suoi* parametri non viene
+        # salvata (le NOTIFY degli altri parametri non la scartano)
+        self._generation = 0
+        self._invalidated_at = {}
+        self._cleared_at = 0
+
+        self._listener_thread = None
+        self._listener_pid = None
+        self._listener_connected = False
+
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'not_modified': 0,
+            'stores': 0,
+            'evictions': 0,
+            'expired': 0,
+            'invalidations': 0,
+        }
+
+    # ---------- accesso ----------
+
+    def get(self, key):
+        """Voce valida per key (aggiornata come più recente) oppure None"""
+        self._ensure_listener()
+        ttl = self.ttl if self._listener_connected else min(self.ttl, self.ttl_no_listener)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            if now - entry['stored_at'] > ttl:
+                self._remove(key)
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def put(self, key, body, mimetype, etag, parameter_ids, start_epoch, end_epoch, generation):
+        """
+        Salva il corpo della risposta. Non salva le voci più grandi del tetto
+        né quelle calcolate prima di un'invalidazione di uno dei loro
+        parameter_ids (o di uno svuotamento completo).
+        """
+        if len(body) > self.max_bytes:
+            return
+
+        with self._lock:
+            if self._cleared_at > generation or any(
+                self._invalidated_at.get(parameter_id, 0) > generation
+                for parameter_id in parameter_ids
+            ):
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {
+                'body': body,
+                'mimetype': mimetype,
+                'etag': etag,
+                'parameter_ids': frozenset(parameter_ids),
+                'start_epoch': start_epoch,
+                'end_epoch': end_epoch,
+                'stored_at': time.monotonic(),
+            }
+            self._size += len(body)
+            self._stats['stores'] += 1
+
+            while self._entries and (len(self._entries) > self.max_entries or self._size > self.max_bytes):
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self._stats['evictions'] += 1
+
+    def record_not_modified(self):
+        with self._lock:
+            self._stats['not_modified'] += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._size -= len(entry['body'])
+
+    # ---------- invalidazione ----------
+
+    def invalidate(self, parameter_id, min_epoch=None, max_epoch=None):
+        """
+        Elimina le voci che contengono parameter_id e il cui range si
+        sovrappone a [min_epoch, max_epoch] (None = tutto il periodo)
+        """
+        with self._lock:
+            self._generation += 1
+            self._invalidated_at[parameter_id] = self._generation
+            stale = [
+                key for key, entry in self._entries.items()
+                if parameter_id in entry['parameter_ids']
+                and (max_epoch is None or max_epoch >= entry['start_epoch'])
+                and (min_epoch is None or min_epoch <= entry['end_epoch'])
+            ]
+            for key in stale:
+                self._remove(key)
+            self._stats['invalidations'] += len(stale)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._cleared_at = self._generation
+            self._invalidated_at.clear()
+            self._entries.clear()
+            self._size = 0
+
+    def _handle_notification(self, payload):
+        try:
+            data = json.loads(payload)
+            self.invalidate(int(data['parameter_id']), data.get('min_ts'), data.get('max_ts'))
+        except (ValueError, KeyError, TypeError) as e:
+            logging.warning(f"Notifica {NOTIFY_CHANNEL} non valida ({payload!r}): {e}")
+
+    # ---------- listener NOTIFY ----------
+
+    def _ensure_listener(self):
+        """Avvia (una volta per processo) il thread LISTEN sulle modifiche a readings"""
+        pid = os.getpid()
+        if self._listener_pid == pid:
+            return
+        with self._lock:
+            if self._listener_pid == pid:
+                return
+            # Processo nuovo (anche dopo fork): thread e connessione vanno ricreati
+            self._listener_pid = pid
+            self._listener_connected = False
+            self._listener_thread = threading.Thread(
+                target=self._listen_loop, name='readings-cache-listener', daemon=True
+            )
+            self._listener_thread.start()
+
+    def _listen_loop(self):
+        backoff = 1
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(**DB_CONFIG)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {NOTIFY_CHANNEL}")
+
+                # Le notifiche perse mentre eravamo disconnessi sono ignote
+                self.clear()
+                self._listener_connected = True
+                backoff = 1
+
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._handle_notification(conn.notifies.pop(0).payload)
+            except Exception as e:
+                logging.error(f"Listener cache readings disconnesso: {e}")
+            finally:
+                self._listener_connected = False
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+
+    # ---------- statistiche ----------
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['size_bytes'] = self._size
+        stats['enabled'] = READINGS_CACHE_CONFIG['enabled']
+        stats['listener_connected'] = self._listener_connected
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 3) if lookups else None
+        return stats
+
+
+_cache = ReadingsResponseCache(
+    max_entries=READINGS_CACHE_CONFIG['max_entries'],
+    max_bytes=READINGS_CACHE_CONFIG['max_bytes'],
+    ttl=READINGS_CACHE_CONFIG['ttl'],
+    ttl_no_listener=READINGS_CACHE_CONFIG['ttl_no_listener'],
+)
+
+
+def get_readings_cache():
+    return _cache
+
+def get_readings_cache_stats():
+    """Statistiche della cache readings (per /health)"""
+    return _cache.get_stats()
+
+
+# =================================================================
+# DECORATOR PER GLI ENDPOINT
+# =================================================================
+
+def _etag_matches(etag):
+    if_none_match = request.headers.get('If-None-Match', '')
+    return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+
+def _set_cache_headers(response, etag):
+    response.headers['ETag'] = etag
+    # Il browser tiene la copia ma rivalida sempre con If-None-Match
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.headers['Vary'] = 'Accept'
+    return response
+
+def _cached_response(entry):
+    response = make_response(entry['body'])
+    response.mimetype = entry['mimetype']
+    return _set_cache_headers(response, entry['etag'])
+
+def _not_modified(etag):
+    _cache.record_not_modified()
+    return _set_cache_headers(make_response('', 304), etag)
+
+def cached_readings_response(kind, item_arg, default_limit):
+    """
+    Decorator per gli endpoint readings: cache della risposta ed ETag.
+    kind: 'parameter' | 'channel' (parte della chiave).
+    item_arg: nome dell'argomento della view con l'id.
+    default_limit: limite punti della view se ?limit= manca.
+    I parameter_id per l'invalidazione sono quelli impostati dalla view in
+    g.readings_parameter_ids, altrimenti l'id stesso.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not READINGS_CACHE_CONFIG['enabled'] or request.args.get('diagnostic'):
+                return view(*args, **kwargs)
+
+            try:
+                start_date, end_date = resolve_readings_range(
+                    request.args.get('start_date'), request.args.get('end_date')
+                )
+            except ValueError:
+                # Date non valide: la view risponde con il proprio errore
+                return view(*args, **kwargs)
+
+            start_epoch, end_epoch = _to_epoch(start_date), _to_epoch(end_date)
+            key = (
+                kind,
+                kwargs[item_arg],
+                start_epoch,
+                end_epoch,
+                resolve_readings_limit(default_limit),
+                request.args.get('downsample', DEFAULT_DOWNSAMPLE_MODE).lower(),
+                negotiate_readings_format(),
+            )
+
+            entry = _cache.get(key)
+            if entry is not None:
+                if _etag_matches(entry['etag']):
+                    return _not_modified(entry['etag'])
+                return _cached_response(entry)
+
+            generation = _cache.generation
+            response = view(*args, **kwargs)
+            if isinstance(response, tuple) or response.status_code != 200:
+                return response
+
+            body = response.get_data()
+            etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+            parameter_ids = getattr(g, 'readings_parameter_ids', None) or [kwargs[item_arg]]
+            _cache.put(key, body, response.mimetype, etag, parameter_ids, start_epoch, end_epoch, generation)
+
+            if _etag_matches(etag):
+                return _not_modified(etag)
+            return _set_cache_headers(response, etag)
+        return wrapper
+    return decorator
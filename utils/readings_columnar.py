@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+READINGS COLUMNAR - FORMATI BINARI PER GLI ENDPOINT READINGS
+Content negotiation (header Accept o ?format=) tra:
+- application/json                      (default, righe {timestamp_utc, value})
+- application/msgpack                   (stessa struttura, readings colonnari)
+- application/vnd.apache.arrow.stream   (Arrow IPC, richiede pyarrow)
+
+Nei formati binari i readings di ogni parametro sono colonne:
+    {'timestamp_ms': int64[], 'value': float64[]}   parametri numerici
+    {'timestamp_ms': int64[], 'value': [str, ...]}  parametri file/cartelle
+Gli array NumPy viaggiano in msgpack come ext type (little-endian):
+    ext 1 = int64[], ext 2 = float64[]
+Decoder lato client: static/js/visualizer/js/utils/ReadingsDecoder.js
+"""
+
+import json
+import struct
+import calendar
+
+import numpy as np
+from flask import request, jsonify, Response
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+
+READINGS_FORMATS = {
+    'json': JSON_MIMETYPE,
+    'msgpack': MSGPACK_MIMETYPE,
+    'arrow': ARROW_MIMETYPE,
+}
+
+MSGPACK_EXT_INT64 = 1
+MSGPACK_EXT_FLOAT64 = 2
+
+
+def arrow_available():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def negotiate_readings_format():
+    """'json' | 'msgpack' | 'arrow' da ?format= o dall'header Accept (default json)"""
+    requested = request.args.get('format', '').lower()
+    if requested in READINGS_FORMATS:
+        if requested == 'arrow' and not arrow_available():
+            return 'json'
+        return requested
+
+    offered = [JSON_MIMETYPE, MSGPACK_MIMETYPE]
+    if arrow_available():
+        offered.append(ARROW_MIMETYPE)
+    best = request.accept_mimetypes.best_match(offered, default=JSON_MIMETYPE)
+    return {mime: name for name, mime in READINGS_FORMATS.items()}[best]
+
+
+# =================================================================
+# COLONNE
+# =================================================================
+
+def _epoch_ms(ts):
+    """Epoch in millisecondi; i datetime naive sono UTC (timestamp_utc)"""
+    return calendar.timegm(ts.utctimetuple()) * 1000 + ts.microsecond // 1000
+
+def epoch_seconds_to_ms(ts_seconds):
+    """Array di epoch in secondi (float64) -> millisecondi int64, troncati come _epoch_ms"""
+    return np.rint(ts_seconds * 1e6).astype(np.int64) // 1000
+
+def readings_to_columns(rows, numeric):
+    """
+    Colonne timestamp_ms/value da righe (timestamp_utc, value) di un cursore
+    a tuple (execute_query_rows), senza dict per riga né in ingresso né in
+    uscita. Le serie già colonnari (downsampling) passano invariate.
+    """
+    if isinstance(rows, dict):
+        return rows
+    rows = [row for row in rows if row[0] is not None]
+    timestamps = np.fromiter((_epoch_ms(row[0]) for row in rows), dtype=np.int64, count=len(rows))
+    if numeric:
+        values = np.fromiter(
+            (np.nan if row[1] is None else float(row[1]) for row in rows),
+            dtype=np.float64, count=len(rows)
+        )
+    else:
+        values = [row[1] for row in rows]
+    return {'timestamp_ms': timestamps, 'value': values}
+
+
+# =================================================================
+# MSGPACK (encoder minimale, senza dipendenze)
+# =================================================================
+
+def _pack_ext(code, data, out):
+    size = len(data)
+    if size <= 0xff:
+        out.append(struct.pack('>BBb', 0xc7, size, code))
+    elif size <= 0xffff:
+        out.append(struct.pack('>BHb', 0xc8, size, code))
+    else:
+        out.append(struct.pack('>BIb', 0xc9, size, code))
+    out.append(data)
+
+def _pack(obj, out):
+    if obj is None:
+        out.append(b'\xc0')
+    elif obj is True:
+        out.append(b'\xc3')
+    elif obj is False:
+        out.append(b'\xc2')
+    elif isinstance(obj, np.ndarray):
+        if obj.dtype.kind in 'iu':
+            _pack_ext(MSGPACK_EXT_INT64, obj.astype('<i8').tobytes(), out)
+        else:
+            _pack_ext(MSGPACK_EXT_FLOAT64, obj.astype('<f8').tobytes(), out)
+    elif isinstance(obj, (int, np.integer)):
+        obj = int(obj)
+        if 0 <= obj <= 0x7f:
+            out.append(struct.pack('>B', obj))
+        elif -32 <= obj < 0:
+            out.append(struct.pack('>b', obj))
+        elif obj < 0:
+            out.append(struct.pack('>Bq', 0xd3, obj))
+        else:
+            out.append(struct.pack('>BQ', 0xcf, obj))
+    elif isinstance(obj, (float, np.floating)):
+        out.append(struct.pack('>Bd', 0xcb, float(obj)))
+    elif isinstance(obj, str):
+        data = obj.encode('utf-8')
+        size = len(data)
+        if size <= 31:
+            out.append(struct.pack('>B', 0xa0 | size))
+        elif size <= 0xff:
+            out.append(struct.pack('>BB', 0xd9, size))
+        elif size <= 0xffff:
+            out.append(struct.pack('>BH', 0xda, size))
+        else:
+            out.append(struct.pack('>BI', 0xdb, size))
+        out.append(data)
+    elif isinstance(obj, (bytes, bytearray)):
+        size = len(obj)
+        if size <= 0xff:
+            out.append(struct.pack('>BB', 0xc4, size))
+        elif size <= 0xffff:
+            out.append(struct.pack('>BH', 0xc5, size))
+        else:
+            out.append(struct.pack('>BI', 0xc6, size))
+        out.append(bytes(obj))
+    elif isinstance(obj, (list, tuple)):
+        size = len(obj)
+        if size <= 15:
+            out.append(struct.pack('>B', 0x90 | size))
+        elif size <= 0xffff:
+            out.append(struct.pack('>BH', 0xdc, size))
+        else:
+            out.append(struct.pack('>BI', 0xdd, size))
+        for item in obj:
+            _pack(item, out)
+    elif isinstance(obj, dict):
+        size = len(obj)
+        if size <= 15:
+            out.append(struct.pack('>B', 0x80 | size))
+        elif size <= 0xffff:
+            out.append(struct.pack('>BH', 0xde, size))
+        else:
+            out.append(struct.pack('>BI', 0xdf, size))
+        for key, value in obj.items():
+            _pack(str(key), out)
+            _pack(value, out)
+    elif hasattr(obj, 'isoformat'):
+        _pack(obj.isoformat(), out)
+    else:
+        # Decimal e simili
+        _pack(float(obj) if hasattr(obj, '__float__') else str(obj), out)
+
+def packb(obj):
+    out = []
+    _pack(obj, out)
+    return b''.join(out)
+
+
+# =================================================================
+# ARROW IPC
+# =================================================================
+
+def _arrow_stream(response_data):
+    """
+    Stream Arrow IPC in formato long: parameter_name, timestamp (ms, UTC),
+    value (float64, numerici) e text_value (file/cartelle).
+    Il resto della risposta è JSON nei metadata dello schema ('meta').
+    """
+    import pyarrow as pa
+
+    readings = response_data['readings']
+    if 'timestamp_ms' in readings:
+        readings = {response_data.get('parameter_info', {}).get('name', ''): readings}
+
+    names, timestamps, values, text_values = [], [], [], []
+    for name, columns in readings.items():
+        size = len(columns['timestamp_ms'])
+        names.append(np.full(size, name, dtype=object))
+        timestamps.append(columns['timestamp_ms'])
+        if isinstance(columns['value'], np.ndarray):
+            values.append(columns['value'])
+            text_values.append(np.full(size, None, dtype=object))
+        else:
+            values.append(np.full(size, np.nan))
+            text_values.append(np.array(columns['value'], dtype=object))
+
+    def concat(parts, dtype):
+        return np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+
+    meta = {key: value for key, value in response_data.items() if key != 'readings'}
+    schema = pa.schema(
+        [
+            ('parameter_name', pa.dictionary(pa.int32(), pa.string())),
+            ('timestamp', pa.timestamp('ms', tz='UTC')),
+            ('value', pa.float64()),
+            ('text_value', pa.string()),
+        ],
+        metadata={'meta': json.dumps(meta, default=str)}
+    )
+    batch = pa.record_batch(
+        [
+            pa.array(concat(names, object), type=pa.string()).dictionary_encode(),
+            pa.array(concat(timestamps, np.int64), type=pa.int64()).cast(pa.timestamp('ms', tz='UTC')),
+            pa.array(concat(values, np.float64), type=pa.float64(), from_pandas=True),
+            pa.array(concat(text_values, object), type=pa.string()),
+        ],
+        schema=schema
+    )
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+# =================================================================
+# RISPOSTA
+# =================================================================
+
+def readings_response(response_data, fmt):
+    """Risposta Flask nel formato negoziato (readings già colonnari se fmt != json)"""
+    if fmt == 'json':
+        response = jsonify(response_data)
+    elif fmt == 'msgpack':
+        response = Response(packb(response_data), mimetype=MSGPACK_MIMETYPE)
+    else:
+        response = Response(_arrow_stream(response_data), mimetype=ARROW_MIMETYPE)
+    response.headers['Vary'] = 'Accept'
+    return response
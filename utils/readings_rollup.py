@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+"""
+READINGS ROLLUP - ROUTING QUERY SU TABELLE PRE-AGGREGATE
+Le tabelle readings_rollup_1m/1h/1d (migrations/001_readings_rollup.sql)
+contengono min/max/avg/count/first/last per parametro e bucket temporale,
+aggiornate dal trigger su readings. Qui si sceglie la risoluzione da usare
+per i grafici e si gestisce il backfill dello storico.
+I bucket sono sempre allineati in UTC (trigger con TimeZone=UTC,
+migrations/009_readings_rollup_utc.sql; backfill con SET LOCAL; confini
+delle query calcolati qui), qualunque sia il TimeZone della sessione.
+"""
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+from utils.db import execute_query, get_db_connection
+
+ROLLUP_ENABLED = os.getenv('READINGS_ROLLUP_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+# Dalla più grossolana alla più fine
+ROLLUP_RESOLUTIONS = [
+    {'name': '1d', 'seconds': 86400, 'table': 'readings_rollup_1d', 'unit': 'day'},
+    {'name': '1h', 'seconds': 3600, 'table': 'readings_rollup_1h', 'unit': 'hour'},
+    {'name': '1m', 'seconds': 60, 'table': 'readings_rollup_1m', 'unit': 'minute'},
+]
+
+RAW_RESOLUTION = 'raw'
+
+_AVAILABILITY_TTL = 60  # secondi
+_availability = {'value': None, 'checked_at': 0.0}
+_availability_lock = threading.Lock()
+
+
+def rollups_available():
+    """True se le tabelle di rollup esistono (controllo in cache per 60s)"""
+    if not ROLLUP_ENABLED:
+        return False
+
+    now = time.monotonic()
+    with _availability_lock:
+        if _availability['value'] is not None and now - _availability['checked_at'] < _AVAILABILITY_TTL:
+            return _availability['value']
+
+    result = execute_query(
+        "SELECT " + ", ".join(
+            f"to_regclass('{r['table']}') IS NOT NULL AS {r['table']}" for r in ROLLUP_RESOLUTIONS
+        ),
+        fetch=True
+    )
+    available = bool(result) and all(result[0].values())
+
+    with _availability_lock:
+        _availability['value'] = available
+        _availability['checked_at'] = now
+    return available
+
+
+def choose_rollup_resolution(start_date, end_date, num_buckets):
+    """
+    Sceglie la risoluzione più grossolana che fornisce ancora almeno
+    num_buckets bucket nel periodo richiesto. None = usare i dati raw.
+    """
+    duration_seconds = (end_date - start_date).total_seconds()
+    if duration_seconds <= 0 or not rollups_available():
+        return None
+
+    for resolution in ROLLUP_RESOLUTIONS:
+        if duration_seconds / resolution['seconds'] >= num_buckets:
+            return resolution
+    return None
+
+
+def _rollup_bucket_id_sql():
+    """Bucket allineato all'inizio del periodo, limitato a [0, num_buckets-1]"""
+    return (
+        "LEAST(GREATEST(floor((extract(epoch from r.bucket_start) - extract(epoch from %(start)s))"
+        " / %(interval)s), 0), %(last_bucket)s)"
+    )
+
+
+def _bucket_floor(dt, resolution):
+    """Inizio del bucket di dt, allineato in UTC (i datetime naive sono già UTC)"""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc)
+    dt = dt.replace(second=0, microsecond=0)
+    if resolution['unit'] in ('hour', 'day'):
+        dt = dt.replace(minute=0)
+    if resolution['unit'] == 'day':
+        dt = dt.replace(hour=0)
+    return dt
+
+
+def _rollup_source_sql(resolution):
+    """
+    CTE "src" con le righe di rollup dei soli bucket interamente dentro
+    [start, end] più i readings raw dei tratti iniziale e finale (bucket a
+    cavallo degli estremi) nella stessa forma, un campione per riga:
+    nessun valore fuori dal periodo richiesto entra in min/max o medie.
+    lo = primo inizio bucket >= start, hi = inizio del bucket di end
+    (calcolati in UTC da _rollup_params, non con date_trunc nel fuso
+    della sessione).
+    """
+    raw_columns = (
+        "x.parameter_id, x.timestamp_utc, x.timestamp_utc, x.v, x.timestamp_utc, x.v, "
+        "x.timestamp_utc, x.v, x.timestamp_utc, x.v, x.v, 1"
+    )
+    return f"""
+        edges AS (
+            SELECT r.parameter_id, r.timestamp_utc, readings_value_as_float(r.value) AS v
+            FROM readings r
+            WHERE r.parameter_id = ANY(%(parameter_ids)s)
+              AND r.timestamp_utc >= %(start)s
+              AND r.timestamp_utc <= %(end)s
+              AND r.timestamp_utc < %(lo)s
+            UNION ALL
+            SELECT r.parameter_id, r.timestamp_utc, readings_value_as_float(r.value) AS v
+            FROM readings r
+            WHERE r.parameter_id = ANY(%(parameter_ids)s)
+              AND r.timestamp_utc >= %(edge_hi)s
+              AND r.timestamp_utc <= %(end)s
+        ),
+        src AS (
+            SELECT
+                r.parameter_id, r.bucket_start, r.min_ts, r.min_value, r.max_ts, r.max_value,
+                r.first_ts, r.first_value, r.last_ts, r.last_value, r.sum_value, r.sample_count
+            FROM {resolution['table']} r
+            WHERE r.parameter_id = ANY(%(parameter_ids)s)
+              AND r.bucket_start >= %(lo)s
+              AND r.bucket_start < %(hi)s
+            UNION ALL
+            SELECT {raw_columns}
+            FROM edges x
+            WHERE x.v IS NOT NULL
+        )
+    """
+
+
+def _rollup_params(resolution, parameter_ids, start_date, end_date, num_buckets):
+    lo = _bucket_floor(start_date + timedelta(seconds=resolution['seconds'], microseconds=-1), resolution)
+    hi = _bucket_floor(end_date, resolution)
+    return {
+        'parameter_ids': list(parameter_ids),
+        'start': start_date,
+        'end': end_date,
+        'lo': lo,
+        'hi': hi,
+        'edge_hi': max(lo, hi),
+        'interval': max(1, (end_date - start_date).total_seconds() / num_buckets),
+        'last_bucket': num_buckets - 1,
+    }
+
+
+def build_rollup_minmax_query(resolution, parameter_ids, start_date, end_date, num_buckets):
+    """
+    Query min/max per bucket (stessa forma della query raw) letta dalla
+    tabella di rollup: un punto min e uno max per bucket e parametro,
+    con i timestamp reali.
+    """
+    query = f"""
+        WITH {_rollup_source_sql(resolution)},
+        buckets AS (
+            SELECT
+                r.parameter_id,
+                {_rollup_bucket_id_sql()} as bucket_id,
+                r.min_ts, r.min_value, r.max_ts, r.max_value
+            FROM src r
+        ),
+        min_max_points AS (
+            (SELECT DISTINCT ON (parameter_id, bucket_id) parameter_id, min_ts as timestamp_utc, min_value as value
+             FROM buckets ORDER BY parameter_id, bucket_id, min_value ASC, min_ts ASC)
+            UNION
+            (SELECT DISTINCT ON (parameter_id, bucket_id) parameter_id, max_ts as timestamp_utc, max_value as value
+             FROM buckets ORDER BY parameter_id, bucket_id, max_value DESC, max_ts ASC)
+        )
+        SELECT parameter_id, timestamp_utc, value FROM min_max_points ORDER BY parameter_id, timestamp_utc ASC
+    """
+    return query, _rollup_params(resolution, parameter_ids, start_date, end_date, num_buckets)
+
+
+def build_rollup_m4_query(resolution, parameter_ids, start_date, end_date, num_buckets):
+    """
+    Query M4 (primo, min, max e ultimo punto per bucket e parametro) letta
+    dalla tabella di rollup, con i timestamp reali: first/min/max/last del
+    rollup sono già gli estremi M4 di ogni bucket fine.
+    """
+    query = f"""
+        WITH {_rollup_source_sql(resolution)},
+        buckets AS (
+            SELECT
+                r.parameter_id,
+                {_rollup_bucket_id_sql()} as bucket_id,
+                r.first_ts, r.first_value, r.min_ts, r.min_value,
+                r.max_ts, r.max_value, r.last_ts, r.last_value
+            FROM src r
+        ),
+        m4_points AS (
+            (SELECT DISTINCT ON (parameter_id, bucket_id) parameter_id, first_ts as timestamp_utc, first_value as value
+             FROM buckets ORDER BY parameter_id, bucket_id, first_ts ASC)
+            UNION
+            (SELECT DISTINCT ON (parameter_id, bucket_id) parameter_id, min_ts as timestamp_utc, min_value as value
+             FROM buckets ORDER BY parameter_id, bucket_id, min_value ASC, min_ts ASC)
+            UNION
+            (SELECT DISTINCT ON (parameter_id, bucket_id) parameter_id, max_ts as timestamp_utc, max_value as value
+             FROM buckets ORDER BY parameter_id, bucket_id, max_value DESC, max_ts ASC)
+            UNION
+            (SELECT DISTINCT ON (parameter_id, bucket_id) parameter_id, last_ts as timestamp_utc, last_value as value
+             FROM buckets ORDER BY parameter_id, bucket_id, last_ts DESC)
+        )
+        SELECT parameter_id, timestamp_utc, value FROM m4_points ORDER BY parameter_id, timestamp_utc ASC
+    """
+    return query, _rollup_params(resolution, parameter_ids, start_date, end_date, num_buckets)
+
+
+def build_rollup_avg_query(resolution, parameter_ids, start_date, end_date, num_buckets):
+    """Media pesata per bucket e parametro (sum/count) dalla tabella di rollup"""
+    query = f"""
+        WITH {_rollup_source_sql(resolution)}
+        SELECT
+            r.parameter_id,
+            MIN(r.first_ts) + (MAX(r.last_ts) - MIN(r.first_ts)) / 2 as timestamp_utc,
+            SUM(r.sum_value) / SUM(r.sample_count) as value
+        FROM src r
+        GROUP BY r.parameter_id, {_rollup_bucket_id_sql()}
+        ORDER BY 1, 2 ASC
+    """
+    return query, _rollup_params(resolution, parameter_ids, start_date, end_date, num_buckets)
+
+
+# =================================================================
+# BACKFILL
+# =================================================================
+
+def backfill_rollups(parameter_id=None, start_date=None, end_date=None):
+    """
+    Ricalcola i rollup dai readings raw, un giorno alla volta.
+    I bucket del giorno vengono cancellati e ricostruiti nella stessa
+    transazione (readings bloccata in SHARE MODE per non perdere insert concorrenti).
+    Giorni e bucket sono allineati in UTC: una finestra non taglia mai a
+    metà un bucket della finestra successiva.
+    """
+    if start_date is None or end_date is None:
+        bounds_query = "SELECT MIN(timestamp_utc) as first_ts, MAX(timestamp_utc) as last_ts FROM readings"
+        bounds_params = None
+        if parameter_id is not None:
+            bounds_query += " WHERE parameter_id = %s"
+            bounds_params = (parameter_id,)
+        bounds = execute_query(bounds_query, bounds_params, fetch=True)
+        if not bounds or bounds[0]['first_ts'] is None:
+            return 0
+        start_date = start_date or bounds[0]['first_ts']
+        end_date = end_date or bounds[0]['last_ts']
+
+    day = _bucket_floor(start_date, ROLLUP_RESOLUTIONS[0])
+    processed_days = 0
+
+    while day <= end_date:
+        next_day = day + timedelta(days=1)
+        conn = get_db_connection()
+        if not conn:
+            raise RuntimeError("Connessione database non disponibile per backfill rollup")
+        try:
+            with conn.cursor() as cur:
+                cur.execute("LOCK TABLE readings IN SHARE MODE")
+                # date_trunc su timestamptz usa il fuso della sessione
+                cur.execute("SET LOCAL TimeZone = 'UTC'")
+
+                filter_sql = "timestamp_utc >= %s AND timestamp_utc < %s"
+                filter_params = [day, next_day]
+                if parameter_id is not None:
+                    filter_sql += " AND parameter_id = %s"
+                    filter_params.append(parameter_id)
+
+                source = cur.mogrify(
+                    f"(SELECT parameter_id, timestamp_utc, value FROM readings WHERE {filter_sql}) src",
+                    filter_params
+                ).decode('utf-8')
+
+                for resolution in ROLLUP_RESOLUTIONS:
+                    cur.execute(
+                        f"DELETE FROM {resolution['table']} WHERE "
+                        + filter_sql.replace('timestamp_utc', 'bucket_start'),
+                        filter_params
+                    )
+                    cur.execute(
+                        "SELECT readings_rollup_merge_sql(%s, %s, %s)",
+                        (resolution['table'], resolution['unit'], source)
+                    )
+                    cur.execute(cur.fetchone()[0])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        processed_days += 1
+        day = next_day
+
+    logging.info(f"Backfill rollup completato: {processed_days} giorni (parametro={parameter_id})")
+    return processed_days
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Gestione rollup readings')
+    parser.add_argument('--backfill', action='store_true', help='Ricalcola i rollup dai readings raw')
+    parser.add_argument('--parameter-id', type=int, default=None)
+    parser.add_argument('--start-date', default=None, help='ISO date/datetime')
+    parser.add_argument('--end-date', default=None, help='ISO date/datetime')
+    args = parser.parse_args()
+
+    if args.backfill:
+        logging.basicConfig(level=logging.INFO)
+        days = backfill_rollups(
+            parameter_id=args.parameter_id,
+            start_date=datetime.fromisoformat(args.start_date) if args.start_date else None,
+            end_date=datetime.fromisoformat(args.end_date) if args.end_date else None,
+        )
+        print(f"Backfill completato: {days} giorni elaborati")
+    else:
+        parser.print_help()
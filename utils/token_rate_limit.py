@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+TOKEN RATE LIMIT - LIMITE RICHIESTE PER TOKEN API
+rate_limit_per_hour di user_tokens applicato alle richieste /api/
+autenticate con token:
+- token bucket in memoria per token (capacità = limite orario, ricarica
+  continua limite/3600 al secondo) ricaricato in modo lazy a ogni
+  richiesta: nessun timer, nessuna query
+- risposta 429 con Retry-After e header X-RateLimit-Limit/Remaining/Reset
+  (Reset = epoch in cui il bucket torna pieno)
+- request_count, last_used e last_ip accumulati in memoria e scritti su
+  user_tokens a lotti da un thread
+I bucket sono per processo: con N worker il limite effettivo per token
+arriva al più a N volte quello impostato.
+"""
+
+import os
+import math
+import time
+import atexit
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import psycopg2.extras
+
+from utils.db import get_db_connection
+
+TOKEN_RATE_LIMIT_CONFIG = {
+    'flush_interval': float(os.getenv('TOKEN_USAGE_FLUSH_INTERVAL', 30)),
+    # Bucket tenuti in memoria (LRU): un bucket rimosso riparte pieno
+    'max_buckets': int(os.getenv('TOKEN_RATE_LIMIT_MAX_BUCKETS', 10000)),
+}
+
+
+class TokenBucket:
+    """Bucket di un token: tokens disponibili all'istante updated"""
+
+    __slots__ = ('capacity', 'rate', 'tokens', 'updated')
+
+    def __init__(self, limit_per_hour, now):
+        self.capacity = float(limit_per_hour)
+        self.rate = limit_per_hour / 3600.0
+        self.tokens = self.capacity
+        self.updated = now
+
+    def refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def resize(self, limit_per_hour):
+        """Limite cambiato dall'admin: stessa capacità residua, nuovo tetto"""
+        self.capacity = float(limit_per_hour)
+        self.rate = limit_per_hour / 3600.0
+        self.tokens = min(self.tokens, self.capacity)
+
+
+class TokenRateLimiter:
+    """Bucket per token_id + contatori d'uso da scrivere su user_tokens"""
+
+    def __init__(self, config):
+        self.config = config
+        self.lock = threading.Lock()
+        self.buckets = OrderedDict()   # token_id -> TokenBucket
+        self.usage = {}                # token_id -> [richieste, last_used, last_ip]
+        self.wake = threading.Event()
+        self.flusher = None
+        self.pid = None
+        self.stats = {'allowed': 0, 'limited': 0, 'flushes': 0, 'flushed_tokens': 0, 'flush_errors': 0}
+
+    def hit(self, token_id, limit_per_hour, ip=None):
+        """
+        Registra una richiesta del token. Restituisce (consentita, info)
+        con info = {'limit', 'remaining', 'reset', 'retry_after'}, oppure
+        (True, None) se il token non ha limite.
+        """
+        now = time.time()
+        with self.lock:
+            usage = self.usage.get(token_id)
+            if usage is None:
+                self.usage[token_id] = [1, now, ip]
+            else:
+                usage[0] += 1
+                usage[1] = now
+                usage[2] = ip or usage[2]
+
+            if not limit_per_hour:
+                self.buckets.pop(token_id, None)
+                self.stats['allowed'] += 1
+                allowed, info = True, None
+            else:
+                allowed, info = self._take(token_id, limit_per_hour, now)
+        self._ensure_flusher()
+        return allowed, info
+
+    def _take(self, token_id, limit_per_hour, now):
+        """Ricarica lazy e consumo di un gettone (chiamare con lock)"""
+        bucket = self.buckets.get(token_id)
+        if bucket is None:
+            bucket = self.buckets[token_id] = TokenBucket(limit_per_hour, now)
+            if len(self.buckets) > self.config['max_buckets']:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(token_id)
+            if bucket.capacity != limit_per_hour:
+                bucket.resize(limit_per_hour)
+            bucket.refill(now)
+
+        allowed = bucket.tokens >= 1
+        if allowed:
+            bucket.tokens -= 1
+            self.stats['allowed'] += 1
+        else:
+            self.stats['limited'] += 1
+        info = {
+            'limit': limit_per_hour,
+            'remaining': int(bucket.tokens),
+            'reset': int(math.ceil(now + (bucket.capacity - bucket.tokens) / bucket.rate)),
+            'retry_after': 0 if allowed else max(1, int(math.ceil((1 - bucket.tokens) / bucket.rate))),
+        }
+        return allowed, info
+
+    def forget(self, token_id=None):
+        """Scarta il bucket di un token (o tutti), es. token eliminato"""
+        with self.lock:
+            if token_id is None:
+                self.buckets.clear()
+            else:
+                self.buckets.pop(token_id, None)
+
+    # ---------- write-behind ----------
+
+    def _ensure_flusher(self):
+        pid = os.getpid()
+        if self.pid == pid and self.flusher and self.flusher.is_alive():
+            return
+        with self.lock:
+            if self.pid == pid and self.flusher and self.flusher.is_alive():
+                return
+            if self.pid is None:
+                atexit.register(self.flush)
+            self.pid = pid
+            self.flusher = threading.Thread(target=self._run, name='token-usage', daemon=True)
+            self.flusher.start()
+
+    def _run(self):
+        while True:
+            self.wake.wait(self.config['flush_interval'])
+            self.wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Errore flush utilizzo token: {e}")
+
+    def flush(self):
+        """Somma i contatori accumulati su user_tokens (un UPDATE per token, in batch)"""
+        with self.lock:
+            if not self.usage:
+                return 0
+            usage, self.usage = self.usage, {}
+
+        rows = [
+            (token_id, count, datetime.fromtimestamp(last_used, timezone.utc), last_ip)
+            for token_id, (count, last_used, last_ip) in usage.items()
+        ]
+        written = _update_token_usage(rows)
+
+        with self.lock:
+            if written:
+                self.stats['flushes'] += 1
+                self.stats['flushed_tokens'] += len(rows)
+            else:
+                # Riprova al prossimo giro sommando alle richieste nel frattempo
+                self.stats['flush_errors'] += 1
+                for token_id, (count, last_used, last_ip) in usage.items():
+                    current = self.usage.get(token_id)
+                    if current is None:
+                        self.usage[token_id] = [count, last_used, last_ip]
+                    else:
+                        current[0] += count
+                        current[2] = current[2] or last_ip
+        return len(rows) if written else 0
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats.update({
+                'buckets': len(self.buckets),
+                'pending_tokens': len(self.usage),
+            })
+            return stats
+
+
+def _update_token_usage(rows):
+    conn = get_db_connection()
+    if not conn:
+        return False
+    try:
+        with conn.cursor() as cur:
+            # Un solo round trip per pagina; parametri senza cast così
+            # last_ip prende il tipo della colonna
+            psycopg2.extras.execute_batch(cur, """
+                UPDATE user_tokens
+                SET request_count = COALESCE(request_count, 0) + %s,
+                    last_used = GREATEST(last_used, %s),
+                    last_ip = COALESCE(%s, last_ip)
+                WHERE token_id = %s
+            """, [(requests, last_used, last_ip, token_id) for token_id, requests, last_used, last_ip in rows],
+                page_size=500)
+        conn.commit()
+        return True
+    except Exception as e:
+        logging.error(f"Errore scrittura utilizzo token ({len(rows)} token): {e}")
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        return False
+    finally:
+        conn.close()
+
+
+_limiter = TokenRateLimiter(TOKEN_RATE_LIMIT_CONFIG)
+
+
+def check_token_rate_limit(token_id, limit_per_hour, ip=None):
+    return _limiter.hit(token_id, limit_per_hour, ip)
+
+
+def forget_token_bucket(token_id=None):
+    _limiter.forget(token_id)
+
+
+def rate_limit_headers(info):
+    """Header X-RateLimit-* (e Retry-After se la richiesta è rifiutata)"""
+    headers = {
+        'X-RateLimit-Limit': str(info['limit']),
+        'X-RateLimit-Remaining': str(info['remaining']),
+        'X-RateLimit-Reset': str(info['reset']),
+    }
+    if info['retry_after']:
+        headers['Retry-After'] = str(info['retry_after'])
+    return headers
+
+
+def get_token_rate_limit_stats():
+    return _limiter.get_stats()
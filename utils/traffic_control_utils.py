@@ -5,8 +5,12 @@
 
 from datetime import datetime, date, timedelta, timezone
 from functools import wraps
-from flask import session, request, jsonify
-from utils.db import execute_query
+from flask import session, request, jsonify, make_response, g
+from utils.db import execute_query, get_db_connection
+from utils.traffic_quota import create_quota_backend
+import psycopg2.extras
+import os
+import atexit
 import logging
 import hashlib
 import threading
@@ -21,11 +25,8 @@ class DownloadDeduplicator:
     """Gestisce deduplicazione download per evitare conteggi multipli"""
     
     def __init__(self):
-        self.active_downloads = {}  # request_hash -> timestamp
-        self.lock = threading.RLock()
-        self.cleanup_interval = 300  # 5 minuti
+        # Stato condiviso nel backend quota (per processo, host o cluster)
         self.max_age = 30  # 30 secondi per considerare un download "duplicato"
-        self.last_cleanup = time.time()
     
     def generate_request_hash(self, user_id, func_name, args, kwargs):
         """Genera hash univoco per la richiesta corrente"""
@@ -37,6 +38,8 @@ class DownloadDeduplicator:
                 request.method,
                 request.path,
                 request.query_string.decode('utf-8', errors='ignore'),
+                # Range diversi sullo stesso file (seek video, resume) non sono duplicati
+                request.headers.get('Range', ''),
                 str(sorted(request.form.items()) if request.form else ''),
             ]
             
@@ -53,74 +56,240 @@ class DownloadDeduplicator:
             return f"fallback_{int(time.time() * 1000)}"
     
     def is_duplicate_download(self, request_hash):
-        """Verifica se è un download duplicato recente"""
-        with self.lock:
-            now = time.time()
-            
-            # Cleanup periodico
-            if now - self.last_cleanup > self.cleanup_interval:
-                self._cleanup_old_entries(now)
-            
-            # Controlla se esiste un download recente con lo stesso hash
-            if request_hash in self.active_downloads:
-                age = now - self.active_downloads[request_hash]
-                if age < self.max_age:
-                    logging.warning(f"🚫 Download duplicato rilevato: {request_hash} (età: {age:.1f}s)")
-                    return True
-                else:
-                    # Troppo vecchio, rimuovi e permetti
-                    del self.active_downloads[request_hash]
-            
-            # Registra nuovo download
-            self.active_downloads[request_hash] = now
+        """Verifica se è un download duplicato recente (e altrimenti lo registra)"""
+        if get_quota_backend().claim_download(request_hash, self.max_age):
             logging.debug(f"✅ Download registrato: {request_hash}")
             return False
+        logging.warning(f"🚫 Download duplicato rilevato: {request_hash}")
+        return True
     
     def complete_download(self, request_hash):
         """Marca download come completato"""
-        with self.lock:
-            if request_hash in self.active_downloads:
-                del self.active_downloads[request_hash]
-                logging.debug(f"🏁 Download completato: {request_hash}")
+        get_quota_backend().release_download(request_hash)
+        logging.debug(f"🏁 Download completato: {request_hash}")
     
-    def _cleanup_old_entries(self, now):
-        """Rimuove entry vecchie dalla cache"""
-        old_count = len(self.active_downloads)
-        
-        # Rimuovi entry più vecchie di 10 minuti
-        max_age_cleanup = 600
-        to_remove = [
-            hash_key for hash_key, timestamp in self.active_downloads.items()
-            if now - timestamp > max_age_cleanup
-        ]
-        
-        for hash_key in to_remove:
-            del self.active_downloads[hash_key]
-        
-        self.last_cleanup = now
-        
-        if to_remove:
-            logging.info(f"🧹 Cleanup deduplicator: {len(to_remove)} entry rimosse (erano {old_count}, ora {len(self.active_downloads)})")
+    def clear(self):
+        """Svuota la deduplica, restituisce le voci rimosse"""
+        return get_quota_backend().clear_downloads()
     
     def get_stats(self):
         """Statistiche deduplicator per debug"""
-        with self.lock:
-            return {
-                'active_downloads': len(self.active_downloads),
-                'last_cleanup': self.last_cleanup,
-                'oldest_entry': min(self.active_downloads.values()) if self.active_downloads else None
-            }
+        stats = get_quota_backend().get_stats()
+        return {
+            'backend': stats['backend'],
+            'active_downloads': stats.get('active_downloads'),
+            'max_age': self.max_age
+        }
 
 # Istanza globale deduplicator
 download_deduplicator = DownloadDeduplicator()
 
+# ===================================================================
+# LEDGER TRAFFICO IN MEMORIA (WRITE-BEHIND)
+# ===================================================================
+# I contatori di oggi (UTC) per utente stanno nel backend quota
+# (utils/traffic_quota.py: memoria, SQLite condiviso o PostgreSQL) con
+# check-and-reserve atomico; le righe di user_traffic_log dei download
+# vengono scritte a lotti da un thread. Limite e ruolo admin per utente
+# sono in cache per profile_ttl secondi.
+
+TRAFFIC_LEDGER_CONFIG = {
+    'flush_interval': float(os.getenv('TRAFFIC_FLUSH_INTERVAL', 5)),
+    'flush_batch': int(os.getenv('TRAFFIC_FLUSH_BATCH', 500)),
+    # Cache di limite e ruolo admin per utente
+    'profile_ttl': float(os.getenv('TRAFFIC_PROFILE_TTL', 60)),
+    # Righe trattenute se il DB non è raggiungibile
+    'max_pending': int(os.getenv('TRAFFIC_MAX_PENDING', 100000)),
+}
+
+def _utc_today():
+    return datetime.now(timezone.utc).date()
+
+class TrafficLedger:
+    """Coda di scrittura su user_traffic_log + cache dei profili utente"""
+    
+    def __init__(self, config):
+        self.config = config
+        self.lock = threading.Lock()
+        self.profiles = {}    # user_id -> (scadenza, limit_mb, is_admin)
+        self.pending = []     # righe user_traffic_log da scrivere
+        self.flushing = []    # righe in scrittura in questo momento
+        self.wake = threading.Event()
+        # Tenuto per tutta la scrittura su DB: i seed del backend quota lo
+        # prendono per leggere DB e righe non scritte in modo coerente
+        self.flush_lock = threading.Lock()
+        self.flusher = None
+        self.pid = None
+        self.stats = {'flushes': 0, 'flushed_rows': 0, 'flush_errors': 0, 'dropped_rows': 0}
+    
+    # ---------- profilo utente ----------
+    
+    def get_profile(self, user_id):
+        """(limit_mb, is_admin) dalla cache o dal DB"""
+        now = time.time()
+        entry = self.profiles.get(user_id)
+        if entry and entry[0] > now:
+            return entry[1], entry[2]
+        limit_mb = get_user_traffic_limit(user_id)
+        is_admin = is_admin_user(user_id)
+        self.profiles[user_id] = (now + self.config['profile_ttl'], limit_mb, is_admin)
+        return limit_mb, is_admin
+    
+    def invalidate_profile(self, user_id=None):
+        if user_id is None:
+            self.profiles.clear()
+        else:
+            self.profiles.pop(user_id, None)
+    
+    # ---------- log download ----------
+    
+    def log(self, user_id, bytes_downloaded, download_info=None):
+        """Accoda la riga di user_traffic_log, scritta al prossimo flush"""
+        now = datetime.now(timezone.utc)
+        with self.lock:
+            self.pending.append((
+                user_id,
+                now.date(),
+                bytes_downloaded,
+                now,
+                str(download_info) if download_info else None
+            ))
+            if len(self.pending) >= self.config['flush_batch']:
+                self.wake.set()
+        self._ensure_flusher()
+    
+    def unflushed(self, user_id, day):
+        """(byte, numero) dei download di user_id in day non ancora su DB"""
+        with self.lock:
+            rows = [row for row in self.flushing + self.pending if row[0] == user_id and row[1] == day]
+        return sum(row[2] for row in rows), len(rows)
+    
+    # ---------- write-behind ----------
+    
+    def _ensure_flusher(self):
+        pid = os.getpid()
+        if self.pid == pid and self.flusher and self.flusher.is_alive():
+            return
+        with self.lock:
+            if self.pid == pid and self.flusher and self.flusher.is_alive():
+                return
+            if self.pid is None:
+                atexit.register(self.flush)
+            self.pid = pid
+            self.flusher = threading.Thread(target=self._run, name='traffic-ledger', daemon=True)
+            self.flusher.start()
+    
+    def _run(self):
+        while True:
+            self.wake.wait(self.config['flush_interval'])
+            self.wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Errore flush ledger traffico: {e}")
+    
+    def flush(self):
+        """Scrive le righe in coda su user_traffic_log in un'unica INSERT"""
+        with self.flush_lock:
+            with self.lock:
+                if not self.pending:
+                    return 0
+                rows, self.pending = self.pending, []
+                self.flushing = rows
+        
+            written = _insert_traffic_rows(rows)
+        
+            with self.lock:
+                self.flushing = []
+                if written:
+                    self.stats['flushes'] += 1
+                    self.stats['flushed_rows'] += len(rows)
+                else:
+                    # Riprova al prossimo giro, tenendo al massimo max_pending righe
+                    self.stats['flush_errors'] += 1
+                    self.pending = rows + self.pending
+                    overflow = len(self.pending) - self.config['max_pending']
+                    if overflow > 0:
+                        self.stats['dropped_rows'] += overflow
+                        self.pending = self.pending[overflow:]
+            return len(rows) if written else 0
+    
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['pending_rows'] = len(self.pending)
+        stats['quota'] = get_quota_backend().get_stats()
+        return stats
+
+def _query_daily_usage(user_id, target_date):
+    """SUM del giorno da user_traffic_log, None se il DB non risponde"""
+    query = """
+    SELECT 
+        COALESCE(SUM(bytes_downloaded), 0) as total_bytes,
+        COUNT(*) as download_count
+    FROM user_traffic_log 
+    WHERE user_id = %s AND download_date = %s
+    """
+    result = execute_query(query, (user_id, target_date), fetch=True)
+    if result is None:
+        return None
+    if not result:
+        return {'bytes_downloaded': 0, 'download_count': 0}
+    return {
+        'bytes_downloaded': int(result[0]['total_bytes']),
+        'download_count': int(result[0]['download_count'])
+    }
+
+def _insert_traffic_rows(rows):
+    conn = get_db_connection()
+    if not conn:
+        return False
+    try:
+        with conn.cursor() as cur:
+            psycopg2.extras.execute_values(cur, """
+                INSERT INTO user_traffic_log 
+                (user_id, download_date, bytes_downloaded, download_timestamp, download_info)
+                VALUES %s
+            """, rows, page_size=TRAFFIC_LEDGER_CONFIG['flush_batch'])
+        conn.commit()
+        logging.debug(f"📊 Ledger traffico: {len(rows)} righe scritte")
+        return True
+    except Exception as e:
+        logging.error(f"Errore scrittura ledger traffico ({len(rows)} righe): {e}")
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        return False
+    finally:
+        conn.close()
+
+# Istanze globali: ledger e backend quota
+traffic_ledger = TrafficLedger(TRAFFIC_LEDGER_CONFIG)
+quota_backend = create_quota_backend(
+    _query_daily_usage, unflushed=traffic_ledger.unflushed, flush_lock=traffic_ledger.flush_lock
+)
+
+def get_quota_backend():
+    return quota_backend
+
+def invalidate_traffic_profile(user_id=None):
+    """Da chiamare quando cambiano limite traffico o ruoli di un utente"""
+    traffic_ledger.invalidate_profile(user_id)
+
+def get_traffic_ledger_stats():
+    return traffic_ledger.get_stats()
+
 # ===================================================================
 # FUNZIONI CORE (IMMUTATE)
 # ===================================================================
 
 def get_current_user_id():
-    """Recupera user_id dalla sessione corrente"""
-    return session.get('user_id')
+    """Recupera user_id dalla sessione corrente o dal token API della richiesta"""
+    if 'user_id' in session:
+        return session['user_id']
+    token = g.get('api_token')
+    return token['user_id'] if token else None
 
 def get_user_traffic_limit(user_id):
     """Recupera limite traffico giornaliero utente (0 = illimitato)"""
@@ -142,66 +311,47 @@ def get_user_traffic_limit(user_id):
         return 50
 
 def get_user_daily_usage(user_id, target_date=None):
-    """Recupera utilizzo traffico giornaliero utente"""
+    """Recupera utilizzo traffico giornaliero utente (oggi UTC: dal backend quota)"""
     if not user_id:
         return {'bytes_downloaded': 0, 'download_count': 0}
     
     if target_date is None:
-        target_date = date.today()
+        target_date = _utc_today()
     
     try:
-        query = """
-        SELECT 
-            COALESCE(SUM(bytes_downloaded), 0) as total_bytes,
-            COUNT(*) as download_count
-        FROM user_traffic_log 
-        WHERE user_id = %s AND download_date = %s
-        """
-        result = execute_query(query, (user_id, target_date), fetch=True)
+        if target_date == _utc_today():
+            return quota_backend.get_usage(user_id, target_date)
         
-        if result and len(result) > 0:
-            return {
-                'bytes_downloaded': int(result[0]['total_bytes']),
-                'download_count': int(result[0]['download_count'])
-            }
-        else:
-            return {'bytes_downloaded': 0, 'download_count': 0}
+        usage = _query_daily_usage(user_id, target_date)
+        return usage if usage is not None else {'bytes_downloaded': 0, 'download_count': 0}
             
     except Exception as e:
         logging.error(f"Errore recupero utilizzo utente {user_id}: {e}")
         return {'bytes_downloaded': 0, 'download_count': 0}
 
-def update_user_traffic_usage(user_id, bytes_downloaded, download_info=None):
-    """Aggiorna utilizzo traffico utente nel database"""
-    if not user_id or bytes_downloaded <= 0:
+def update_user_traffic_usage(user_id, bytes_downloaded, download_info=None, reservation=None):
+    """
+    Registra i byte effettivi di un download: conguaglio dei contatori
+    (reservation = (giorno, byte riservati) da reserve_traffic) e riga
+    di user_traffic_log in write-behind
+    """
+    if not user_id or (bytes_downloaded <= 0 and reservation is None):
         return True
     
     try:
-        # Inserisci record traffico
-        query = """
-        INSERT INTO user_traffic_log 
-        (user_id, download_date, bytes_downloaded, download_timestamp, download_info)
-        VALUES (%s, %s, %s, %s, %s)
-        """
-        
-        now = datetime.now(timezone.utc)
-        download_info_json = str(download_info) if download_info else None
-        
-        result = execute_query(query, (
-            user_id, 
-            now.date(), 
-            bytes_downloaded, 
-            now,
-            download_info_json
-        ))
+        def record():
+            if bytes_downloaded > 0:
+                traffic_ledger.log(user_id, bytes_downloaded, download_info)
         
-        if result:
-            mb_added = bytes_downloaded / (1024 * 1024)
-            logging.info(f"📊 Traffico aggiornato user {user_id}: +{mb_added:.2f} MB")
-            return True
+        if reservation is not None:
+            day, reserved_bytes = reservation
+            quota_backend.settle(user_id, day, bytes_downloaded, reserved_bytes, record=record)
         else:
-            logging.error(f"Errore aggiornamento traffico user {user_id}")
-            return False
+            quota_backend.settle(user_id, _utc_today(), bytes_downloaded, record=record)
+        
+        mb_added = bytes_downloaded / (1024 * 1024)
+        logging.info(f"📊 Traffico aggiornato user {user_id}: +{mb_added:.2f} MB")
+        return True
             
     except Exception as e:
         logging.error(f"Errore update traffico user {user_id}: {e}")
@@ -233,22 +383,17 @@ def check_traffic_limit(user_id, additional_bytes):
         return True, None, {'bytes_downloaded': 0, 'download_count': 0}
     
     try:
-        limit_mb = get_user_traffic_limit(user_id)
+        limit_mb, _ = traffic_ledger.get_profile(user_id)
         
         if limit_mb == 0:
             current_usage = get_user_daily_usage(user_id)
             return True, None, current_usage
         
         current_usage = get_user_daily_usage(user_id)
-        current_bytes = current_usage['bytes_downloaded']
         limit_bytes = limit_mb * 1024 * 1024
         
-        if (current_bytes + additional_bytes) > limit_bytes:
-            remaining_mb = max(0, (limit_bytes - current_bytes) / (1024 * 1024))
-            request_mb = additional_bytes / (1024 * 1024)
-            
-            error_msg = f"Limite traffico superato. Disponibili: {remaining_mb:.1f} MB, Richiesti: {request_mb:.1f} MB"
-            return False, error_msg, current_usage
+        if (current_usage['bytes_downloaded'] + additional_bytes) > limit_bytes:
+            return False, _limit_message(current_usage, limit_bytes, additional_bytes), current_usage
         
         return True, None, current_usage
         
@@ -256,6 +401,97 @@ def check_traffic_limit(user_id, additional_bytes):
         logging.error(f"Errore check traffic limit user {user_id}: {e}")
         return True, None, {'bytes_downloaded': 0, 'download_count': 0}
 
+def _limit_message(current_usage, limit_bytes, additional_bytes):
+    remaining_mb = max(0, (limit_bytes - current_usage['bytes_downloaded']) / (1024 * 1024))
+    request_mb = additional_bytes / (1024 * 1024)
+    return f"Limite traffico superato. Disponibili: {remaining_mb:.1f} MB, Richiesti: {request_mb:.1f} MB"
+
+def reserve_traffic(user_id, additional_bytes, limit_mb):
+    """
+    Check-and-reserve atomico sul backend quota: la stima viene
+    addebitata subito solo se rientra nel limite (limit_mb None o 0 =
+    nessun limite), così due worker non possono superarlo insieme.
+    Restituisce (ok, errore, utilizzo, prenotazione) - la prenotazione
+    (giorno, byte) va conguagliata con update_user_traffic_usage.
+    """
+    if not user_id:
+        return True, None, {'bytes_downloaded': 0, 'download_count': 0}, None
+    
+    day = _utc_today()
+    limit_bytes = limit_mb * 1024 * 1024 if limit_mb else None
+    try:
+        ok, current_usage = quota_backend.reserve(user_id, day, additional_bytes, limit_bytes)
+    except Exception as e:
+        logging.error(f"Errore reserve traffico user {user_id}: {e}")
+        # Fail-safe come check_traffic_limit: il download è addebitato a consuntivo
+        return True, None, {'bytes_downloaded': 0, 'download_count': 0}, None
+    
+    if not ok:
+        return False, _limit_message(current_usage, limit_bytes, additional_bytes), current_usage, None
+    return True, None, current_usage, (day, additional_bytes)
+
+# ===================================================================
+# CONTEGGIO BYTE EFFETTIVI
+# ===================================================================
+
+class CountingBody:
+    """
+    Body di una risposta in streaming che conta i byte effettivamente
+    prodotti e li registra alla chiusura (fine stream o client disconnesso)
+    """
+    
+    def __init__(self, body, on_close):
+        self.body = body
+        self.bytes_sent = 0
+        self.completed = False
+        self._on_close = on_close
+        self._closed = False
+    
+    def __iter__(self):
+        for chunk in self.body:
+            self.bytes_sent += len(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+            yield chunk
+        self.completed = True
+    
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            close = getattr(self.body, 'close', None)
+            if close:
+                close()
+        finally:
+            self._on_close(self)
+
+def charge_response(response, user_id, download_info, reservation=None):
+    """
+    Addebita i byte reali della risposta: subito se il body è già in
+    memoria, alla chiusura dello stream per le risposte in streaming
+    (totale parziale se il client interrompe il download).
+    La prenotazione fatta all'ammissione viene conguagliata.
+    """
+    response = make_response(response)
+    
+    def record(bytes_sent, completed):
+        info = dict(download_info, actual_bytes=bytes_sent, completed=completed)
+        update_user_traffic_usage(user_id, bytes_sent, info, reservation)
+        logging.info(
+            f"✅ DOWNLOAD {'COMPLETE' if completed else 'INTERROTTO'}: user={user_id}, "
+            f"func={download_info.get('function')}, hash={download_info.get('request_hash')}, "
+            f"bytes={bytes_sent} (stimati {download_info.get('estimated_bytes')})"
+        )
+    
+    if response.is_streamed:
+        response.response = CountingBody(
+            response.response,
+            lambda body: record(body.bytes_sent, body.completed)
+        )
+    else:
+        record(response.calculate_content_length() or 0, True)
+    
+    return response
+
 # ===================================================================
 # DECORATORE AGGIORNATO CON DEDUPLICAZIONE
 # ===================================================================
@@ -270,13 +506,20 @@ def traffic_control(calculate_size_func=None):
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
+            # Download annidati (unified_download -> stream_*): addebita
+            # solo il decoratore più esterno, gli interni passano diretti
+            if g.get('traffic_control_active'):
+                return func(*args, **kwargs)
+            g.traffic_control_active = True
+            
             user_id = get_current_user_id()
-            is_admin = is_admin_user(user_id)
+            limit_mb, is_admin = traffic_ledger.get_profile(user_id) if user_id else (50, False)
             
             # Genera hash per deduplicazione
             request_hash = download_deduplicator.generate_request_hash(
                 user_id, func.__name__, args, kwargs
             )
+            reservation = None
             
             try:
                 # ✅ STEP 1: Controllo deduplicazione
@@ -296,16 +539,16 @@ def traffic_control(calculate_size_func=None):
                 else:
                     estimated_bytes = estimate_download_size(*args, **kwargs)
                 
-                # ✅ STEP 3: Controllo limiti (solo per utenti non admin)
+                # ✅ STEP 3: Check-and-reserve sul backend quota (limite solo per utenti non admin)
+                can_download, error_msg, current_usage, reservation = reserve_traffic(
+                    user_id, estimated_bytes, None if is_admin else limit_mb
+                )
                 if not is_admin:
-                    can_download, error_msg, current_usage = check_traffic_limit(user_id, estimated_bytes)
-                    
                     if not can_download:
                         # Rimuovi dalla cache deduplicazione (non era un download reale)
                         download_deduplicator.complete_download(request_hash)
                         
                         usage_mb = current_usage['bytes_downloaded'] / (1024 * 1024)
-                        limit_mb = get_user_traffic_limit(user_id)
                         
                         return jsonify({
                             'error': 'traffic_limit_exceeded',
@@ -323,7 +566,7 @@ def traffic_control(calculate_size_func=None):
                 
                 response = func(*args, **kwargs)
                 
-                # ✅ STEP 5: Tracking post-download per tutti
+                # ✅ STEP 5: Tracking dei byte reali per tutti (la stima serve solo all'ammissione)
                 try:
                     download_info = {
                         'function': func.__name__,
@@ -332,9 +575,8 @@ def traffic_control(calculate_size_func=None):
                         'is_admin': is_admin
                     }
                     
-                    update_user_traffic_usage(user_id, estimated_bytes, download_info)
-                    
-                    logging.info(f"✅ DOWNLOAD COMPLETE: user={user_id}, func={func.__name__}, hash={request_hash}, bytes={estimated_bytes}")
+                    response = charge_response(response, user_id, download_info, reservation)
+                    reservation = None
                     
                 except Exception as e:
                     logging.error(f"Errore aggiornamento traffico post-download: {e}")
@@ -346,8 +588,10 @@ def traffic_control(calculate_size_func=None):
                 
             except Exception as e:
                 logging.error(f"Errore traffic control: {e}")
-                # Cleanup in caso di errore
+                # Cleanup in caso di errore: la prenotazione non consumata torna disponibile
                 download_deduplicator.complete_download(request_hash)
+                if reservation is not None:
+                    update_user_traffic_usage(user_id, 0, reservation=reservation)
                 # Fail-safe: permetti download se il controllo fallisce
                 return func(*args, **kwargs)
                 
@@ -412,7 +656,7 @@ def get_user_traffic_status(user_id):
                 'is_unlimited': False
             }
         
-        limit_mb = get_user_traffic_limit(user_id)
+        limit_mb, _ = traffic_ledger.get_profile(user_id)
         usage = get_user_daily_usage(user_id)
         used_bytes = usage['bytes_downloaded']
         used_mb = used_bytes / (1024 * 1024)
@@ -459,13 +703,9 @@ def get_deduplicator_stats():
 
 def force_cleanup_deduplicator():
     """Forza cleanup deduplicator (per admin)"""
-    with download_deduplicator.lock:
-        old_count = len(download_deduplicator.active_downloads)
-        download_deduplicator.active_downloads.clear()
-        download_deduplicator.last_cleanup = time.time()
-        
-        logging.info(f"🧹 Deduplicator forzato cleanup: {old_count} entry rimosse")
-        return old_count
+    old_count = download_deduplicator.clear()
+    logging.info(f"🧹 Deduplicator forzato cleanup: {old_count} entry rimosse")
+    return old_count
 
 # ===================================================================
 # FUNZIONI SPECIFICHE PER STIMA DIMENSIONI (COMPATIBILITÀ API)
@@ -510,6 +750,28 @@ def estimate_minio_file_size(file_path):
         logging.error(f"Errore stima minio file {file_path}: {e}")
         return 1 * 1024 * 1024  # 1MB fallback
 
+def estimate_minio_range_size(file_path):
+    """
+    Byte che verranno davvero serviti: lunghezza del Range richiesto
+    (rispettando If-Range) o dimensione intera del file
+    """
+    try:
+        from utils.minio_client import get_minio_client, get_minio_bucket_name
+        from utils.minio_range import requested_range, RangeNotSatisfiable
+        
+        file_info = get_minio_client().stat_object(get_minio_bucket_name(), file_path)
+        try:
+            byte_range = requested_range(file_info.size, file_info.etag, file_info.last_modified)
+        except RangeNotSatisfiable:
+            return 0
+        if byte_range:
+            return byte_range[1] - byte_range[0] + 1
+        return file_info.size
+        
+    except Exception as e:
+        logging.error(f"Errore stima range minio file {file_path}: {e}")
+        return 1 * 1024 * 1024  # 1MB fallback
+
 def estimate_postgres_stream_size(query, params, filename_prefix, custom_header=''):
     """
     Stima dimensione stream PostgreSQL CSV
@@ -533,9 +795,9 @@ def estimate_postgres_stream_size(query, params, filename_prefix, custom_header=
 
 def estimate_minio_stream_size(file_path):
     """
-    Stima dimensione stream Minio file
+    Stima dimensione stream Minio file (solo il Range richiesto)
     """
-    return estimate_minio_file_size(file_path)
+    return estimate_minio_range_size(file_path)
 
 def estimate_zip_stream_size(file_paths, zip_name='files.zip'):
     """
@@ -586,7 +848,7 @@ def estimate_unified_download_size(*args, **kwargs):
             # File singolo
             file_path = request.args.get('file_path')
             if file_path:
-                return estimate_minio_file_size(file_path)
+                return estimate_minio_range_size(file_path)
             else:
                 return 5 * 1024 * 1024  # 5MB default
         
@@ -0,0 +1,632 @@
+# -*- coding: utf-8 -*-
+"""
+TRAFFIC QUOTA - BACKEND CONDIVISI PER DEDUPLICA E LIMITI TRAFFICO
+Con gunicorn a N worker lo stato in memoria (deduplica download, byte
+usati oggi) è per processo: ogni worker vede solo i propri download.
+Il backend si sceglie con TRAFFIC_QUOTA_BACKEND:
+- memory:   in-process (un solo worker o sviluppo)
+- sqlite:   file SQLite in WAL condiviso dai worker dello stesso host
+            (di default in /dev/shm, quindi in RAM)
+- postgres: tabelle traffic_quota_usage / traffic_dedup
+            (migrations/006_traffic_quota.sql), per più host
+Tutti offrono check-and-reserve atomico: la stima del download viene
+riservata solo se rientra nel limite, e alla fine dello stream la
+differenza con i byte reali viene conguagliata (settle).
+
+Benchmark contro il vecchio percorso (SUM su user_traffic_log + INSERT
+a ogni download):
+    python -m utils.traffic_quota --bench 2000
+Risultati (ms per download, 3 esecuzioni da 2000; PostgreSQL 16 locale
+su socket Unix, 1 vCPU, user_traffic_log con 200k righe e indice
+(user_id, download_date)):
+    memory      0.006 - 0.008
+    sqlite      0.090 - 0.097
+    postgres    1.21  - 1.46
+    legacy_sql  0.33  - 0.69
+Il backend postgres fa 4 transazioni con commit per download (claim,
+reserve, settle, release) mentre il percorso legacy del benchmark annulla
+la sua INSERT: serve per la correttezza tra più host, non per la velocità.
+Default memory (comportamento precedente e il più veloce); sqlite per più
+worker sullo stesso host.
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from contextlib import nullcontext
+from datetime import date, datetime, timezone
+
+from utils.db import get_db_connection, execute_query
+
+TRAFFIC_QUOTA_CONFIG = {
+    'backend': os.getenv('TRAFFIC_QUOTA_BACKEND', 'memory').lower(),
+    'sqlite_path': os.getenv(
+        'TRAFFIC_QUOTA_SQLITE_PATH',
+        os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'mercurio_traffic.db')
+    ),
+    # Riallineamento con il DB del backend in memoria
+    'resync_interval': float(os.getenv('TRAFFIC_RESYNC_INTERVAL', 60)),
+    # Ogni quanto eliminare deduplica scadute e giorni vecchi
+    'cleanup_interval': 300,
+}
+
+# Classe degli advisory lock Postgres usati per il seed dei contatori
+_ADVISORY_CLASS = 0x7471
+
+def _usage(bytes_used, count):
+    return {'bytes_downloaded': int(bytes_used), 'download_count': int(count)}
+
+
+class QuotaBackend(ABC):
+    """
+    Interfaccia comune. seed_usage(user_id, day) restituisce l'utilizzo
+    già registrato su user_traffic_log (o None se il DB non risponde) e
+    serve a inizializzare i contatori del giorno.
+    """
+
+    name = 'base'
+
+    def __init__(self, seed_usage):
+        self.seed_usage = seed_usage
+
+    @abstractmethod
+    def claim_download(self, request_hash, ttl):
+        """True se la richiesta non è un duplicato recente (e la registra)"""
+
+    @abstractmethod
+    def release_download(self, request_hash):
+        pass
+
+    @abstractmethod
+    def clear_downloads(self):
+        """Svuota la deduplica, restituisce le voci rimosse"""
+
+    @abstractmethod
+    def reserve(self, user_id, day, nbytes, limit_bytes=None):
+        """
+        Riserva nbytes (e un download) se l'utilizzo resta entro
+        limit_bytes (None = nessun limite): (ok, utilizzo dopo/attuale)
+        """
+
+    @abstractmethod
+    def settle(self, user_id, day, actual_bytes, reserved_bytes=None, record=None):
+        """
+        Conguaglio a fine download tra byte riservati e byte effettivi.
+        reserved_bytes None: addebito senza reserve precedente (+1 download).
+        Un download riservato che non ha inviato nulla non conta.
+        record(): registra la riga di log del download, chiamata insieme
+        al conguaglio (il backend in memoria la fa atomica col conguaglio).
+        """
+
+    @abstractmethod
+    def get_usage(self, user_id, day):
+        pass
+
+    def get_stats(self):
+        return {'backend': self.name}
+
+
+# =================================================================
+# IN-PROCESS
+# =================================================================
+
+class MemoryQuotaBackend(QuotaBackend):
+    """
+    Contatori in memoria del processo. unflushed(user_id, day) -> (byte, n)
+    dei download registrati ma non ancora scritti su DB (write-behind):
+    servono al riallineamento periodico. flush_lock è il lock che il
+    write-behind tiene mentre sposta righe sul DB: il seed lo tiene a sua
+    volta, così DB e righe non scritte sono letti in un taglio coerente
+    (nessuna riga contata due volte o persa tra le due letture).
+    """
+
+    name = 'memory'
+
+    def __init__(self, seed_usage, unflushed=None, resync_interval=60, flush_lock=None):
+        super().__init__(seed_usage)
+        self.unflushed = unflushed
+        self.flush_lock = flush_lock
+        self.resync_interval = resync_interval
+        self.lock = threading.Lock()
+        self.usage = {}              # (user_id, day) -> contatori, download in corso, ultimo sync
+        self.active_downloads = {}   # request_hash -> scadenza
+        self.last_cleanup = time.time()
+        self.seeds = 0
+
+    # ---------- deduplica ----------
+
+    def claim_download(self, request_hash, ttl):
+        with self.lock:
+            now = time.time()
+            if now - self.last_cleanup > TRAFFIC_QUOTA_CONFIG['cleanup_interval']:
+                self._cleanup(now)
+            expires = self.active_downloads.get(request_hash)
+            if expires is not None and expires > now:
+                return False
+            self.active_downloads[request_hash] = now + ttl
+            return True
+
+    def release_download(self, request_hash):
+        with self.lock:
+            self.active_downloads.pop(request_hash, None)
+
+    def clear_downloads(self):
+        with self.lock:
+            count = len(self.active_downloads)
+            self.active_downloads.clear()
+            self.last_cleanup = time.time()
+            return count
+
+    def _cleanup(self, now):
+        expired = [key for key, expires in self.active_downloads.items() if expires <= now]
+        for key in expired:
+            del self.active_downloads[key]
+        # Contatori dei giorni precedenti
+        today = datetime.now(timezone.utc).date()
+        for key in [key for key in self.usage if (today - key[1]).days > 1]:
+            del self.usage[key]
+        self.last_cleanup = now
+        if expired:
+            logging.info(f"🧹 Cleanup deduplicator: {len(expired)} entry rimosse")
+
+    # ---------- contatori ----------
+
+    def _entry(self, user_id, day):
+        """Contatori di (user_id, day), dal DB al primo accesso e a ogni resync"""
+        with self.lock:
+            entry = self.usage.get((user_id, day))
+            if entry and time.time() - entry['synced_at'] < self.resync_interval:
+                return entry
+
+        with self.flush_lock or nullcontext():
+            stored = self.seed_usage(user_id, day)
+
+            with self.lock:
+                entry = self.usage.get((user_id, day))
+                if stored is None:
+                    # DB non raggiungibile: resta il valore in memoria
+                    if entry is None:
+                        entry = {'bytes': 0, 'count': 0, 'inflight': 0, 'inflight_count': 0, 'synced_at': 0}
+                        self.usage[(user_id, day)] = entry
+                    return entry
+
+                inflight = entry['inflight'] if entry else 0
+                inflight_count = entry['inflight_count'] if entry else 0
+                pending_bytes, pending_count = self.unflushed(user_id, day) if self.unflushed else (0, 0)
+                fresh = {
+                    'bytes': stored['bytes_downloaded'] + pending_bytes + inflight,
+                    'count': stored['download_count'] + pending_count + inflight_count,
+                    'inflight': inflight,
+                    'inflight_count': inflight_count,
+                    'synced_at': time.time(),
+                }
+                if entry:
+                    entry.update(fresh)
+                else:
+                    entry = self.usage[(user_id, day)] = fresh
+                self.seeds += 1
+                return entry
+
+    def reserve(self, user_id, day, nbytes, limit_bytes=None):
+        entry = self._entry(user_id, day)
+        with self.lock:
+            if limit_bytes is not None and entry['bytes'] + nbytes > limit_bytes:
+                return False, _usage(entry['bytes'], entry['count'])
+            entry['bytes'] += nbytes
+            entry['count'] += 1
+            entry['inflight'] += nbytes
+            entry['inflight_count'] += 1
+            return True, _usage(entry['bytes'], entry['count'])
+
+    def settle(self, user_id, day, actual_bytes, reserved_bytes=None, record=None):
+        with self.lock:
+            # Riga di log e fine del download in corso nello stesso istante:
+            # un seed non può vederli entrambi (o nessuno dei due)
+            if record:
+                record()
+            entry = self.usage.get((user_id, day))
+            if entry is None:
+                # Contatori non ancora letti: il download arriverà dal DB al seed
+                return
+            if reserved_bytes is None:
+                entry['bytes'] += actual_bytes
+                entry['count'] += 1
+                return
+            entry['bytes'] = max(0, entry['bytes'] + actual_bytes - reserved_bytes)
+            if actual_bytes <= 0:
+                entry['count'] = max(0, entry['count'] - 1)
+            # Il download non è più in corso: ora è una riga di log (unflushed)
+            entry['inflight'] = max(0, entry['inflight'] - reserved_bytes)
+            entry['inflight_count'] = max(0, entry['inflight_count'] - 1)
+
+    def get_usage(self, user_id, day):
+        entry = self._entry(user_id, day)
+        return _usage(entry['bytes'], entry['count'])
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'backend': self.name,
+                'users': len(self.usage),
+                'active_downloads': len(self.active_downloads),
+                'seeds': self.seeds,
+            }
+
+
+# =================================================================
+# SQLITE WAL (WORKER DELLO STESSO HOST)
+# =================================================================
+
+class SqliteQuotaBackend(QuotaBackend):
+    """
+    Stato condiviso in un file SQLite in modalità WAL: ogni operazione è
+    una transazione IMMEDIATE (lock di scrittura), quindi check-and-reserve
+    è atomico tra i processi. Una connessione per thread e per processo.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, seed_usage, path):
+        super().__init__(seed_usage)
+        self.path = path
+        self._local = threading.local()
+        self._last_cleanup = 0
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS traffic_dedup (
+                request_hash TEXT PRIMARY KEY,
+                expires_at   REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS traffic_usage (
+                user_id        INTEGER NOT NULL,
+                usage_date     TEXT    NOT NULL,
+                bytes_used     INTEGER NOT NULL,
+                download_count INTEGER NOT NULL,
+                PRIMARY KEY (user_id, usage_date)
+            );
+        """)
+        self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _transaction(self, work):
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = work(conn)
+            conn.execute('COMMIT')
+            return result
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _maybe_cleanup(self, conn, now):
+        if now - self._last_cleanup < TRAFFIC_QUOTA_CONFIG['cleanup_interval']:
+            return
+        self._last_cleanup = now
+        conn.execute('DELETE FROM traffic_dedup WHERE expires_at <= ?', (now,))
+        conn.execute("DELETE FROM traffic_usage WHERE usage_date < date('now', '-2 day')")
+
+    # ---------- deduplica ----------
+
+    def claim_download(self, request_hash, ttl):
+        def work(conn):
+            now = time.time()
+            self._maybe_cleanup(conn, now)
+            cursor = conn.execute("""
+                INSERT INTO traffic_dedup (request_hash, expires_at) VALUES (?, ?)
+                ON CONFLICT (request_hash) DO UPDATE SET expires_at = excluded.expires_at
+                WHERE traffic_dedup.expires_at <= ?
+            """, (request_hash, now + ttl, now))
+            return cursor.rowcount == 1
+        return self._transaction(work)
+
+    def release_download(self, request_hash):
+        self._conn().execute('DELETE FROM traffic_dedup WHERE request_hash = ?', (request_hash,))
+
+    def clear_downloads(self):
+        return self._conn().execute('DELETE FROM traffic_dedup').rowcount
+
+    # ---------- contatori ----------
+
+    def _ensure_seeded(self, user_id, day):
+        """Riga del giorno, inizializzata da user_traffic_log la prima volta"""
+        conn = self._conn()
+        key = (user_id, day.isoformat())
+        if conn.execute('SELECT 1 FROM traffic_usage WHERE user_id = ? AND usage_date = ?', key).fetchone():
+            return True
+        stored = self.seed_usage(user_id, day)
+        if stored is None:
+            return False
+        conn.execute(
+            'INSERT OR IGNORE INTO traffic_usage VALUES (?, ?, ?, ?)',
+            key + (stored['bytes_downloaded'], stored['download_count'])
+        )
+        return True
+
+    def reserve(self, user_id, day, nbytes, limit_bytes=None):
+        if not self._ensure_seeded(user_id, day):
+            # DB non raggiungibile: fail-open come il controllo originale
+            return True, _usage(0, 0)
+        key = (user_id, day.isoformat())
+
+        def work(conn):
+            bytes_used, count = conn.execute(
+                'SELECT bytes_used, download_count FROM traffic_usage WHERE user_id = ? AND usage_date = ?', key
+            ).fetchone()
+            if limit_bytes is not None and bytes_used + nbytes > limit_bytes:
+                return False, _usage(bytes_used, count)
+            conn.execute("""
+                UPDATE traffic_usage SET bytes_used = bytes_used + ?, download_count = download_count + 1
+                WHERE user_id = ? AND usage_date = ?
+            """, (nbytes,) + key)
+            return True, _usage(bytes_used + nbytes, count + 1)
+        return self._transaction(work)
+
+    def settle(self, user_id, day, actual_bytes, reserved_bytes=None, record=None):
+        if record:
+            record()
+        if reserved_bytes is None:
+            delta_bytes, delta_count = actual_bytes, 1
+        else:
+            delta_bytes, delta_count = actual_bytes - reserved_bytes, (-1 if actual_bytes <= 0 else 0)
+        self._conn().execute("""
+            UPDATE traffic_usage
+            SET bytes_used = MAX(0, bytes_used + ?), download_count = MAX(0, download_count + ?)
+            WHERE user_id = ? AND usage_date = ?
+        """, (delta_bytes, delta_count, user_id, day.isoformat()))
+
+    def get_usage(self, user_id, day):
+        if not self._ensure_seeded(user_id, day):
+            return _usage(0, 0)
+        row = self._conn().execute(
+            'SELECT bytes_used, download_count FROM traffic_usage WHERE user_id = ? AND usage_date = ?',
+            (user_id, day.isoformat())
+        ).fetchone()
+        return _usage(*row) if row else _usage(0, 0)
+
+    def get_stats(self):
+        conn = self._conn()
+        return {
+            'backend': self.name,
+            'path': self.path,
+            'users': conn.execute('SELECT COUNT(*) FROM traffic_usage').fetchone()[0],
+            'active_downloads': conn.execute(
+                'SELECT COUNT(*) FROM traffic_dedup WHERE expires_at > ?', (time.time(),)
+            ).fetchone()[0],
+        }
+
+
+# =================================================================
+# POSTGRESQL (PIÙ HOST)
+# =================================================================
+
+class PostgresQuotaBackend(QuotaBackend):
+    """
+    Contatori in traffic_quota_usage aggiornati con UPDATE condizionale
+    (atomico sulla riga); il seed della riga del giorno da user_traffic_log
+    è serializzato per utente da un advisory lock di transazione.
+    Deduplica in traffic_dedup con INSERT ... ON CONFLICT condizionale.
+    """
+
+    name = 'postgres'
+
+    def __init__(self, seed_usage):
+        super().__init__(seed_usage)
+        self._last_cleanup = 0
+
+    def _run(self, work):
+        conn = get_db_connection()
+        if not conn:
+            raise RuntimeError("Database non disponibile per il backend traffico")
+        try:
+            with conn.cursor() as cur:
+                result = work(cur)
+            conn.commit()
+            return result
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    # ---------- deduplica ----------
+
+    def claim_download(self, request_hash, ttl):
+        def work(cur):
+            now = time.time()
+            if now - self._last_cleanup > TRAFFIC_QUOTA_CONFIG['cleanup_interval']:
+                self._last_cleanup = now
+                cur.execute("DELETE FROM traffic_dedup WHERE expires_at <= now()")
+                cur.execute("DELETE FROM traffic_quota_usage WHERE usage_date < CURRENT_DATE - 2")
+            cur.execute("""
+                INSERT INTO traffic_dedup (request_hash, expires_at)
+                VALUES (%s, now() + make_interval(secs => %s))
+                ON CONFLICT (request_hash) DO UPDATE SET expires_at = EXCLUDED.expires_at
+                WHERE traffic_dedup.expires_at <= now()
+                RETURNING request_hash
+            """, (request_hash, ttl))
+            return cur.fetchone() is not None
+        return self._run(work)
+
+    def release_download(self, request_hash):
+        execute_query("DELETE FROM traffic_dedup WHERE request_hash = %s", (request_hash,))
+
+    def clear_downloads(self):
+        def work(cur):
+            cur.execute("DELETE FROM traffic_dedup")
+            return cur.rowcount
+        return self._run(work)
+
+    # ---------- contatori ----------
+
+    def reserve(self, user_id, day, nbytes, limit_bytes=None):
+        def work(cur):
+            reserve_query = """
+                UPDATE traffic_quota_usage
+                SET bytes_used = bytes_used + %s, download_count = download_count + 1, updated_at = now()
+                WHERE user_id = %s AND usage_date = %s
+                  AND (%s::bigint IS NULL OR bytes_used + %s <= %s::bigint)
+                RETURNING bytes_used, download_count
+            """
+            params = (nbytes, user_id, day, limit_bytes, nbytes, limit_bytes)
+            cur.execute(reserve_query, params)
+            row = cur.fetchone()
+            if row:
+                return True, _usage(*row)
+
+            cur.execute(
+                "SELECT bytes_used, download_count FROM traffic_quota_usage WHERE user_id = %s AND usage_date = %s",
+                (user_id, day)
+            )
+            row = cur.fetchone()
+            if row:
+                return False, _usage(*row)
+
+            # Prima richiesta del giorno: seed da user_traffic_log, una sola volta per utente
+            cur.execute("SELECT pg_advisory_xact_lock(%s, %s)", (_ADVISORY_CLASS, user_id))
+            cur.execute("""
+                INSERT INTO traffic_quota_usage (user_id, usage_date, bytes_used, download_count)
+                SELECT %s, %s, COALESCE(SUM(bytes_downloaded), 0), COUNT(*)
+                FROM user_traffic_log
+                WHERE user_id = %s AND download_date = %s
+                ON CONFLICT (user_id, usage_date) DO NOTHING
+            """, (user_id, day, user_id, day))
+            cur.execute(reserve_query, params)
+            row = cur.fetchone()
+            if row:
+                return True, _usage(*row)
+            cur.execute(
+                "SELECT bytes_used, download_count FROM traffic_quota_usage WHERE user_id = %s AND usage_date = %s",
+                (user_id, day)
+            )
+            return False, _usage(*cur.fetchone())
+        return self._run(work)
+
+    def settle(self, user_id, day, actual_bytes, reserved_bytes=None, record=None):
+        if record:
+            record()
+        if reserved_bytes is None:
+            # Addebito senza reserve: passa dallo stesso UPDATE (con seed se serve)
+            self.reserve(user_id, day, actual_bytes)
+            return
+        delta_count = -1 if actual_bytes <= 0 else 0
+        execute_query("""
+            UPDATE traffic_quota_usage
+            SET bytes_used = GREATEST(0, bytes_used + %s),
+                download_count = GREATEST(0, download_count + %s),
+                updated_at = now()
+            WHERE user_id = %s AND usage_date = %s
+        """, (actual_bytes - reserved_bytes, delta_count, user_id, day))
+
+    def get_usage(self, user_id, day):
+        result = execute_query(
+            "SELECT bytes_used, download_count FROM traffic_quota_usage WHERE user_id = %s AND usage_date = %s",
+            (user_id, day), fetch=True
+        )
+        if result:
+            return _usage(result[0]['bytes_used'], result[0]['download_count'])
+        stored = self.seed_usage(user_id, day)
+        return stored if stored is not None else _usage(0, 0)
+
+
+# =================================================================
+# FACTORY E BENCHMARK
+# =================================================================
+
+def create_quota_backend(seed_usage, unflushed=None, flush_lock=None, config=TRAFFIC_QUOTA_CONFIG):
+    backend = config['backend']
+    if backend == 'sqlite':
+        return SqliteQuotaBackend(seed_usage, config['sqlite_path'])
+    if backend == 'postgres':
+        return PostgresQuotaBackend(seed_usage)
+    if backend != 'memory':
+        logging.error(f"TRAFFIC_QUOTA_BACKEND sconosciuto: {backend}, uso 'memory'")
+    return MemoryQuotaBackend(seed_usage, unflushed, config['resync_interval'], flush_lock)
+
+
+def _legacy_download(user_id, day, nbytes):
+    """Percorso originale: SUM del giorno + INSERT (annullata) per ogni download"""
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT COALESCE(SUM(bytes_downloaded), 0), COUNT(*) FROM user_traffic_log "
+                "WHERE user_id = %s AND download_date = %s", (user_id, day)
+            )
+            cur.fetchone()
+            cur.execute(
+                "INSERT INTO user_traffic_log (user_id, download_date, bytes_downloaded, download_timestamp) "
+                "VALUES (%s, %s, %s, now())", (user_id, day, nbytes)
+            )
+        conn.rollback()
+    finally:
+        conn.close()
+
+
+def benchmark_backends(iterations=1000, user_id=1, nbytes=1024):
+    """ms per download (dedup + reserve + settle) per backend e per il percorso SQL originale"""
+    # Giorno fittizio: non tocca i contatori reali
+    day = date(2000, 1, 1)
+    zero_seed = lambda uid, d: _usage(0, 0)
+    sqlite_path = os.path.join(tempfile.gettempdir(), f'traffic_bench_{os.getpid()}.db')
+    backends = [
+        MemoryQuotaBackend(zero_seed, resync_interval=3600),
+        SqliteQuotaBackend(zero_seed, sqlite_path),
+        PostgresQuotaBackend(zero_seed),
+    ]
+    results = {}
+
+    for backend in backends:
+        try:
+            started = time.perf_counter()
+            for i in range(iterations):
+                request_hash = f'bench-{os.getpid()}-{i}'
+                backend.claim_download(request_hash, 30)
+                backend.reserve(user_id, day, nbytes, limit_bytes=None)
+                backend.settle(user_id, day, nbytes, reserved_bytes=nbytes)
+                backend.release_download(request_hash)
+            results[backend.name] = round((time.perf_counter() - started) * 1000 / iterations, 4)
+        except Exception as e:
+            results[backend.name] = f'errore: {e}'
+
+    try:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            _legacy_download(user_id, day, nbytes)
+        results['legacy_sql'] = round((time.perf_counter() - started) * 1000 / iterations, 4)
+    except Exception as e:
+        results['legacy_sql'] = f'errore: {e}'
+
+    execute_query("DELETE FROM traffic_quota_usage WHERE usage_date = %s", (day,))
+    for suffix in ('', '-wal', '-shm'):
+        try:
+            os.remove(sqlite_path + suffix)
+        except OSError:
+            pass
+    return results
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Backend quota traffico')
+    parser.add_argument('--bench', type=int, default=0, metavar='N', help='Benchmark con N download per backend')
+    parser.add_argument('--user-id', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.bench:
+        for name, ms in benchmark_backends(args.bench, args.user_id).items():
+            print(f"{name:12s} {ms} ms/download")
+    else:
+        parser.print_help()
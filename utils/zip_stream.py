@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+ZIP STREAM - ARCHIVI ZIP GENERATI AL VOLO
+Il contenuto di ogni file passa a chunk dal sorgente (es. MinIO) al
+compressore e subito al client: niente file temporanei, niente buffer
+per file. Dimensioni e CRC non sono noti in anticipo, quindi ogni entry
+usa il data descriptor (flag bit 3) dopo i dati; ZIP64 (descriptor,
+extra field del central directory, end record) scatta solo quando
+dimensioni, offset o numero di entry superano i limiti del formato base.
+I formati già compressi (immagini, video, archivi) vengono salvati STORED.
+"""
+
+import os
+import time
+import zlib
+import struct
+import logging
+
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+
+# Estensioni già compresse: deflate costerebbe CPU senza ridurre la dimensione
+STORED_EXTENSIONS = {
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic',
+    '.mp4', '.mov', '.avi', '.mkv', '.webm', '.mp3', '.aac', '.ogg',
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.rar', '.zst',
+}
+
+_ZIP32_LIMIT = 0xFFFFFFFF
+_ZIP32_COUNT_LIMIT = 0xFFFF
+
+_FLAG_DATA_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+
+
+def compression_for(name):
+    """STORED per i formati già compressi, DEFLATED per il resto"""
+    return ZIP_STORED if os.path.splitext(name)[1].lower() in STORED_EXTENSIONS else ZIP_DEFLATED
+
+
+def _dos_datetime(timestamp):
+    t = time.localtime(timestamp)
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((max(t.tm_year, 1980) - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+
+
+class _Entry:
+    __slots__ = ('name', 'method', 'dos_time', 'dos_date', 'crc', 'compressed_size', 'size', 'offset')
+
+    def __init__(self, name, method, dos_time, dos_date, offset):
+        self.name = name
+        self.method = method
+        self.dos_time = dos_time
+        self.dos_date = dos_date
+        self.offset = offset
+        self.crc = 0
+        self.compressed_size = 0
+        self.size = 0
+
+
+class ZipStreamWriter:
+    """
+    Writer ZIP a sola scrittura sequenziale.
+    add(name, chunks) e finish() sono generatori di bytes da inoltrare
+    così come arrivano (es. dentro una Response Flask in streaming).
+    """
+
+    def __init__(self, compresslevel=6):
+        self.compresslevel = compresslevel
+        self._entries = []
+        self._names = set()
+        self._offset = 0
+
+    def _emit(self, data):
+        self._offset += len(data)
+        return data
+
+    def _unique_name(self, name):
+        """Nomi duplicati (stesso basename da cartelle diverse) -> 'nome (2).ext'"""
+        candidate, counter = name, 1
+        root, ext = os.path.splitext(name)
+        while candidate in self._names:
+            counter += 1
+            candidate = f"{root} ({counter}){ext}"
+        self._names.add(candidate)
+        return candidate
+
+    def add(self, name, chunks, method=None, mtime=None):
+        """
+        Aggiunge un file leggendo i chunk da un iterabile di bytes.
+        Se l'iterabile fallisce prima del primo chunk (es. oggetto non
+        trovato) il file viene saltato senza scrivere nulla nell'archivio.
+        """
+        chunks = iter(chunks)
+        try:
+            first = next(chunks, b'')
+        except Exception as e:
+            logging.warning(f"File {name} saltato nello ZIP: {e}")
+            return
+
+        name = self._unique_name(name)
+        if method is None:
+            method = compression_for(name)
+        dos_time, dos_date = _dos_datetime(mtime if mtime is not None else time.time())
+        entry = _Entry(name, method, dos_time, dos_date, self._offset)
+        encoded_name = name.encode('utf-8')
+
+        yield self._emit(struct.pack(
+            '<IHHHHHIIIHH',
+            0x04034b50,
+            20,                                          # version needed
+            _FLAG_DATA_DESCRIPTOR | _FLAG_UTF8,
+            method,
+            dos_time, dos_date,
+            0, 0, 0,                                     # crc e dimensioni nel data descriptor
+            len(encoded_name),
+            0
+        ) + encoded_name)
+
+        compressor = zlib.compressobj(self.compresslevel, zlib.DEFLATED, -15) if method == ZIP_DEFLATED else None
+
+        def write(data):
+            entry.crc = zlib.crc32(data, entry.crc)
+            entry.size += len(data)
+            if compressor:
+                data = compressor.compress(data)
+            entry.compressed_size += len(data)
+            return data
+
+        try:
+            data = write(first)
+            if data:
+                yield self._emit(data)
+            for chunk in chunks:
+                data = write(chunk)
+                if data:
+                    yield self._emit(data)
+        except Exception as e:
+            # Header già inviato: si chiude l'entry con i dati letti finora
+            logging.error(f"Errore lettura {name} durante lo ZIP, file troncato: {e}")
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close:
+                close()
+
+        if compressor:
+            tail = compressor.flush()
+            entry.compressed_size += len(tail)
+            if tail:
+                yield self._emit(tail)
+
+        if entry.size >= _ZIP32_LIMIT or entry.compressed_size >= _ZIP32_LIMIT:
+            descriptor = struct.pack('<IIQQ', 0x08074b50, entry.crc, entry.compressed_size, entry.size)
+        else:
+            descriptor = struct.pack('<IIII', 0x08074b50, entry.crc, entry.compressed_size, entry.size)
+        yield self._emit(descriptor)
+
+        self._entries.append(entry)
+
+    def finish(self):
+        """Central directory ed end record (ZIP64 se necessario)"""
+        cd_offset = self._offset
+
+        for entry in self._entries:
+            zip64_fields = []
+            size, compressed_size, offset = entry.size, entry.compressed_size, entry.offset
+            if size >= _ZIP32_LIMIT:
+                zip64_fields.append(size)
+                size = _ZIP32_LIMIT
+            if compressed_size >= _ZIP32_LIMIT:
+                zip64_fields.append(compressed_size)
+                compressed_size = _ZIP32_LIMIT
+            if offset >= _ZIP32_LIMIT:
+                zip64_fields.append(offset)
+                offset = _ZIP32_LIMIT
+
+            extra = b''
+            if zip64_fields:
+                extra = struct.pack('<HH', 0x0001, 8 * len(zip64_fields)) + \
+                    struct.pack(f'<{len(zip64_fields)}Q', *zip64_fields)
+            version = 45 if zip64_fields else 20
+
+            encoded_name = entry.name.encode('utf-8')
+            yield self._emit(struct.pack(
+                '<IHHHHHHIIIHHHHHII',
+                0x02014b50,
+                version | (3 << 8),                      # made by: UNIX
+                version,
+                _FLAG_DATA_DESCRIPTOR | _FLAG_UTF8,
+                entry.method,
+                entry.dos_time, entry.dos_date,
+                entry.crc, compressed_size, size,
+                len(encoded_name), len(extra), 0,
+                0, 0,
+                0o100644 << 16,                          # permessi file regolare
+                offset
+            ) + encoded_name + extra)
+
+        cd_size = self._offset - cd_offset
+        count = len(self._entries)
+
+        if count >= _ZIP32_COUNT_LIMIT or cd_size >= _ZIP32_LIMIT or cd_offset >= _ZIP32_LIMIT:
+            zip64_end_offset = self._offset
+            yield self._emit(struct.pack(
+                '<IQHHIIQQQQ',
+                0x06064b50, 44, 45, 45, 0, 0,
+                count, count, cd_size, cd_offset
+            ))
+            yield self._emit(struct.pack('<IIQI', 0x07064b50, 0, zip64_end_offset, 1))
+            count = min(count, _ZIP32_COUNT_LIMIT)
+            cd_size = min(cd_size, _ZIP32_LIMIT)
+            cd_offset = min(cd_offset, _ZIP32_LIMIT)
+
+        yield self._emit(struct.pack(
+            '<IHHHHIIH',
+            0x06054b50, 0, 0, count, count, cd_size, cd_offset, 0
+        ))
+
+    @property
+    def bytes_written(self):
+        return self._offset
+
+
+def stream_zip(entries, compresslevel=6):
+    """
+    Generatore dell'intero archivio da un iterabile di (nome, chunks).
+    Il primo byte esce appena è pronto il primo header, indipendentemente
+    dal numero e dalla dimensione dei file.
+    """
+    writer = ZipStreamWriter(compresslevel=compresslevel)
+    for name, chunks in entries:
+        yield from writer.add(name, chunks)
+    yield from writer.finish()